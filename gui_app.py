@@ -23,7 +23,7 @@ import multiprocessing
 from dataclasses import dataclass
 from pathlib import Path
 from queue import Queue, Empty
-from typing import Callable, Optional
+from typing import Any, Callable, Optional
 
 import tkinter as tk
 from tkinter import filedialog, messagebox
@@ -937,13 +937,16 @@ setup_runtime_env()
 try:
     from scripts import robo_pdf_para_codigos as extractor
     from scripts import post_codes_to_sheets as poster
+    from scripts import browser_service
 except Exception:
     try:
         import robo_pdf_para_codigos as extractor
         import post_codes_to_sheets as poster
+        import browser_service
     except Exception as e:
         extractor = None
         poster = None
+        browser_service = None
         print(f"⚠️ Aviso: {e}")
 
 
@@ -986,9 +989,64 @@ class App(ctk.CTk):
         self._log_queue: Queue[str] = Queue()
         self._busy = False
         self._busy_lock = threading.Lock()
+        self._fechar_ao_terminar = False
+        # Navegador compartilhado: sobe na 1ª tarefa e fica aberto (sessões quentes) até fechar a janela
+        self.browser_service = browser_service.BrowserService() if browser_service else None
 
         self._build_ui()
         self.after(80, self._drain_log_queue)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self) -> None:
+        with self._busy_lock:
+            ocupado = self._busy
+        if ocupado:
+            # a tarefa está na thread do navegador: parar agora travaria a janela e perderia as sessões
+            if not messagebox.askyesno(
+                "Ocupado",
+                "Operação em andamento.\nFechar assim que ela terminar?\n(as sessões do navegador são salvas antes)",
+            ):
+                return
+            self._fechar_ao_terminar = True
+            self.status_var.set("⏳ Fecha quando a operação atual terminar...")
+            return
+        self._fechar()
+
+    def _fechar(self) -> None:
+        """Salva as sessões e encerra o navegador FORA da thread do Tk; destrói a janela no fim."""
+        self.withdraw()
+        if self.browser_service is None:
+            self.destroy()
+            return
+
+        def parar() -> None:
+            try:
+                parou = self.browser_service.stop()
+            except Exception:
+                traceback.print_exc()
+                parou = True
+            self.after(0, self.destroy if parou else self._fechar_travado)
+
+        threading.Thread(target=parar, name="fechar", daemon=False).start()
+
+    def _fechar_travado(self) -> None:
+        """stop() estourou o prazo: o Playwright ainda está trabalhando e as sessões não foram salvas."""
+        self.deiconify()
+        if messagebox.askyesno(
+            "Navegador ocupado",
+            "O navegador ainda está terminando uma tarefa e as sessões não foram salvas.\n"
+            "Esperar mais?\n(Não = fechar agora; pode ser preciso logar de novo)",
+        ):
+            self._fechar()
+            return
+        self.destroy()
+
+    def _browser_call(self, fn: Callable[[Any], Any]) -> Any:
+        """Roda fn(servico) na thread do navegador compartilhado e devolve o resultado."""
+        if self.browser_service is None:
+            raise RuntimeError("Módulo browser_service não carregado")
+        ensure_playwright_browsers()
+        return self.browser_service.call(fn)
 
     def _build_ui(self) -> None:
         input_frame = ctk.CTkFrame(self)
@@ -1140,6 +1198,8 @@ class App(ctk.CTk):
         print(f"[DEBUG] _set_busy({busy}) -> Dispatching UI update to main thread")
         # GARANTE que a atualização de widgets ocorra na Main Thread
         self.after(0, lambda: self._update_ui_state(busy))
+        if not busy and self._fechar_ao_terminar:
+            self.after(0, self._fechar)
 
     def _update_ui_state(self, busy: bool) -> None:
         try:
@@ -1262,7 +1322,10 @@ class App(ctk.CTk):
                 extractor.STORAGE_STATE = state_path
                 print("✅ STORAGE_STATE atualizado!\n")
 
-            extractor.main(pdf_path=str(self.state_data.pdf_path), headless=headless_mode)
+            pdf_path = str(self.state_data.pdf_path)
+            self._browser_call(
+                lambda svc: extractor.main(pdf_path=pdf_path, headless=headless_mode, browser_service=svc)
+            )
 
             path_csv = OUTPUTS_DIR / "codigos.csv"
             codes: list[str] = []
@@ -1325,10 +1388,13 @@ class App(ctk.CTk):
             # Define path explicitly
             state_path = str(DEBUG_DIR / "storage_state_google.json")
             
-            poster.main(
-                target_cell=cell, 
-                headless=False,
-                storage_state_path=state_path
+            self._browser_call(
+                lambda svc: poster.main(
+                    target_cell=cell,
+                    headless=False,
+                    storage_state_path=state_path,
+                    browser_service=svc,
+                )
             )
 
             self.after(0, lambda: self.status_var.set("✅ Enviado"))
@@ -1386,7 +1452,6 @@ class App(ctk.CTk):
         safe_log("=== INICIANDO LOGIN WORKER ===")
 
         try:
-            ensure_playwright_browsers()
             state_path = str(DEBUG_DIR / "storage_state.json")
             Path(state_path).parent.mkdir(parents=True, exist_ok=True)
 
@@ -1396,42 +1461,11 @@ class App(ctk.CTk):
 
             start_url = "https://manager.eumedicoresidente.com.br/admin/resources/Question"
 
-            with sync_playwright() as p:
-                # Launch with stealth args to avoid detection (same as google)
-                browser = p.chromium.launch(
-                    headless=False,
-                    args=[
-                        "--disable-blink-features=AutomationControlled", 
-                        "--start-maximized", 
-                        "--no-sandbox",
-                        "--disable-infobars"
-                    ],
-                    ignore_default_args=["--enable-automation"]
-                )
-                
-                # Use a specific user agent
-                ua = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-                
-                context_args = {
-                    "user_agent": ua,
-                    "viewport": None, # allow maximize
-                    "no_viewport": True
-                }
-
-                if os.path.exists(state_path):
-                    try:
-                        context_args["storage_state"] = state_path
-                        context = browser.new_context(**context_args)
-                    except Exception:
-                        del context_args["storage_state"]
-                        context = browser.new_context(**context_args)
-                else:
-                    context = browser.new_context(**context_args)
+            def login(svc) -> bool:
+                # Navegador compartilhado (Chromium com os args stealth): a sessão salva aqui
+                # continua aberta para a próxima extração
+                page, context = svc.admin_page(state_path, headless=False)
 
-                # Stealth script
-                page = context.new_page()
-                page.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-                
                 page.goto(start_url, wait_until="domcontentloaded", timeout=60000)
 
                 print("⚠️ Aguardando login... (Monitorando URL)")
@@ -1440,8 +1474,6 @@ class App(ctk.CTk):
 
                 time.sleep(1) # Espera navegador abrir
 
-                saved_at_least_once = False
-                
                 print("⚠️ Aguardando confirmação manual do usuário...")
                 safe_log("Aguardando confirmação manual...")
                 
@@ -1468,7 +1500,7 @@ class App(ctk.CTk):
                 # Wait for user action
                 while not self._login_confirmed and not self._login_abort:
                     time.sleep(1)
-                    if not browser.is_connected():
+                    if page.is_closed() or not context.browser.is_connected():
                         safe_log("Navegador fechado antes da confirmação.")
                         self._login_abort = True
                         break
@@ -1476,23 +1508,26 @@ class App(ctk.CTk):
                 if self._login_abort:
                      safe_log("Login cancelado ou navegador fechado.")
                      self.after(0, lambda: self.status_var.set("Login cancelado."))
-                     return
+                     return False
 
                 # If confirmed, save immediately
-                if self._login_confirmed:
-                    print("⏳ Salvando sessão...")
-                    try:
-                        context.storage_state(path=state_path)
-                        safe_log("✅ SESSÃO SALVA COM SUCESSO!")
-                        print("✅ SESSÃO SALVA!")
-                        
-                        self.after(0, lambda: self.status_var.set("✅ Login OK!"))
-                        self.after(0, lambda: messagebox.showinfo("Sucesso", "Login salvo! O navegador será fechado."))
-                    except Exception as e_save:
-                        err_msg_save = str(e_save)
-                        print(f"Erro ao salvar storage_state: {err_msg_save}")
-                        safe_log(f"Erro ao salvar: {err_msg_save}")
-                        self.after(0, lambda: messagebox.showwarning("Aviso", f"Erro ao salvar sessão: {err_msg_save}\n\nO navegador foi fechado?"))
+                print("⏳ Salvando sessão...")
+                try:
+                    context.storage_state(path=state_path)
+                    safe_log("✅ SESSÃO SALVA COM SUCESSO!")
+                    print("✅ SESSÃO SALVA!")
+                    
+                    self.after(0, lambda: self.status_var.set("✅ Login OK!"))
+                    self.after(0, lambda: messagebox.showinfo("Sucesso", "Login salvo! O navegador fica aberto para a extração."))
+                except Exception as e_save:
+                    err_msg_save = str(e_save)
+                    print(f"Erro ao salvar storage_state: {err_msg_save}")
+                    safe_log(f"Erro ao salvar: {err_msg_save}")
+                    self.after(0, lambda: messagebox.showwarning("Aviso", f"Erro ao salvar sessão: {err_msg_save}\n\nO navegador foi fechado?"))
+                return True
+
+            if not self._browser_call(login):
+                return
 
             self.after(0, lambda: self.status_var.set("✅ Login OK (sessão salva)"))
             self.after(0, lambda: messagebox.showinfo("Login", "Sessão salva! Agora pode executar a extração."))
@@ -1527,7 +1562,6 @@ class App(ctk.CTk):
         sys.stderr = _TkLogWriter(self._push_log)
 
         try:
-            ensure_playwright_browsers()
             state_path = str(DEBUG_DIR / "storage_state_google.json")
             Path(state_path).parent.mkdir(parents=True, exist_ok=True)
 
@@ -1538,9 +1572,10 @@ class App(ctk.CTk):
             user_data_dir = DEBUG_DIR / "chrome_profile_google"
             user_data_dir.mkdir(parents=True, exist_ok=True)
 
-            with sync_playwright() as p:
+            def login(svc) -> None:
+                # Chrome real (perfil persistente) só para o login; o Playwright é o do daemon
                 # Use SYSTEM CHROME to avoid detection loop
-                context = p.chromium.launch_persistent_context(
+                context = svc.garantir_playwright().chromium.launch_persistent_context(
                     user_data_dir=str(user_data_dir),
                     channel="chrome",  # <--- CRITICAL FIX: Use real Chrome
                     headless=False,
@@ -1608,6 +1643,7 @@ class App(ctk.CTk):
                         # Save to JSON for compatibility
                         context.storage_state(path=state_path)
                         print(f"💾 Sessão salva: {state_path}\n")
+                        svc.descartar("sheets", salvar=False)  # o Firefox do Sheets recarrega a sessão nova
                         self.after(0, lambda: self.status_var.set("✅ Login Google OK"))
                         self.after(0, lambda: messagebox.showinfo("Login", "Sessão Google salva!"))
                     except Exception as e_save:
@@ -1620,6 +1656,8 @@ class App(ctk.CTk):
                     except Exception:
                         pass
 
+            self._browser_call(login)
+
         except Exception as e:
             traceback.print_exc()
             err_msg = str(e)
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+NAVEGADOR COMPARTILHADO (DAEMON)
+
+Um único Playwright, iniciado 1x (na primeira tarefa) e reaproveitado por extração,
+envio para o Sheets e logins da GUI:
+   - contexts "quentes" e logados: admin (Chromium) e Google Sheets (Firefox),
+     criados a partir do storage_state e mantidos abertos entre uma tarefa e outra
+   - a API sync do Playwright só funciona na thread que a criou: todo uso do navegador
+     roda na thread do daemon (call/submit); os workers da GUI só esperam o resultado
+   - health check: navegador desconectado / página fechada -> relança e recria o context
+     (ocioso, confere a cada HEALTH_INTERVAL_S)
+   - stop(): cancela o que está na fila, sinaliza `parando` para a tarefa em andamento
+     (a extração para entre questões) e avisa se ela não terminar em STOP_TIMEOUT_S
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import traceback
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from playwright.sync_api import sync_playwright
+
+# =========================
+# CONFIG
+# =========================
+ADMIN_SLOW_MO = 30  # mesmo slow_mo que a extração sempre usou
+STEALTH_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--start-maximized",
+    "--no-sandbox",
+    "--disable-infobars",
+]
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+STEALTH_INIT_SCRIPT = "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
+HEALTH_INTERVAL_S = 30.0
+MAX_RESTARTS = 3  # relançamentos seguidos sem uma tarefa concluída -> desiste (erro para o worker)
+STOP_TIMEOUT_S = 30.0  # stop() espera a tarefa em andamento + salvar as sessões até isso
+
+
+@dataclass
+class _Slot:
+    """Um navegador + context + página reaproveitados (admin ou sheets)."""
+    nome: str
+    browser: Any = None
+    context: Any = None
+    page: Any = None
+    headless: Optional[bool] = None
+    storage_state: Optional[str] = None
+
+
+@dataclass
+class _Tarefa:
+    fn: Callable[["BrowserService"], Any]
+    futuro: Future = field(default_factory=Future)
+
+
+_PARAR = object()
+
+
+class BrowserService:
+    """
+    Serviço de navegador de longa duração.
+    - call(fn): roda fn(servico) na thread do daemon e devolve o resultado (ou relança o erro)
+    - dentro de fn: admin_page(), sheets_page(), garantir_playwright(), descartar();
+      tarefa longa confere `parando` para sair cedo quando a GUI fecha
+    """
+
+    def __init__(self) -> None:
+        self._fila: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._parando = threading.Event()
+        self._pw_cm = None
+        self.playwright = None
+        self._slots: Dict[str, _Slot] = {"admin": _Slot("admin"), "sheets": _Slot("sheets")}
+        self.reinicios = 0
+        self._reinicios_seguidos = 0
+
+    # ---------- lado dos workers (qualquer thread) ----------
+    @property
+    def parando(self) -> bool:
+        """stop() foi chamado: a tarefa em andamento deve terminar o quanto antes."""
+        return self._parando.is_set()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._parando.clear()
+            self._thread = threading.Thread(target=self._loop, name="BrowserService", daemon=True)
+            self._thread.start()
+
+    def submit(self, fn: Callable[["BrowserService"], Any]) -> Future:
+        self.start()
+        if self._parando.is_set():
+            raise RuntimeError("Navegador compartilhado encerrando; tarefa não aceita.")
+        tarefa = _Tarefa(fn)
+        self._fila.put(tarefa)
+        return tarefa.futuro
+
+    def call(self, fn: Callable[["BrowserService"], Any]) -> Any:
+        if threading.current_thread() is self._thread:
+            return fn(self)  # já na thread do daemon (tarefa chamando tarefa)
+        return self.submit(fn).result()
+
+    def stop(self, timeout_s: float = STOP_TIMEOUT_S) -> bool:
+        """
+        Salva as sessões, fecha tudo e encerra a thread do daemon.
+        Tarefas ainda na fila são canceladas; a que está rodando vê `parando` e termina primeiro.
+        False = a thread não terminou em timeout_s (tarefa presa): sessões ainda NÃO foram salvas.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        self._parando.set()
+        while True:
+            try:
+                tarefa = self._fila.get_nowait()
+            except queue.Empty:
+                break
+            if tarefa is not _PARAR:
+                tarefa.futuro.cancel()
+        self._fila.put(_PARAR)
+        self._thread.join(timeout=timeout_s)
+        if self._thread.is_alive():
+            print(f"⚠️ Navegador compartilhado ainda ocupado depois de {timeout_s:.0f}s; sessões não salvas ainda.")
+            return False
+        return True
+
+    # ---------- thread do daemon ----------
+    def _loop(self) -> None:
+        while True:
+            try:
+                tarefa = self._fila.get(timeout=HEALTH_INTERVAL_S)
+            except queue.Empty:
+                self._health_check()
+                continue
+            if tarefa is _PARAR:
+                self._encerrar()
+                return
+            if not tarefa.futuro.set_running_or_notify_cancel():
+                continue
+            try:
+                resultado = tarefa.fn(self)
+            except BaseException as e:  # noqa: BLE001 - vai para o worker que pediu
+                tarefa.futuro.set_exception(e)
+            else:
+                self._reinicios_seguidos = 0
+                tarefa.futuro.set_result(resultado)
+
+    def garantir_playwright(self):
+        """Instância do Playwright do daemon (sobe na 1ª vez). Só na thread do daemon."""
+        if self.playwright is None:
+            self._pw_cm = sync_playwright()
+            self.playwright = self._pw_cm.__enter__()
+        return self.playwright
+
+    def _health_check(self) -> None:
+        """Ocioso: navegador que caiu é descartado agora (relança só quando alguém pedir)."""
+        for slot in self._slots.values():
+            if slot.browser is not None and not _conectado(slot.browser):
+                print(f"⚠️ Navegador '{slot.nome}' caiu; será relançado na próxima tarefa.")
+                self.reinicios += 1
+                self._limpar(slot)
+
+    def _limpar(self, slot: _Slot) -> None:
+        for obj in (slot.context, slot.browser):
+            if obj is None:
+                continue
+            try:
+                obj.close()
+            except Exception:
+                pass
+        slot.browser = slot.context = slot.page = None
+
+    def _salvar_sessao(self, slot: _Slot) -> None:
+        if slot.context is None or not slot.storage_state:
+            return
+        try:
+            Path(slot.storage_state).parent.mkdir(parents=True, exist_ok=True)
+            slot.context.storage_state(path=slot.storage_state)
+        except Exception:
+            pass
+
+    def descartar(self, nome: str, salvar: bool = True) -> None:
+        """Fecha o navegador de um slot (ex.: storage_state mudou por fora -> recarregar)."""
+        slot = self._slots[nome]
+        if salvar:
+            self._salvar_sessao(slot)
+        self._limpar(slot)
+
+    def _encerrar(self) -> None:
+        for slot in self._slots.values():
+            self._salvar_sessao(slot)
+            self._limpar(slot)
+        if self._pw_cm is not None:
+            try:
+                self._pw_cm.__exit__(None, None, None)
+            except Exception:
+                traceback.print_exc()
+        self._pw_cm = self.playwright = None
+
+    def _reiniciar_playwright(self) -> None:
+        print("⚠️ Playwright não respondeu; reiniciando o navegador compartilhado...")
+        for slot in self._slots.values():
+            slot.browser = slot.context = slot.page = None
+        try:
+            if self._pw_cm is not None:
+                self._pw_cm.__exit__(None, None, None)
+        except Exception:
+            pass
+        self._pw_cm = self.playwright = None
+
+    def _slot_pronto(self, slot: _Slot, headless: bool, storage_state: Optional[str]) -> bool:
+        if slot.browser is None or not _conectado(slot.browser):
+            return False
+        return slot.headless == headless and slot.storage_state == storage_state and slot.context is not None
+
+    def _abrir(
+        self,
+        slot: _Slot,
+        headless: bool,
+        storage_state: Optional[str],
+        lancar: Callable[[Any], Any],
+        context_args: Dict[str, Any],
+    ) -> None:
+        self.garantir_playwright()
+        if slot.browser is not None:
+            if not _conectado(slot.browser):
+                self.reinicios += 1
+                self._reinicios_seguidos += 1
+                if self._reinicios_seguidos > MAX_RESTARTS:
+                    raise RuntimeError(f"Navegador '{slot.nome}' caiu {MAX_RESTARTS}x seguidas.")
+                print(f"🔄 Navegador '{slot.nome}' caiu; relançando...")
+            self.descartar(slot.nome)  # caiu, ou mudou headless/sessão
+        slot.browser = lancar(self.playwright)
+        args = dict(context_args)
+        if storage_state and Path(storage_state).exists():
+            try:
+                slot.context = slot.browser.new_context(**args, storage_state=storage_state)
+            except Exception as e:
+                # sessão salva corrompida/incompatível: abre sem ela (vai pedir login de novo)
+                print(f"⚠️ Sessão em {storage_state} não carregou ({e}); abrindo sem ela.")
+                slot.context = slot.browser.new_context(**args)
+        else:
+            slot.context = slot.browser.new_context(**args)
+        slot.headless, slot.storage_state = headless, storage_state
+
+    def _pagina(
+        self,
+        slot: _Slot,
+        headless: bool,
+        storage_state: Optional[str],
+        lancar: Callable[[Any], Any],
+        context_args: Dict[str, Any],
+    ) -> Tuple[Any, Any]:
+        storage_state = str(Path(storage_state).resolve()) if storage_state else None
+        for tentativa in range(2):
+            try:
+                if not self._slot_pronto(slot, headless, storage_state):
+                    self._abrir(slot, headless, storage_state, lancar, context_args)
+                if slot.page is None or slot.page.is_closed():
+                    slot.page = slot.context.new_page()
+                    slot.page.add_init_script(STEALTH_INIT_SCRIPT)
+                return slot.page, slot.context
+            except RuntimeError:
+                raise
+            except Exception:
+                if tentativa:
+                    raise
+                self._reiniciar_playwright()  # driver do Playwright morreu: tudo do zero
+        raise RuntimeError(f"Navegador '{slot.nome}' não abriu.")
+
+    def admin_page(self, storage_state: Optional[str], headless: bool = False) -> Tuple[Any, Any]:
+        """(page, context) do admin em Chromium, com a sessão de storage_state (só na thread do daemon)."""
+        args: Dict[str, Any] = {"user_agent": USER_AGENT}
+        if not headless:
+            args["no_viewport"] = True
+        return self._pagina(
+            self._slots["admin"],
+            headless,
+            storage_state,
+            lambda pw: pw.chromium.launch(
+                headless=headless,
+                slow_mo=ADMIN_SLOW_MO,
+                args=STEALTH_ARGS,
+                ignore_default_args=["--enable-automation"],
+            ),
+            args,
+        )
+
+    def sheets_page(self, storage_state: str, headless: bool = False) -> Tuple[Any, Any]:
+        """(page, context) do Google Sheets em Firefox (mesma sessão do post_codes_to_sheets)."""
+        return self._pagina(
+            self._slots["sheets"],
+            headless,
+            storage_state,
+            lambda pw: pw.firefox.launch(headless=headless),
+            {},
+        )
+
+    def report(self) -> str:
+        vivos = [n for n, s in self._slots.items() if s.browser is not None and _conectado(s.browser)]
+        return f"navegadores abertos: {', '.join(vivos) or 'nenhum'} | relançamentos: {self.reinicios}"
+
+
+def _conectado(browser) -> bool:
+    try:
+        return bool(browser.is_connected())
+    except Exception:
+        return False
@@ -0,0 +1,791 @@
+# -*- coding: utf-8 -*-
+"""
+BANCO LOCAL (ESPELHO SQLITE DO ADMIN + ÍNDICES)
+
+Armazenamento e índices das questões do admin, usados pelo robo_pdf_para_codigos.py
+(a recuperação de candidatos, o sync com a API e a validação ficam lá):
+   - LocalBank: SQLite com marca d'água (updatedAt), FTS5 (BM25) e tabela de bandas LSH
+   - ColumnarQuestionStore: snapshot colunar versionado, aberto por mmap (GUI/CLI carregam sem esperar)
+   - CharNgramIndex: TF-IDF de n-gramas de caractere (re-rank que aguenta hifenização/ligaduras do PDF)
+   - MinHash + LSH em bandas: quase-duplicatas (mesma questão levemente editada) em 1 consulta indexada
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from scripts.question_model import QuestionBlock, SiteQuestion, normalize_for_comparison, normalize_text
+except ImportError:  # rodando de dentro de scripts/ (python robo_pdf_para_codigos.py)
+    from question_model import QuestionBlock, SiteQuestion, normalize_for_comparison, normalize_text
+
+# =========================
+# CONFIG
+# =========================
+LOCAL_BANK_PATH = "debug/banco_questoes.sqlite"
+
+DEBUG = False  # main() do robo copia o DEBUG de lá
+
+# FTS5 (BM25, sem acento) sobre enunciado + alternativas
+LOCAL_BANK_FTS = True
+# TF-IDF de n-gramas de caractere (3-5)
+NGRAM_MIN = 3
+NGRAM_MAX = 5
+# Quase-duplicatas (MinHash + LSH em bandas) sobre shingles de caractere do enunciado:
+# mesma questão em outra apostila/edição levemente editada -> candidato em ~1 consulta indexada.
+# 32 bandas x 4 linhas: Jaccard 0.5 vira candidato ~87% das vezes, 0.6 ~99%, 0.3 ~23%.
+MINHASH_LSH = True
+MINHASH_SHINGLE = 5
+MINHASH_BANDS = 32
+MINHASH_ROWS = 4
+MINHASH_MIN_JACCARD = 0.5  # estimativa mínima para virar candidato (índice em memória)
+MINHASH_MAX_CANDIDATES = 10
+# Snapshot colunar do banco (debug/banco_questoes.colunar -> ponteiro para a versão atual, mapeada em memória):
+# abre quase instantâneo na GUI/CLI; enunciados já normalizados (o validador não renormaliza)
+LOCAL_BANK_COLUMNAR = True
+
+
+def dprint(*args, **kwargs):
+    """Print de debug controlado por flag."""
+    if DEBUG:
+        print(*args, **kwargs)
+
+
+def _ensure_parent_dir(path_str: str) -> Path:
+    p = Path(path_str)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    return p
+
+
+# =========================
+# RE-RANK: TF-IDF DE N-GRAMAS DE CARACTERE
+# =========================
+# alfabeto do normalize_text: espaço + a-z + 0-9 -> códigos 0..36 (base 37)
+_NGRAM_BASE = 37
+_NGRAM_LUT = np.zeros(256, dtype=np.int64)
+_NGRAM_LUT[ord(" ")] = 0
+_NGRAM_LUT[ord("a"):ord("z") + 1] = np.arange(1, 27)
+_NGRAM_LUT[ord("0"):ord("9") + 1] = np.arange(27, 37)
+
+
+def char_ngram_codes(text_norm: str, n_min: int = NGRAM_MIN, n_max: int = NGRAM_MAX) -> np.ndarray:
+    """
+    Todos os n-gramas (n_min..n_max) do texto JÁ normalizado como inteiros, sem loop em Python:
+    código polinomial em base 37 + deslocamento por n (n-gramas de tamanhos diferentes não colidem).
+    """
+    b = np.frombuffer(f" {text_norm} ".encode("ascii", "ignore"), dtype=np.uint8)
+    sym = _NGRAM_LUT[b]
+    out = []
+    offset = 0
+    for n in range(n_min, n_max + 1):
+        if len(sym) >= n:
+            codes = np.zeros(len(sym) - n + 1, dtype=np.int64)
+            for k in range(n):
+                codes = codes * _NGRAM_BASE + sym[k: len(sym) - n + 1 + k]
+            out.append(codes + offset)
+        offset += _NGRAM_BASE ** n
+    return np.concatenate(out) if out else np.zeros(0, dtype=np.int64)
+
+
+class CharNgramIndex:
+    """
+    Matriz TF-IDF (linhas = documentos, L2-normalizadas) esparsa, feita só com arrays NumPy
+    e guardada por coluna (indptr/rows/data). Serve para o banco local ou para um pool de
+    candidatos da execução. Similaridade contra TODOS os documentos = 1 produto esparso vetorizado,
+    que só toca as listas dos n-gramas da consulta.
+    """
+
+    def __init__(self, keys: List[str], texts_norm: List[str]):
+        self.keys = list(keys)
+        n_docs = len(self.keys)
+
+        # por documento: n-gramas distintos (df conta 1x por doc) + contagem (tf)
+        uniq = [np.unique(char_ngram_codes(t), return_counts=True) for t in texts_norm]
+        per_doc = [u for u, _ in uniq]
+        counts_doc = [c for _, c in uniq]
+        lens = np.array([len(u) for u in per_doc], dtype=np.int64)
+        all_codes = np.concatenate(per_doc) if n_docs else np.zeros(0, dtype=np.int64)
+        all_tf = np.concatenate(counts_doc).astype(np.float32) if n_docs else np.zeros(0, dtype=np.float32)
+
+        # vocabulário = códigos distintos (ordenados, para searchsorted nas consultas)
+        self.vocab, inverse, df = np.unique(all_codes, return_inverse=True, return_counts=True)
+        self.idf = (np.log((1 + n_docs) / (1 + df)) + 1.0).astype(np.float32)
+
+        indices = inverse.astype(np.int32)
+        data = (1.0 + np.log(all_tf)) * self.idf[indices]  # tf sublinear
+        row_ids = np.repeat(np.arange(n_docs, dtype=np.int32), lens)
+        norms = np.sqrt(np.bincount(row_ids, weights=data.astype(np.float64) ** 2, minlength=n_docs))
+        norms[norms == 0] = 1.0
+        data = (data / norms[row_ids]).astype(np.float32)
+
+        # guardado por COLUNA (CSC): a consulta só lê as listas dos n-gramas que ela tem
+        order = np.argsort(indices, kind="stable")
+        self.col_rows = row_ids[order]
+        self.col_data = data[order]
+        self.col_indptr = np.concatenate(
+            [[0], np.cumsum(np.bincount(indices, minlength=len(self.vocab)))]
+        ).astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _query_vector(self, text_norm: str) -> Tuple[np.ndarray, np.ndarray]:
+        codes, tf = np.unique(char_ngram_codes(text_norm), return_counts=True)
+        pos = np.searchsorted(self.vocab, codes)
+        pos = np.clip(pos, 0, max(0, len(self.vocab) - 1))
+        known = (len(self.vocab) > 0) & (self.vocab[pos] == codes)
+        cols = pos[known]
+        w = (1.0 + np.log(tf[known].astype(np.float32))) * self.idf[cols]
+        norm = float(np.sqrt((w.astype(np.float64) ** 2).sum())) or 1.0
+        return cols, (w / norm).astype(np.float32)
+
+    def similarities(self, text_norm: str) -> np.ndarray:
+        """Cosseno da consulta contra todos os documentos (vetor de tamanho len(self))."""
+        if not len(self.keys):
+            return np.zeros(0, dtype=np.float32)
+        cols, w = self._query_vector(text_norm)
+        starts = self.col_indptr[cols]
+        lens = self.col_indptr[cols + 1] - starts
+        total = int(lens.sum())
+        if total == 0:
+            return np.zeros(len(self.keys), dtype=np.float64)
+        # posições de todas as listas concatenadas, sem loop: início de cada lista + deslocamento
+        seg_start = np.repeat(starts - np.concatenate([[0], np.cumsum(lens)[:-1]]), lens)
+        gather = seg_start + np.arange(total)
+        weights = self.col_data[gather] * np.repeat(w, lens)
+        return np.bincount(self.col_rows[gather], weights=weights, minlength=len(self.keys))
+
+    def top_k(self, text_norm: str, k: int) -> List[Tuple[str, float]]:
+        return self.top_k_from(self.similarities(text_norm), k)
+
+    def top_k_from(self, sims: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """Top-k de um vetor de similarities() já calculado (sem refazer o produto)."""
+        if not len(sims):
+            return []
+        k = min(k, len(sims))
+        idx = np.argpartition(-sims, k - 1)[:k]
+        idx = idx[np.argsort(-sims[idx])]
+        return [(self.keys[i], float(sims[i])) for i in idx if sims[i] > 0]
+
+
+# =========================
+# QUASE-DUPLICATAS: MINHASH + LSH
+# =========================
+_MINHASH_PERM = MINHASH_BANDS * MINHASH_ROWS
+_MINHASH_RNG = np.random.default_rng(20240601)  # semente fixa: assinaturas gravadas no banco continuam válidas
+_MINHASH_A = _MINHASH_RNG.integers(1, 2 ** 63, size=_MINHASH_PERM, dtype=np.uint64) | np.uint64(1)
+_MINHASH_B = _MINHASH_RNG.integers(0, 2 ** 63, size=_MINHASH_PERM, dtype=np.uint64)
+_LSH_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def minhash_signature(text_norm: str) -> np.ndarray:
+    """
+    Assinatura MinHash (MINHASH_BANDS * MINHASH_ROWS valores uint32) dos shingles de caractere
+    do texto JÁ normalizado. Hash multiply-shift: (a*x + b) mod 2^64, bits altos.
+    Texto sem shingles -> assinatura "vazia" (tudo 0xFFFFFFFF), que não casa com nada útil.
+    """
+    codes = np.unique(char_ngram_codes(text_norm, MINHASH_SHINGLE, MINHASH_SHINGLE)).astype(np.uint64)
+    if not len(codes):
+        return np.full(_MINHASH_PERM, 0xFFFFFFFF, dtype=np.uint32)
+    hashed = (codes[None, :] * _MINHASH_A[:, None] + _MINHASH_B[:, None]) >> np.uint64(32)
+    return hashed.min(axis=1).astype(np.uint32)
+
+
+def lsh_band_keys(sig: np.ndarray) -> np.ndarray:
+    """Uma chave int64 por banda (as MINHASH_ROWS linhas da banda misturadas num inteiro)."""
+    rows = sig.reshape(MINHASH_BANDS, MINHASH_ROWS).astype(np.uint64)
+    keys = np.zeros(MINHASH_BANDS, dtype=np.uint64)
+    for j in range(MINHASH_ROWS):
+        keys = (keys ^ rows[:, j]) * _LSH_MIX
+    return keys.view(np.int64)
+
+
+def minhash_jaccard(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """Estimativa de Jaccard = fração de posições iguais nas assinaturas."""
+    return float(np.mean(sig_a == sig_b))
+
+
+class MinHashLSH:
+    """
+    Índice LSH em memória (dict por banda). Serve para um lote de questões (dedupe
+    entre PDFs) ou para as questões já resolvidas na execução.
+    query() custa MINHASH_BANDS consultas em dict + as estimativas dos poucos candidatos.
+    """
+
+    def __init__(self):
+        self.buckets: List[Dict[int, List[str]]] = [dict() for _ in range(MINHASH_BANDS)]
+        self.signatures: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def add(self, key: str, text_norm: str) -> np.ndarray:
+        sig = minhash_signature(text_norm)
+        self.signatures[key] = sig
+        for band, bkey in enumerate(lsh_band_keys(sig).tolist()):
+            self.buckets[band].setdefault(bkey, []).append(key)
+        return sig
+
+    def query(self, text_norm: str, min_jaccard: float = MINHASH_MIN_JACCARD) -> List[Tuple[str, float]]:
+        """Quase-duplicatas (chave, Jaccard estimado), da mais parecida para a menos."""
+        sig = minhash_signature(text_norm)
+        cands = set()
+        for band, bkey in enumerate(lsh_band_keys(sig).tolist()):
+            cands.update(self.buckets[band].get(bkey, ()))
+        scored = [(k, minhash_jaccard(sig, self.signatures[k])) for k in cands]
+        scored = [(k, j) for k, j in scored if j >= min_jaccard]
+        scored.sort(key=lambda kv: -kv[1])
+        return scored
+
+
+def near_duplicate_groups(questoes: List[QuestionBlock], min_jaccard: float = MINHASH_MIN_JACCARD) -> List[List[int]]:
+    """
+    Agrupa questões quase iguais de um lote (vários PDFs/apostilas): índices em `questoes`.
+    Só grupos com 2+ questões. Os pares ainda precisam da validação completa antes de
+    compartilhar código (o LSH só aponta candidatos).
+    """
+    index = MinHashLSH()
+    parent = list(range(len(questoes)))
+
+    def root(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, q in enumerate(questoes):
+        texto = normalize_text(q.enunciado)
+        for key, _ in index.query(texto, min_jaccard):
+            parent[root(int(key))] = root(i)
+        index.add(str(i), texto)
+
+    grupos: Dict[int, List[int]] = {}
+    for i in range(len(questoes)):
+        grupos.setdefault(root(i), []).append(i)
+    return [g for g in grupos.values() if len(g) > 1]
+
+
+# =========================
+# STORE COLUNAR (ARQUIVO MAPEADO EM MEMÓRIA)
+# =========================
+_STORE_MAGIC = b"RQSTORE1"
+
+# texto: buffer UTF-8 contíguo + offsets (int64, n+1)
+_STORE_TEXT_COLS = ("code", "enunciado", "enunciado_norm", "enunciado_cmp")
+
+
+def _pack_texts(texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    encoded = [t.encode("utf-8") for t in texts]
+    off = np.zeros(len(encoded) + 1, dtype=np.int64)
+    off[1:] = np.cumsum([len(b) for b in encoded])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), off
+
+
+def _intern(values: List[Optional[str]]) -> Tuple[List[Optional[str]], np.ndarray]:
+    """Strings repetidas (especialidade, instituição) -> tabela + índice uint16 por registro."""
+    table: List[Optional[str]] = []
+    pos: Dict[Optional[str], int] = {}
+    idx = np.zeros(len(values), dtype=np.uint16)
+    for i, v in enumerate(values):
+        if v not in pos:
+            pos[v] = len(table)
+            table.append(v)
+        idx[i] = pos[v]
+    return table, idx
+
+
+class ColumnarQuestionStore:
+    """
+    Questões do site em colunas (em vez de lista de SiteQuestion com dict por registro):
+    - textos em buffers UTF-8 com offsets; enunciado já normalizado (2 formas do validador)
+    - alternativas achatadas (letra uint8 + texto) com início por questão
+    - especialidade/instituição internadas (tabela + uint16), AD em bitfield, ano int16 (0 = sem ano)
+    Arquivo: magic + tamanho do cabeçalho JSON + cabeçalho + arrays alinhados em 8 bytes.
+    load() mapeia o arquivo (mmap): nada é copiado até um registro ser lido.
+    O caminho "oficial" (banco_questoes.colunar) é só um ponteiro JSON para a versão atual
+    (banco_questoes.<versão>.colunar): no Windows não dá para substituir um arquivo que outro
+    processo (worker do pool, outra GUI) ainda tem mapeado, então cada save grava uma versão nova.
+    """
+
+    def __init__(self, n: int, arrays: Dict[str, np.ndarray], strings: Dict[str, List[Optional[str]]], meta=None):
+        self.n = n
+        self.arrays = arrays
+        self.strings = strings
+        self.meta: Dict[str, str] = dict(meta or {})
+        self._mm: Optional[mmap.mmap] = None
+        self._code_pos: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return self.n
+
+    @classmethod
+    def from_site_questions(cls, questions: Iterable[SiteQuestion], meta=None) -> "ColumnarQuestionStore":
+        qs = list(questions)
+        arrays: Dict[str, np.ndarray] = {}
+        cols = {
+            "code": [q.code for q in qs],
+            "enunciado": [q.enunciado for q in qs],
+            "enunciado_norm": [q.enunciado_norm or normalize_text(q.enunciado) for q in qs],
+            "enunciado_cmp": [q.enunciado_cmp or normalize_for_comparison(q.enunciado) for q in qs],
+        }
+        for name in _STORE_TEXT_COLS:
+            arrays[f"{name}_buf"], arrays[f"{name}_off"] = _pack_texts(cols[name])
+
+        letras: List[int] = []
+        alt_textos: List[str] = []
+        alt_start = np.zeros(len(qs) + 1, dtype=np.int64)
+        for i, q in enumerate(qs):
+            for letra, texto in q.alternativas.items():
+                letras.append(ord(letra[:1] or "?"))
+                alt_textos.append(texto)
+            alt_start[i + 1] = len(letras)
+        arrays["alt_buf"], arrays["alt_off"] = _pack_texts(alt_textos)
+        arrays["alt_letra"] = np.array(letras, dtype=np.uint8)
+        arrays["alt_start"] = alt_start
+
+        strings: Dict[str, List[Optional[str]]] = {}
+        strings["especialidade"], arrays["especialidade_idx"] = _intern([q.especialidade for q in qs])
+        strings["instituicao"], arrays["instituicao_idx"] = _intern([q.instituicao for q in qs])
+        arrays["ano"] = np.array([q.ano or 0 for q in qs], dtype=np.int16)
+        arrays["is_ad_bits"] = np.packbits(np.array([q.is_acesso_direto for q in qs], dtype=bool))
+        return cls(len(qs), arrays, strings, meta)
+
+    def save(self, path: str) -> None:
+        """
+        Grava uma versão nova ao lado e troca o ponteiro `path` no fim (quem estiver com a
+        versão antiga mapeada não quebra). Versões antigas são apagadas quando ninguém as usa mais.
+        """
+        layout: Dict[str, List] = {}
+        offset = 0
+        for name, arr in self.arrays.items():
+            layout[name] = [arr.dtype.str, offset, int(arr.size)]
+            offset += (arr.nbytes + 7) // 8 * 8
+        header = json.dumps(
+            {"n": self.n, "strings": self.strings, "meta": self.meta, "arrays": layout}, ensure_ascii=False
+        ).encode("utf-8")
+        header += b" " * (-(len(_STORE_MAGIC) + 8 + len(header)) % 8)
+
+        target = _ensure_parent_dir(path)
+        versao = target.with_name(f"{target.stem}.{time.time_ns()}{target.suffix}")
+        with open(versao, "wb") as f:
+            f.write(_STORE_MAGIC)
+            f.write(np.uint64(len(header)).tobytes())
+            f.write(header)
+            for arr in self.arrays.values():
+                raw = np.ascontiguousarray(arr).tobytes()
+                f.write(raw + b"\0" * (-len(raw) % 8))
+
+        # o ponteiro é pequeno e nunca fica mapeado: o replace atômico funciona também no Windows
+        tmp = target.with_suffix(target.suffix + ".tmp")
+        tmp.write_text(json.dumps({"arquivo": versao.name}), encoding="utf-8")
+        tmp.replace(target)
+
+        for antiga in target.parent.glob(f"{target.stem}.*{target.suffix}"):
+            if antiga == versao:
+                continue
+            try:
+                antiga.unlink()
+            except OSError as e:
+                dprint(f"    🗃️ Versão antiga do store ainda em uso ({antiga.name}): {e}; apago no próximo save")
+
+    @staticmethod
+    def resolve(path: str) -> Path:
+        """Ponteiro -> arquivo da versão atual (um store antigo, gravado direto no caminho, vale como está)."""
+        p = Path(path)
+        with open(p, "rb") as f:
+            inicio = f.read(len(_STORE_MAGIC))
+        if inicio == _STORE_MAGIC:
+            return p
+        try:
+            return p.with_name(json.loads(p.read_text(encoding="utf-8"))["arquivo"])
+        except (ValueError, KeyError) as e:
+            raise ValueError(f"Ponteiro do store colunar inválido: {path}") from e
+
+    @classmethod
+    def load(cls, path: str) -> "ColumnarQuestionStore":
+        path = str(cls.resolve(path))
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mm[: len(_STORE_MAGIC)] != _STORE_MAGIC:
+            mm.close()
+            raise ValueError(f"Arquivo não é um store colunar: {path}")
+        head_len = int(np.frombuffer(mm, dtype=np.uint64, count=1, offset=len(_STORE_MAGIC))[0])
+        base = len(_STORE_MAGIC) + 8
+        header = json.loads(bytes(mm[base: base + head_len]).decode("utf-8"))
+        base += head_len
+        arrays = {
+            name: np.frombuffer(mm, dtype=np.dtype(dt), count=count, offset=base + off)
+            for name, (dt, off, count) in header["arrays"].items()
+        }
+        store = cls(header["n"], arrays, header["strings"], header.get("meta"))
+        store._mm = mm
+        return store
+
+    def close(self) -> None:
+        # os arrays apontam para o mmap: soltar antes de fechar
+        self.arrays = {}
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                # um SiteQuestion/array ainda aponta para o mmap: ele fecha quando essa view for
+                # coletada. Não bloqueia o próximo save (versão nova), mas fica registrado.
+                print("⚠️ Store colunar ainda em uso por uma view viva; o mapeamento fecha quando ela for liberada.")
+            self._mm = None
+
+    def _text(self, col: str, i: int) -> str:
+        off = self.arrays[f"{col}_off"]
+        return bytes(self.arrays[f"{col}_buf"][off[i]: off[i + 1]]).decode("utf-8")
+
+    def code(self, i: int) -> str:
+        return self._text("code", i)
+
+    def enunciado_norm(self, i: int) -> str:
+        return self._text("enunciado_norm", i)
+
+    def is_acesso_direto(self, i: int) -> bool:
+        return bool((self.arrays["is_ad_bits"][i >> 3] >> (7 - (i & 7))) & 1)
+
+    def index_of(self, code: str) -> Optional[int]:
+        if self._code_pos is None:
+            buf = bytes(self.arrays["code_buf"]).decode("utf-8")
+            off = self.arrays["code_off"]
+            # offsets são de bytes; código é ASCII na prática, mas decodifica um a um se não for
+            if len(buf) == len(self.arrays["code_buf"]):
+                self._code_pos = {buf[off[i]: off[i + 1]]: i for i in range(self.n)}
+            else:
+                self._code_pos = {self.code(i): i for i in range(self.n)}
+        return self._code_pos.get(code)
+
+    def get(self, i: int) -> SiteQuestion:
+        a0, a1 = self.arrays["alt_start"][i], self.arrays["alt_start"][i + 1]
+        letras = self.arrays["alt_letra"]
+        alternativas = {chr(letras[j]): self._text("alt", j) for j in range(a0, a1)}
+        ano = int(self.arrays["ano"][i])
+        return SiteQuestion(
+            code=self.code(i),
+            enunciado=self._text("enunciado", i),
+            alternativas=alternativas,
+            is_acesso_direto=self.is_acesso_direto(i),
+            especialidade=self.strings["especialidade"][self.arrays["especialidade_idx"][i]] or "",
+            instituicao=self.strings["instituicao"][self.arrays["instituicao_idx"][i]],
+            ano=ano or None,
+            enunciado_norm=self.enunciado_norm(i),
+            enunciado_cmp=self._text("enunciado_cmp", i),
+        )
+
+    def get_many(self, codes: List[str]) -> List[SiteQuestion]:
+        out = []
+        for c in codes:
+            i = self.index_of(c)
+            if i is not None:
+                out.append(self.get(i))
+        return out
+
+
+# =========================
+# BANCO LOCAL (ESPELHO SQLITE)
+# =========================
+_BANK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    code TEXT PRIMARY KEY,
+    enunciado TEXT NOT NULL,
+    alternativas TEXT NOT NULL,      -- JSON {letra: texto}
+    especialidade TEXT NOT NULL DEFAULT '',
+    is_ad INTEGER NOT NULL DEFAULT 0,
+    instituicao TEXT,
+    ano INTEGER,
+    updated_at TEXT NOT NULL DEFAULT '',
+    busca TEXT NOT NULL DEFAULT ''   -- enunciado + alternativas normalizados (busca por substring)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# rowid = questions.rowid (o upsert mantém o rowid; o índice é atualizado junto)
+_BANK_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+    enunciado, alternativas,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# chaves LSH por banda (MinHash do enunciado): quase-duplicata = mesma (banda, bucket)
+_BANK_LSH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions_lsh (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    code TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_questions_lsh_bucket ON questions_lsh (band, bucket);
+CREATE INDEX IF NOT EXISTS idx_questions_lsh_code ON questions_lsh (code);
+"""
+
+_SQL_UPSERT_QUESTION = (
+    "INSERT INTO questions "
+    "(code, enunciado, alternativas, especialidade, is_ad, instituicao, ano, updated_at, busca) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(code) DO UPDATE SET "
+    "enunciado = excluded.enunciado, alternativas = excluded.alternativas, "
+    "especialidade = excluded.especialidade, is_ad = excluded.is_ad, instituicao = excluded.instituicao, "
+    "ano = excluded.ano, updated_at = excluded.updated_at, busca = excluded.busca"
+)
+
+_SQL_SELECT_SITE_QUESTION = "SELECT q.code, q.enunciado, q.alternativas, q.especialidade, q.is_ad, q.instituicao, q.ano"
+
+
+class LocalBank:
+    """
+    Espelho local das Question do admin (SQLite).
+    - sync completo na 1ª vez; depois só o que mudou desde a marca d'água (updatedAt)
+    - busca de candidatos sem tocar no site
+    - read_only=True (workers do MatchingService): abre como está, sem criar tabela, reconstruir
+      FTS/LSH nem regravar o store colunar (quem escreve é só o processo principal)
+    """
+
+    def __init__(self, path: str = LOCAL_BANK_PATH, read_only: bool = False):
+        self.read_only = read_only
+        self.store_path = str(Path(path).with_suffix(".colunar"))
+        self.store: Optional[ColumnarQuestionStore] = None
+        # índice TF-IDF dos enunciados: montado sob demanda em ngram_index()
+        self._ngram_index: Optional[CharNgramIndex] = None
+        self._ngram_pos: Dict[str, int] = {}
+
+        if read_only:
+            self.path = str(Path(path))
+            self.conn = sqlite3.connect(Path(path).resolve().as_uri() + "?mode=ro", uri=True, check_same_thread=False)
+            self.has_fts = LOCAL_BANK_FTS and self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'questions_fts'"
+            ).fetchone() is not None
+            if LOCAL_BANK_COLUMNAR:
+                self._open_store()
+            return
+
+        self.path = str(_ensure_parent_dir(path))
+        # pipeline: o estágio de recuperação usa o banco em outra thread (1 por vez)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.executescript(_BANK_SCHEMA)
+        if MINHASH_LSH:
+            self.conn.executescript(_BANK_LSH_SCHEMA)
+
+        self.has_fts = False
+        if LOCAL_BANK_FTS:
+            try:
+                self.conn.executescript(_BANK_FTS_SCHEMA)
+                self.has_fts = True
+            except sqlite3.OperationalError as e:
+                print(f"⚠️ SQLite sem FTS5 ({e}); banco local usa busca por substring.")
+        self.conn.commit()
+
+        if self.has_fts and self._fts_needs_rebuild():
+            self.rebuild_fts()
+        if MINHASH_LSH and self._lsh_needs_rebuild():
+            self.rebuild_lsh()
+
+        if LOCAL_BANK_COLUMNAR and self.count():
+            self._open_store()
+
+    def _open_store(self) -> None:
+        """
+        Abre o snapshot colunar; ausente ou desatualizado (marca d'água/contagem) -> regrava
+        (só leitura: fica sem store e lê da tabela).
+        """
+        try:
+            store = ColumnarQuestionStore.load(self.store_path)
+            if len(store) == self.count() and store.meta.get("watermark") == (self.get_meta("watermark") or ""):
+                self.store = store
+                return
+            store.close()
+        except (OSError, ValueError):
+            pass
+        if not self.read_only:
+            self.refresh_store()
+
+    def refresh_store(self) -> None:
+        """Regrava o snapshot colunar a partir da tabela (depois de um sync)."""
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+        t0 = time.time()
+        rows = self.conn.execute(f"{_SQL_SELECT_SITE_QUESTION} FROM questions q").fetchall()
+        store = ColumnarQuestionStore.from_site_questions(
+            (self._row_to_site_question(r) for r in rows), meta={"watermark": self.get_meta("watermark") or ""}
+        )
+        store.save(self.store_path)
+        self.store = ColumnarQuestionStore.load(self.store_path)
+        dprint(f"    🗃️ Store colunar: {len(rows)} questões em {time.time() - t0:.1f}s")
+
+    def _fts_needs_rebuild(self) -> bool:
+        n_fts = self.conn.execute("SELECT COUNT(*) FROM questions_fts").fetchone()[0]
+        return n_fts != self.count()
+
+    def rebuild_fts(self) -> None:
+        """Recria o índice FTS a partir da tabela (banco antigo ou índice dessincronizado)."""
+        print("🔧 Reconstruindo índice FTS do banco local...")
+        self.conn.execute("DELETE FROM questions_fts")
+        self.conn.execute(
+            "INSERT INTO questions_fts (rowid, enunciado, alternativas) "
+            "SELECT rowid, enunciado, (SELECT group_concat(value, ' ') FROM json_each(questions.alternativas)) "
+            "FROM questions"
+        )
+        self.conn.commit()
+
+    def _lsh_needs_rebuild(self) -> bool:
+        n_lsh = self.conn.execute("SELECT COUNT(*) FROM questions_lsh").fetchone()[0]
+        return n_lsh != self.count() * MINHASH_BANDS
+
+    def rebuild_lsh(self) -> None:
+        """Recalcula as bandas MinHash de todas as questões (banco antigo ou índice dessincronizado)."""
+        print("🔧 Reconstruindo índice de quase-duplicatas (MinHash) do banco local...")
+        self.conn.execute("DELETE FROM questions_lsh")
+        for code, enunciado in self.conn.execute("SELECT code, enunciado FROM questions").fetchall():
+            self._insert_lsh(code, enunciado)
+        self.conn.commit()
+
+    def _insert_lsh(self, code: str, enunciado: str) -> None:
+        keys = lsh_band_keys(minhash_signature(normalize_text(enunciado))).tolist()
+        self.conn.executemany(
+            "INSERT INTO questions_lsh (band, bucket, code) VALUES (?, ?, ?)",
+            [(band, bkey, code) for band, bkey in enumerate(keys)],
+        )
+
+    def close(self) -> None:
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+        self.conn.close()
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def codes(self) -> set:
+        return {r[0] for r in self.conn.execute("SELECT code FROM questions")}
+
+    def delete(self, codes: List[str]) -> None:
+        """Remove do espelho (tabela + FTS + LSH). O snapshot colunar sai de uso até o refresh_store()."""
+        if self.store is not None and codes:
+            self.store.close()
+            self.store = None
+        for code in codes:
+            row = self.conn.execute("SELECT rowid FROM questions WHERE code = ?", (code,)).fetchone()
+            if row is None:
+                continue
+            if self.has_fts:
+                self.conn.execute("DELETE FROM questions_fts WHERE rowid = ?", (row[0],))
+            if MINHASH_LSH:
+                self.conn.execute("DELETE FROM questions_lsh WHERE code = ?", (code,))
+            self.conn.execute("DELETE FROM questions WHERE code = ?", (code,))
+
+    def upsert(self, items: List[Tuple[SiteQuestion, str]]) -> None:
+        """items: (questão do site, updatedAt). O snapshot colunar sai de uso até o refresh_store()."""
+        if self.store is not None and items:
+            self.store.close()
+            self.store = None
+        for sq, updated_at in items:
+            alt_texto = " ".join(sq.alternativas.values())
+            self.conn.execute(
+                _SQL_UPSERT_QUESTION,
+                (
+                    sq.code, sq.enunciado, json.dumps(sq.alternativas, ensure_ascii=False),
+                    sq.especialidade, int(sq.is_acesso_direto), sq.instituicao, sq.ano, updated_at,
+                    normalize_text(sq.enunciado + " " + alt_texto),
+                ),
+            )
+            if self.has_fts:
+                rowid = self.conn.execute("SELECT rowid FROM questions WHERE code = ?", (sq.code,)).fetchone()[0]
+                self.conn.execute("DELETE FROM questions_fts WHERE rowid = ?", (rowid,))
+                self.conn.execute(
+                    "INSERT INTO questions_fts (rowid, enunciado, alternativas) VALUES (?, ?, ?)",
+                    (rowid, sq.enunciado, alt_texto),
+                )
+            if MINHASH_LSH:
+                self.conn.execute("DELETE FROM questions_lsh WHERE code = ?", (sq.code,))
+                self._insert_lsh(sq.code, sq.enunciado)
+
+    @staticmethod
+    def _row_to_site_question(row) -> SiteQuestion:
+        code, enunciado, alternativas, especialidade, is_ad, instituicao, ano = row
+        return SiteQuestion(
+            code=code, enunciado=enunciado, alternativas=json.loads(alternativas),
+            is_acesso_direto=bool(is_ad), especialidade=especialidade, instituicao=instituicao, ano=ano,
+        )
+
+    def get_many(self, codes: List[str]) -> List[SiteQuestion]:
+        if not codes:
+            return []
+        if self.store is not None:
+            return self.store.get_many(codes)
+        marks = ",".join("?" for _ in codes)
+        rows = self.conn.execute(f"{_SQL_SELECT_SITE_QUESTION} FROM questions q WHERE q.code IN ({marks})", codes).fetchall()
+        by_code = {r[0]: self._row_to_site_question(r) for r in rows}
+        return [by_code[c] for c in codes if c in by_code]
+
+    def ngram_index(self) -> "CharNgramIndex":
+        """Índice TF-IDF de n-gramas dos enunciados (montado 1x por execução, em memória)."""
+        if self._ngram_index is None or len(self._ngram_index) != self.count():
+            t0 = time.time()
+            if self.store is not None:
+                rows = [(self.store.code(i), self.store.enunciado_norm(i)) for i in range(len(self.store))]
+            else:
+                rows = [(c, normalize_text(e)) for c, e in self.conn.execute("SELECT code, enunciado FROM questions")]
+            self.use_ngram_index(CharNgramIndex([r[0] for r in rows], [r[1] for r in rows]))
+            dprint(f"    🧮 Índice TF-IDF: {len(rows)} enunciados em {time.time() - t0:.1f}s")
+        return self._ngram_index
+
+    def use_ngram_index(self, index: "CharNgramIndex") -> None:
+        """Adota um índice TF-IDF já montado (ex.: o do processo pai, no pool de matching)."""
+        self._ngram_index = index
+        self._ngram_pos = {code: i for i, code in enumerate(index.keys)}
+
+    def ngram_position(self, code: str) -> Optional[int]:
+        """Linha do código no índice TF-IDF (None se o código não está no índice)."""
+        return self._ngram_pos.get(code)
+
+    def search_substring(self, q: str, limit: int) -> List[SiteQuestion]:
+        """Mesmo comportamento do filtro do admin (substring), sobre o texto normalizado."""
+        needle = normalize_text(q)
+        if not needle:
+            return []
+        rows = self.conn.execute(
+            f"{_SQL_SELECT_SITE_QUESTION} FROM questions q WHERE instr(q.busca, ?) > 0 LIMIT ?",
+            (needle, limit),
+        ).fetchall()
+        return [self._row_to_site_question(r) for r in rows]
+
+    def search_near_duplicates(self, questao: QuestionBlock, limit: int = MINHASH_MAX_CANDIDATES) -> List[SiteQuestion]:
+        """Quase-duplicatas do enunciado (mais bandas em comum primeiro): 1 consulta indexada."""
+        keys = lsh_band_keys(minhash_signature(normalize_text(questao.enunciado))).tolist()
+        where = " OR ".join("(band = ? AND bucket = ?)" for _ in keys)
+        params = [v for band, bkey in enumerate(keys) for v in (band, bkey)]
+        rows = self.conn.execute(
+            f"SELECT code FROM questions_lsh WHERE {where} GROUP BY code ORDER BY COUNT(*) DESC LIMIT ?",
+            params + [limit],
+        ).fetchall()
+        return self.get_many([r[0] for r in rows])
+
+    def search_fts(self, match: str, limit: int) -> List[SiteQuestion]:
+        """Top-N candidatos por BM25 (enunciado pesa mais que alternativas); match = fts_query_for_question."""
+        if not match:
+            return []
+        rows = self.conn.execute(
+            f"{_SQL_SELECT_SITE_QUESTION} FROM questions_fts f JOIN questions q ON q.rowid = f.rowid "
+            "WHERE questions_fts MATCH ? ORDER BY bm25(questions_fts, 1.0, 0.5) LIMIT ?",
+            (match, limit),
+        ).fetchall()
+        return [self._row_to_site_question(r) for r in rows]
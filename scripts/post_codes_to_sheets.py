@@ -1,6 +1,7 @@
 import csv
 import json
 import os
+from contextlib import contextmanager
 from pathlib import Path
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
 
@@ -163,7 +164,31 @@ def close_note(page):
     page.wait_for_timeout(1000)
 
 
-def main(target_cell: str | None = None, *, headless: bool | None = None, csv_path: str | None = None, storage_state_path: str | None = None):
+@contextmanager
+def sheets_session(browser_service=None):
+    """
+    Página do Sheets:
+    - com browser_service (GUI): Firefox compartilhado, já com a sessão carregada; fica aberto
+    - sem: Firefox próprio, fechado ao sair
+    """
+    if browser_service is not None:
+        page, _context = browser_service.sheets_page(STORAGE_STATE, headless=HEADLESS)
+        yield page
+        return
+    with sync_playwright() as p:
+        # Use Firefox to match login session and bypass detection
+        browser = p.firefox.launch(headless=HEADLESS)
+        try:
+            context = browser.new_context(storage_state=STORAGE_STATE)
+            page = context.new_page()
+            # FIX: Inject stealth script to bypass Sheets detection
+            page.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+            yield page
+        finally:
+            browser.close()
+
+
+def main(target_cell: str | None = None, *, headless: bool | None = None, csv_path: str | None = None, storage_state_path: str | None = None, browser_service=None):
     global TARGET_CELL, HEADLESS, CSV_CODES_PATH, STORAGE_STATE
     if target_cell:
         TARGET_CELL = target_cell
@@ -177,20 +202,12 @@ def main(target_cell: str | None = None, *, headless: bool | None = None, csv_pa
     codes = read_codes(CSV_CODES_PATH)
     note_text = "\n".join(codes)
 
-    with sync_playwright() as p:
-        # Use Firefox to match login session and bypass detection
-        browser = p.firefox.launch(headless=HEADLESS)
-        # Ensure path is absolute or exists
-        if not Path(STORAGE_STATE).exists():
-             print(f"❌ ERRO: Arquivo de sessão não encontrado: {STORAGE_STATE}")
-             raise FileNotFoundError(f"Arquivo de sessão não encontrado: {STORAGE_STATE}")
-             
-        context = browser.new_context(storage_state=STORAGE_STATE)
-        page = context.new_page()
-        
-        # FIX: Inject stealth script to bypass Sheets detection
-        page.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    # Ensure path is absolute or exists
+    if not Path(STORAGE_STATE).exists():
+         print(f"❌ ERRO: Arquivo de sessão não encontrado: {STORAGE_STATE}")
+         raise FileNotFoundError(f"Arquivo de sessão não encontrado: {STORAGE_STATE}")
 
+    with sheets_session(browser_service) as page:
         print(f"🌍 Navegando para a Planilha (Tabela: {SHEET_ID} | Célula: {TARGET_CELL})...")
         # Navega para a URL com range parameter - isso já seleciona a célula
         try:
@@ -204,7 +221,6 @@ def main(target_cell: str | None = None, *, headless: bool | None = None, csv_pa
 
         if "accounts.google.com" in page.url:
             print("❌ Caiu no login do Google. Refaz o save da sessão (google_storage_state.json).")
-            browser.close()
             return
 
         # 1) Foca o grid
@@ -229,8 +245,6 @@ def main(target_cell: str | None = None, *, headless: bool | None = None, csv_pa
         print(f"✅ Nota criada/atualizada em {TARGET_CELL} com {len(codes)} códigos.")
         print("👉 Passe o mouse no triângulo da célula (canto) para ver a nota.")
 
-        browser.close()
-
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+QUESTÕES (ESTRUTURAS + TEXTO NORMALIZADO)
+
+Base comum do robo_pdf_para_codigos.py e do banco local (local_bank.py):
+   - QuestionBlock: questão lida do PDF
+   - SiteQuestion: questão do admin (listagem, API ou espelho local)
+   - normalize_text / normalize_for_comparison: as mesmas formas usadas na busca, no índice e no fuzzy
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from unidecode import unidecode
+
+
+# =========================
+# QUESTION STRUCTS
+# =========================
+@dataclass
+class QuestionBlock:
+    numero: Optional[int]
+    tipo: str
+    enunciado: str
+    alternativas: Dict[str, str]
+    texto_completo: str
+    instituicao: Optional[str] = None
+    ano: Optional[int] = None
+
+
+@dataclass
+class SiteQuestion:
+    code: str
+    enunciado: str
+    alternativas: Dict[str, str]
+    is_acesso_direto: bool
+    especialidade: str
+    instituicao: Optional[str] = None
+    ano: Optional[int] = None
+    # formas normalizadas pré-calculadas (store colunar); vazio = calcula na hora
+    enunciado_norm: str = field(default="", repr=False)
+    enunciado_cmp: str = field(default="", repr=False)
+
+
+# =========================
+# TEXTO NORMALIZADO
+# =========================
+def normalize_text(s: str) -> str:
+    s = (s or "").lower()
+    s = unidecode(s)
+    s = re.sub(r"[^a-z0-9\s]", " ", s)
+    s = re.sub(r"\s+", " ", s).strip()
+    return s
+
+
+def normalize_for_comparison(s: str) -> str:
+    s = normalize_text(s)
+    palavras_irrelevantes = [
+        "lembre se", "lembrese", "observe", "considere", "assinale",
+        "marque", "indique", "dessa forma", "nesse caso", "diante disso",
+        "portanto", "logo", "assim", "correta", "incorreta", "verdadeira",
+        "falsa", "correto", "incorreto",
+    ]
+    for palavra in palavras_irrelevantes:
+        s = s.replace(palavra, " ")
+    s = re.sub(r"\b\d+\b", "", s)
+    s = re.sub(r"\s+", " ", s).strip()
+    return s
@@ -29,6 +29,110 @@ EXTRAÇÃO DE QUESTÕES - (AD / ESP) - VERSÃO MELHORADA
    6) Validação com letras duplicadas: conta alternativas únicas, não letras
    7) Fallback extra: enunciado >= 92 + pelo menos 1 alternativa OK = aceita
 
+🏷️ CABEÇALHO DA PROVA:
+   8) "SES-DF 2022" / "UERJ-RJ 2024" viram QuestionBlock.instituicao / .ano
+      -> descarta linhas do site com ano diferente antes do fuzzy; instituição diferente só
+         perde no desempate (PDF e admin às vezes usam sigla x nome por extenso)
+      -> (opcional) vira filtro extra na URL do admin
+
+🩺 ESPECIALIDADE:
+   9) Especialidade inferida pelo título do PDF (ou pelos primeiros matches ALTA)
+      -> linhas de outras especialidades são validadas na mesma página, depois das da
+         especialidade e com desempate contra elas (ALTA de outra especialidade ainda ganha)
+
+🔎 QUERIES:
+  10) Alternativas também viram query; enunciado e alternativas são intercalados
+      pela seletividade estimada (enunciado curto -> alternativas primeiro)
+
+⚡ CÓDIGO SUSPEITO:
+  11) Código já conhecido (debug/codigos_conhecidos.json ou codigos_suspeitos=)
+      é conferido direto no registro (API do admin): 1 request em vez de busca+paginação
+
+⏩ PREFETCH:
+  12) Enquanto a página N é validada, a página N+1 já baixa (fetch na API do admin);
+      achou ALTA -> o prefetch é cancelado. API falhou -> navegação normal.
+      (PREFETCH_NEXT_PAGE=False por padrão até a API e a tabela serem conferidas como equivalentes)
+
+🏁 FAN-OUT:
+  13) Página 1 das FANOUT_TOP_K primeiras queries em paralelo, validadas na ordem de chegada;
+      a primeira ALTA cancela as outras requisições. Desligado por padrão (FANOUT_TOP_K = 1) até a
+      API de listagem ser conferida; mesmo ligado, só serve para achar match: contagem de linhas da
+      API não vai para o cache negativo nem esgota a query (a tabela relê a partir da página 1).
+
+🪜 CASCATA DE MATCHING:
+  14) tamanho/tokens raros -> enunciado com score_cutoff -> alternativas;
+      rejeições por tier aparecem no relatório final. O tier 1 é heurístico (pode recusar um
+      match que o fuzzy completo aceitaria); CASCADE_TIER1=False deixa só os tiers exatos
+
+🔀 ALTERNATIVAS ALINHADAS:
+  15) Alternativas comparadas por matriz PDF x site + melhor casamento 1-para-1
+      (letra repetida/realocada ou alternativas embaralhadas não derrubam o match).
+      Trocar de letra só quando o par ganha dos vizinhos por ALT_ALIGNMENT_MARGIN: alternativas
+      quase iguais entre si ("Apenas I e II" x "Apenas III") contam só na mesma letra
+
+💾 BANCO LOCAL:
+  16) Espelho SQLite das Question (debug/banco_questoes.sqlite): sync completo 1x,
+      depois incremental por updatedAt. Busca no espelho primeiro; site só se não achar ALTA.
+      Candidatos pelo índice FTS5 (BM25, sem acento): 1 consulta local + poucas validações.
+      Re-rank por TF-IDF de n-gramas de caractere (NumPy) + poucos extras que o FTS não viu.
+      Quase-duplicatas (MinHash + LSH em bandas) primeiro: mesma questão de outra apostila/edição.
+      Na execução, questão quase igual a uma já achada (ALTA) confere esse código direto.
+      Snapshot colunar (debug/banco_questoes.colunar): buffers UTF-8 + offsets, strings internadas,
+      AD em bitfield, enunciado já normalizado; abre por mmap (quase instantâneo).
+      Matching contra o banco em pool de processos (MATCH_WORKERS, opcional): o PDF inteiro é
+      validado em paralelo no início, sem travar o navegador.
+      Banco, store colunar e índices (FTS5, TF-IDF, MinHash) em scripts/local_bank.py; QuestionBlock,
+      SiteQuestion e a normalização de texto em scripts/question_model.py (base comum dos dois).
+
+📒 JOURNAL:
+  17) Cada questão resolvida vai na hora para debug/journal/<hash do PDF>.jsonl (código,
+      confiança, queries/requisições gastas). Caiu no meio? Rode de novo: retoma de onde parou.
+      Só as encontradas são retomadas; as não encontradas voltam à busca (o cache negativo filtra).
+      Teste sem o admin real: tools/fake_admin_server.py
+
+🏭 PIPELINE:
+  18) parse -> recuperação (banco local) -> validação -> site (navegador) -> escrita,
+      com filas limitadas entre os estágios e workers por estágio (PIPELINE_WORKERS);
+      relatório de vazão/profundidade de fila por estágio no fim. Estágios/filas em scripts/stage_pipeline.py.
+
+⏱️ PRAZOS:
+  19) Orçamento por questão (QUESTION_BUDGET_S + sobra das fáceis, até QUESTION_BUDGET_MAX_S)
+      e prazo da execução (RUN_DEADLINE_S / prazo_execucao_s=). Estourou -> melhor MEDIA/BAIXA.
+      Timeouts do Playwright/API saem do tempo que resta, não de constantes fixas.
+
+🧭 ORDEM POR CUSTO x CHANCE:
+  20) AD primeiro; as outras da mais barata/provável para a mais cara (memo, CERTO/ERRADO,
+      enunciado curto, seletividade da query, qualidade do parse; custo calibrado pelos journals).
+      O CSV continua na ordem do PDF.
+
+⏩ BUSCA ANYTIME:
+  21) Primeira MEDIA no site já é registrada e a execução segue; as queries que faltavam rodam
+      em fatias quando o navegador fica ocioso (1 página, ANYTIME_IDLE_SLICE_S, e confere a fila
+      de novo) e no fim da execução (1 query, ANYTIME_SLICE_S).
+      Achou ALTA -> troca no journal e no CSV (ANYTIME_SEARCH=False volta ao comportamento antigo).
+
+🚫 CACHE NEGATIVO:
+  22) debug/cache_negativo.json (com TTL): queries que o site respondeu com 0 linhas e, por questão
+      não encontrada, as queries já esgotadas. No próximo run elas são puladas: só variantes novas.
+
+🚦 GOVERNADOR DE REQUISIÇÕES:
+  23) Toda requisição ao admin passa por um token bucket (GOVERNOR_RATE_PER_S); a concorrência
+      (fan-out/prefetch) sobe devagar e cai pela metade com 429/5xx/timeout/resposta lenta (AIMD).
+      Limite atual, esperas e sinais de congestionamento no relatório do fim.
+  24) Timeouts adaptativos: p99 das últimas latências de cada tipo (goto/networkidle/results/api)
+      x ADAPTIVE_TIMEOUT_FACTOR, entre piso e teto; estouro entra na janela com o valor do timeout
+      (amostra censurada) e dobra o próximo; respostas boas devolvem a folga aos poucos. Relatório no fim.
+  25) Retry classificado (timeout/vazio/login/5xx) com backoff exponencial + jitter em toda chamada
+      ao site; circuit breaker pausa, confere a sessão (login de novo, se preciso) e retoma.
+      Headless não espera login manual: sessão caída para a execução com a instrução de como logar.
+      Site falhou no meio da busca: fica o melhor candidato já visto; sem nenhum, a questão não vai
+      para o journal e o próximo run tenta de novo.
+      Prazos, governador, timeouts adaptativos e retry/breaker (e as constantes deles) ficam em
+      scripts/site_control.py; o estado da execução é site_control.DEADLINES/GOVERNOR/LATENCIES/BREAKER.
+  26) Pela GUI, o navegador é o do scripts/browser_service.py: aberto 1x e logado, reaproveitado
+      entre extrações, envio ao Sheets e logins (main(..., browser_service=svc)).
+      Fechar a janela no meio de uma extração: ela para antes da próxima questão (o journal retoma).
+
 ✅ FIX IMPORTANTE (Playwright / Login):
    - Se debug/storage_state.json NÃO existir: abre navegador, você loga, e o script salva a sessão.
    - Se existir mas a sessão estiver expirada: abre, você loga, e o script regrava a sessão.
@@ -41,26 +145,97 @@ EXTRAÇÃO DE QUESTÕES - (AD / ESP) - VERSÃO MELHORADA
 
 from __future__ import annotations
 
+import hashlib
+import itertools
+import json
+import os
 import re
+import sys
+import threading
 import time
 import traceback
-from dataclasses import dataclass
+from datetime import datetime, timedelta
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from urllib.parse import quote_plus
 
 import fitz  # PyMuPDF
+import numpy as np
 import pandas as pd
 from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
 from playwright.sync_api import sync_playwright
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
 from unidecode import unidecode
 
+try:
+    from scripts.stage_pipeline import Pipeline, Stage
+except ImportError:  # rodando de dentro de scripts/ (python robo_pdf_para_codigos.py)
+    from stage_pipeline import Pipeline, Stage
+
+try:
+    from scripts.question_model import QuestionBlock, SiteQuestion, normalize_for_comparison, normalize_text
+except ImportError:
+    from question_model import QuestionBlock, SiteQuestion, normalize_for_comparison, normalize_text
+
+try:
+    from scripts import local_bank
+    from scripts.local_bank import LocalBank, MinHashLSH, near_duplicate_groups
+except ImportError:
+    import local_bank
+    from local_bank import LocalBank, MinHashLSH, near_duplicate_groups
+
+try:
+    from scripts import site_control
+    from scripts.site_control import (
+    CircuitBreaker,
+    DeadlineScheduler,
+    GOVERNOR_MAX_CONCURRENCY,
+    LatencyTracker,
+    LoginNecessario,
+    RequestGovernor,
+    SiteError,
+    SiteIndisponivel,
+    adaptive_timeout_ms,
+    governor_acquire,
+    governor_record,
+    is_login_url,
+    latency_record,
+    latency_timeout,
+    question_deadline_expired,
+    with_retry,
+)
+except ImportError:
+    import site_control
+    from site_control import (
+    CircuitBreaker,
+    DeadlineScheduler,
+    GOVERNOR_MAX_CONCURRENCY,
+    LatencyTracker,
+    LoginNecessario,
+    RequestGovernor,
+    SiteError,
+    SiteIndisponivel,
+    adaptive_timeout_ms,
+    governor_acquire,
+    governor_record,
+    is_login_url,
+    latency_record,
+    latency_timeout,
+    question_deadline_expired,
+    with_retry,
+)
+
 
 # =========================
 # CONFIG
 # =========================
 QUESTIONS_URL = "https://manager.eumedicoresidente.com.br/admin/resources/Question"
+# API JSON do AdminJS (mesmo cookie de sessão do navegador)
+QUESTIONS_API_URL = "https://manager.eumedicoresidente.com.br/admin/api/resources/Question"
 
 # >>> coloque seu PDF aqui (dentro de inputs/)
 PDF_PATH = r"inputs\EXTENSIVO_-_Sepse_Neonatal_e_InfecÃ§Ãµes_CongÃªnitas_-_APOSTILA_2025_20250331022148.pdf"
@@ -83,6 +258,29 @@ PARTIAL_ENUNCIADO = 88
 ALTERNATIVA_TOKEN_SET = 80
 ALTERNATIVA_PARTIAL = 83
 
+# Validação em lote (rapidfuzz.process.cdist/cpdist) - mesmas regras do caminho escalar
+BATCH_SCORING = True
+CDIST_WORKERS = -1  # -1 = todos os núcleos
+
+# Alternativas alinhadas por matriz (PDF x site) em vez de letra a letra (A<->A, B<->B...):
+# tolera letra repetida realocada no PDF e alternativas embaralhadas no site.
+# Par fora da mesma letra só conta se for inequívoco: o score dele tem que ganhar de todos os outros
+# da linha e da coluna por ALT_ALIGNMENT_MARGIN ("Apenas I e II" x "I, II e III" empatam -> não conta)
+ALT_ALIGNMENT = True
+ALT_ALIGNMENT_MARGIN = 15
+
+# Cascata barata antes do fuzzy completo:
+#   1) tamanho do enunciado (razão) + sobreposição de tokens raros — HEURÍSTICA: pode recusar
+#      candidato que o fuzzy completo aceitaria (enunciado curto contido num texto 6x maior passa
+#      no partial_ratio; erro de OCR em todos os tokens raros). CASCADE_TIER1=False = sem esse risco
+#   2) token_set/partial com score_cutoff no limiar de aceite (rapidfuzz sai cedo): mesma decisão
+#   3) alternativas (validação completa)
+MATCH_CASCADE = True
+CASCADE_TIER1 = True
+CASCADE_MAX_LEN_RATIO = 6.0  # partial_ratio aceita trecho contido, então só corta diferença gritante
+CASCADE_RARE_TOKEN_LEN = 6
+CASCADE_MIN_RARE_TOKENS = 3  # só exige sobreposição se os DOIS lados tiverem pelo menos N tokens raros
+
 # Paginação
 MAX_PAGES_GENERIC = 14
 MAX_PAGES_SPECIFIC = 6
@@ -93,12 +291,130 @@ ROWS_PER_PAGE_SPECIFIC = 25
 MAX_QUERY_CHARS = 1400
 REMOVE_PAREN_CONTENT = True
 
+# Queries pelas alternativas (enunciado curto/genérico: as alternativas é que discriminam)
+QUERY_ALTERNATIVAS = True
+ALT_QUERY_MIN_TOKENS = 2  # alternativa precisa de pelo menos N tokens "de conteúdo"
+ALT_QUERY_MAX_WORDS = 10
+SHORT_STEM_TOKENS = 8  # enunciado com menos tokens de conteúdo que isso = "curto"
+
+# Prefetch: enquanto valida a página N (CPU), a página N+1 já está baixando (fetch no navegador).
+# Usa a API JSON de listagem do AdminJS; se ela falhar, volta para a navegação normal.
+# Desligado por padrão: params.description da API ainda não foi conferido contra o texto da
+# tabela (get_rows) em todas as questões. Registros que não viram nenhuma linha -> navegação.
+PREFETCH_NEXT_PAGE = False
+
+# Fan-out: página 1 das K primeiras queries sai ao mesmo tempo (pela mesma API JSON do prefetch);
+# a primeira ALTA cancela o resto. K maior = menos latência, mais carga no admin.
+# Desligado (1 = sequencial) pelo mesmo motivo do PREFETCH_NEXT_PAGE: a API não foi conferida
+# contra a tabela. Ligado, as linhas da API só servem para achar match (nunca para dar a query por vazia/esgotada).
+FANOUT_TOP_K = 1
+
+# Governador de requisições ao admin (navegação, API, prefetch/fan-out), compartilhado pela execução:
+# token bucket + concorrência AIMD (taxa, rajada e reduções em scripts/site_control.py).
+# O fan-out usa min(FANOUT_TOP_K, limite) queries simultâneas.
+GOVERNOR_ENABLED = True
+
 # Sessão Playwright (site)
 STORAGE_STATE = "debug/storage_state.json"
 
 # Índices da tabela no admin
 SPECIALTY_TD_INDEX = 3
 
+# Propriedades do registro Question na API do AdminJS (record.params)
+RECORD_PARAM_CODE = "code"  # se não existir, usa record.id
+# o código exibido NÃO é necessariamente o record.id do AdminJS: registro por código = listagem
+# filtrada por filters.<RECORD_PARAM_CODE> (conferida por igualdade exata), nunca /records/<código>/show
+RECORD_LOOKUP_PER_PAGE = 10
+RECORD_PARAM_DESCRIPTION = "description"
+RECORD_PARAM_SPECIALTY = "specialty"
+
+# Banco local: espelho SQLite das Question do admin (sync completo 1x, depois incremental)
+# A busca tenta o espelho primeiro e só vai ao site se não achar ALTA.
+LOCAL_BANK_ENABLED = True  # caminho, FTS5, n-gramas, MinHash e store colunar em scripts/local_bank.py
+LOCAL_BANK_SYNC_ON_START = False  # True = sincroniza (incremental) no início de cada extração
+LOCAL_BANK_SYNC_PER_PAGE = 500
+# incremental: relê também o que mudou até N s ANTES da marca (mesmo updatedAt, edição durante a
+# paginação por offset); regravar é idempotente. Local com mais registros que o admin -> sync completo
+# (só ele descobre os apagados)
+LOCAL_BANK_SYNC_OVERLAP_S = 120
+LOCAL_BANK_MAX_CANDIDATES = 200  # por query
+# FTS5 (BM25, sem acento) sobre enunciado + alternativas: 1 consulta local -> top-N candidatos
+FTS_TOP_N = 25
+FTS_MAX_TERMS = 40
+# Re-rank por TF-IDF de n-gramas de caractere (3-5): aguenta hifenização/quebra de linha/ligaduras do PDF.
+# Candidatos (FTS + top do TF-IDF no banco inteiro) são reordenados pelo cosseno do enunciado.
+# Os do FTS (enunciado + alternativas no BM25) vão TODOS ao fuzzy: enunciado curto dá cosseno ruidoso
+# e a questão certa pode ter vindo pelas alternativas. O corte vale só para os extras do TF-IDF.
+LOCAL_BANK_TFIDF = True
+TFIDF_TOP_K = 20  # top do banco inteiro pelo cosseno
+TFIDF_KEEP = 8  # quantos extras do TF-IDF (fora do FTS) entram na validação fuzzy
+# Matching do banco local em processos (CPU): todas as questões do PDF são validadas em paralelo
+# logo no início, sem travar o Playwright nem o stdout da GUI. Opcional: 1 = desligado (padrão);
+# 0 = automático (núcleos, até MATCH_WORKERS_MAX); N = N processos. Workers sobem por spawn
+# (sem herdar threads/locks do Playwright), abrem o banco só para leitura e recebem o índice
+# TF-IDF já montado pelo processo principal.
+MATCH_WORKERS = 1
+MATCH_WORKERS_MAX = 4
+MATCH_BATCH_SIZE = 4  # questões por tarefa enviada a um processo
+RECORD_PARAM_UPDATED_AT = "updatedAt"
+
+# Verificação direta por código (código suspeito: run anterior, memo, outro PDF)
+VERIFY_KNOWN_CODES = True
+KNOWN_CODES_PATH = "debug/codigos_conhecidos.json"  # {fingerprint do enunciado: código}
+
+# Cache negativo (entre execuções): query que o site respondeu com 0 linhas não é refeita;
+# questão não encontrada guarda as queries que já esgotou -> no próximo run só variantes novas.
+NEGATIVE_CACHE_ENABLED = True
+NEGATIVE_CACHE_PATH = "debug/cache_negativo.json"
+NEGATIVE_QUERY_TTL_S = 3 * 24 * 3600  # o site ganha questões novas: "0 linhas" vence
+NEGATIVE_QUESTION_TTL_S = 14 * 24 * 3600
+
+# Journal (checkpoint): cada questão resolvida vai na hora para debug/journal/<hash do PDF>.jsonl.
+# Se o navegador/sessão cair, rodar de novo o mesmo PDF retoma de onde parou (main(retomar=False) refaz tudo).
+JOURNAL_ENABLED = True
+JOURNAL_DIR = "debug/journal"
+RESUME_FROM_JOURNAL = True
+
+# Pipeline da extração (scripts/stage_pipeline.py): parse -> recuperação (banco local) -> validação ->
+# site (navegador) -> escrita, ligados por filas limitadas. Workers por estágio em PIPELINE_WORKERS;
+# "site" e "escrita" são sempre 1 (Playwright sync só na thread que abriu o navegador; ordem do CSV).
+# "recuperacao" = 1 enquanto o banco local for uma conexão SQLite só.
+PIPELINE_WORKERS = {"recuperacao": 1, "validacao": 2}
+
+# Orçamento de tempo: prazo por questão (estourou -> fica a melhor MEDIA/BAIXA já vista) e prazo
+# da execução inteira. O que uma questão fácil não gasta vai para as difíceis (até o teto).
+# Timeouts do Playwright/API = tempo que ainda resta, limitado pelo teto de cada tipo de chamada.
+# Orçamento por questão (QUESTION_BUDGET_S/..._MAX_S) em scripts/site_control.py.
+RUN_DEADLINE_S: Optional[float] = None  # None = sem prazo para a execução
+TIMEOUT_GOTO_MS = 60000
+TIMEOUT_NETWORKIDLE_MS = 15000
+TIMEOUT_RESULTS_MS = 25000
+TIMEOUT_API_MS = 30000
+
+# Timeouts adaptativos: cada tipo de chamada (goto, networkidle, results, api) guarda as últimas
+# latências; timeout = p99 x fator, entre o piso do tipo e o teto acima (TIMEOUT_*_MS).
+# Estourou -> o próximo timeout daquele tipo dobra (dia lento não vira reload atrás de reload).
+# (janela, percentil, fator e pisos em scripts/site_control.py)
+ADAPTIVE_TIMEOUTS = True
+
+# Retry das chamadas ao site + circuit breaker: tentativas, backoff e pausas em scripts/site_control.py.
+
+# Ordem das questões: AD primeiro (ordem do PDF); o resto da mais barata/provável para a mais cara,
+# para bater TARGET_ENCONTRADAS com menos páginas carregadas. O CSV continua na ordem do PDF.
+COST_AWARE_ORDER = True
+COST_DEFAULT_HIT = 4.0  # requisições de uma questão achada (sem histórico no journal)
+COST_DEFAULT_MISS = 30.0  # requisições de uma questão que esgota as queries
+COST_MIN_HISTORY = 10  # entradas de journal necessárias para calibrar pelos runs anteriores
+
+# Busca "anytime": apareceu MEDIA -> registra já e segue para a próxima questão; as queries que
+# faltavam continuam em fatias quando o navegador fica ocioso e no fim da execução.
+# Achou ALTA -> substitui no journal e no CSV.
+ANYTIME_SEARCH = True
+ANYTIME_SLICE_S = 45.0  # prazo de cada fatia de upgrade do fim da execução (1 query)
+# Ocioso no meio da execução: fatia de 1 página só, para a questão que chegar não esperar uma query inteira
+ANYTIME_IDLE_SLICE_PAGES = 1
+ANYTIME_IDLE_SLICE_S = 15.0
+
 # Performance / early-stops
 MAX_QUERIES_PER_QUESTION = 12
 MAX_SEEN_CODES_BEFORE_STOP = 30
@@ -110,6 +426,34 @@ MEDIA_EARLY_MIN_ALT_RATIO = 0.70
 QUICK_STOP_AFTER_QUERIES = 5
 QUICK_STOP_MIN_SCORE = 88
 
+# Cabeçalho da prova ("SES-DF 2022", "UERJ-RJ 2024")
+# - pré-filtro: descarta linhas do site com ano diferente ANTES do fuzzy
+# - instituição diferente NÃO descarta (sigla x nome por extenso): só penaliza o rank
+# - filtros do admin: nome da propriedade no AdminJS (None = não manda na URL)
+HEADER_PREFILTER = True
+HEADER_INSTITUICAO_PENALTY = 50  # rank = score_enun*10 + alts (+1000 AD): ~5 pontos de enunciado
+HEADER_FILTER_INSTITUICAO_PARAM: Optional[str] = None  # ex.: "institution"
+HEADER_FILTER_ANO_PARAM: Optional[str] = None  # ex.: "year"
+
+# Especialidade da apostila (coluna SPECIALTY_TD_INDEX do admin)
+# - inferida pelo título do PDF ou pelos primeiros matches ALTA
+# - linhas de outra especialidade são validadas por último na página e perdem o desempate
+#   (ESPECIALIDADE_PENALTY < 1 ponto de enunciado): uma ALTA de fora ainda vence MEDIA/BAIXA de dentro
+ESPECIALIDADE_SCOPE = True
+ESPECIALIDADE_MIN_VOTOS = 3  # matches ALTA necessários para inferir pelo site
+ESPECIALIDADE_MIN_MAIORIA = 0.75
+ESPECIALIDADE_FILTER_PARAM: Optional[str] = None  # ex.: "specialty" (None = só ordena/desempata as linhas)
+ESPECIALIDADE_PENALTY = 5
+# palavras-chave casam por token inteiro do título; termina em "*" = prefixo de token ("neonat*")
+ESPECIALIDADE_KEYWORDS: Dict[str, List[str]] = {
+    "Pediatria": ["neonat*", "pediatr*", "lactente*", "puericultura", "crianca*", "congenit*", "aleitamento"],
+    "Obstetrícia": ["obstetr*", "gestac*", "gravidez", "pre natal", "prenatal", "parto", "partos", "puerper*", "gestante*"],
+    "Ginecologia": ["ginecolog*", "endometriose", "mama", "mamas", "climater*", "anticoncep*", "amenorreia"],
+    "Cirurgia": ["cirurg*", "trauma", "abdome agudo", "hernia*", "queimad*"],
+    "Medicina Preventiva": ["preventiva", "epidemiolog*", "sus", "vigilancia", "bioestat*", "saude coletiva"],
+    "Clínica Médica": ["cardiolog*", "pneumolog*", "nefrolog*", "endocrin*", "reumatolog*", "hematolog*", "gastro*"],
+}
+
 STOPWORDS = {
     "a", "o", "os", "as", "um", "uma", "uns", "umas",
     "de", "do", "da", "dos", "das",
@@ -120,6 +464,14 @@ STOPWORDS = {
     "sobre", "respeito", "relacao", "relacionada", "paciente",
 }
 
+# tokens que aparecem em quase toda questão: pesam pouco na seletividade da query
+GENERIC_QUERY_TOKENS = {
+    "diagnostico", "provavel", "mais", "conduta", "adequada", "adequado", "tratamento",
+    "exame", "melhor", "seguinte", "seguintes", "caso", "hipotese", "principal",
+    "deve", "ser", "esta", "indicada", "indicado", "afirmativa", "afirmativas", "item",
+    "anos", "idade", "mulher", "homem", "crianca", "apresenta", "quadro", "clinico",
+}
+
 
 # =========================
 # SMALL UTILS
@@ -134,27 +486,9 @@ def compact_spaces(s: str) -> str:
     return re.sub(r"\s+", " ", s).strip()
 
 
-def normalize_text(s: str) -> str:
-    s = (s or "").lower()
-    s = unidecode(s)
-    s = re.sub(r"[^a-z0-9\s]", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
-
-
-def normalize_for_comparison(s: str) -> str:
-    s = normalize_text(s)
-    palavras_irrelevantes = [
-        "lembre se", "lembrese", "observe", "considere", "assinale",
-        "marque", "indique", "dessa forma", "nesse caso", "diante disso",
-        "portanto", "logo", "assim", "correta", "incorreta", "verdadeira",
-        "falsa", "correto", "incorreto",
-    ]
-    for palavra in palavras_irrelevantes:
-        s = s.replace(palavra, " ")
-    s = re.sub(r"\b\d+\b", "", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+def question_fingerprint(enunciado: str) -> str:
+    """Hash estável do enunciado normalizado (chave de memo/cache entre runs e PDFs)."""
+    return hashlib.sha1(normalize_for_comparison(enunciado).encode("utf-8")).hexdigest()[:16]
 
 
 def count_pdf_alternatives(pdf_alts: Dict[str, str]) -> int:
@@ -166,6 +500,52 @@ def count_pdf_alternatives(pdf_alts: Dict[str, str]) -> int:
     return len(valores_unicos)
 
 
+# cabeçalho em maiúsculas (com acento: "SÃO PAULO 2022"): o ano pode vir colado no enunciado
+_CABECALHO_MAIUSC = re.compile(r"^\s*\(?\s*([A-ZÀ-Þ][A-ZÀ-Þ0-9\-/ ]*?)\s*[-–]?\s*((?:19|20)\d{2})\b")
+# com minúsculas ("Unicamp 2023"): só se o ano fechar o cabeçalho (")", ".", "-", ACESSO, fim da linha),
+# senão "Em 2019, paciente..." viraria instituição "Em"
+_CABECALHO_MISTO = re.compile(
+    r"^\s*\(?\s*([A-ZÀ-Þ][\w\-/ ]*?)\s*[-–]?\s*((?:19|20)\d{2})(?=[ \t]*(?:[).:\-–]|ACESSO\b|\r?\n|$))"
+)
+
+
+def extract_cabecalho(texto: str) -> Tuple[Optional[str], Optional[int]]:
+    """
+    Lê o cabeçalho da prova no início do texto: "SES-DF 2022 ACESSO DIRETO." -> ("SES-DF", 2022).
+    Aceita também o formato do site entre parênteses: "(UERJ-RJ 2024)", acentos ("SÃO PAULO")
+    e minúsculas ("(Unicamp 2023)").
+    """
+    m = _CABECALHO_MAIUSC.match(texto or "") or _CABECALHO_MISTO.match(texto or "")
+    if not m:
+        return None, None
+    instituicao = compact_spaces(m.group(1)).strip("-/ ") or None
+    return instituicao, int(m.group(2))
+
+
+def instituicao_tokens(instituicao: Optional[str]) -> set:
+    return set(normalize_text(instituicao or "").split())
+
+
+def header_conflicts(
+    pdf_inst: Optional[str],
+    pdf_ano: Optional[int],
+    site_inst: Optional[str],
+    site_ano: Optional[int],
+) -> bool:
+    """
+    True só quando os DOIS lados têm o ano e ele diverge (na dúvida, não descarta).
+    Instituição não entra aqui: ver instituicao_diverge (penalidade, não descarte).
+    """
+    return bool(pdf_ano and site_ano and pdf_ano != site_ano)
+
+
+def instituicao_diverge(pdf_inst: Optional[str], site_inst: Optional[str]) -> bool:
+    """Os dois lados têm instituição e nenhum token em comum ("UERJ" x "ESTADO DO RIO")."""
+    a = instituicao_tokens(pdf_inst)
+    b = instituicao_tokens(site_inst)
+    return bool(a and b and not (a & b))
+
+
 def is_certo_errado_alts(alts: Dict[str, str]) -> bool:
     if not alts:
         return False
@@ -236,18 +616,6 @@ def extract_text_from_page_range(pdf_path: str, start_page: int, end_page_exclus
     return full_text
 
 
-# =========================
-# QUESTION STRUCTS
-# =========================
-@dataclass
-class QuestionBlock:
-    numero: Optional[int]
-    tipo: str
-    enunciado: str
-    alternativas: Dict[str, str]
-    texto_completo: str
-
-
 # =========================
 # PARSING DAS QUESTÕES
 # =========================
@@ -331,8 +699,9 @@ def extract_questao_completa(block: str) -> QuestionBlock:
     tipo = "ACESSO_DIRETO" if "acesso direto" in texto_completo.lower() else "ESPECIALIDADE"
 
     texto = re.sub(r"^\s*\d+\.\s*", "", texto_completo)
+    instituicao, ano = extract_cabecalho(texto)
     texto = re.sub(r"^.*?\bACESSO\s+DIRETO\b\s*\.\s*", "", texto, flags=re.I | re.S)
-    texto = re.sub(r"^[A-Z\-\s0-9]+\d{4}.*?\.\s*", "", texto)
+    texto = re.sub(r"^[A-ZÀ-Þ\-\s0-9]+\d{4}.*?\.\s*", "", texto)
 
     match_alts = re.search(r"(?:\r?\n)\s*([A-E][\)\.]\s*|[A-E]\s*-\s*)", texto)
     if not match_alts:
@@ -360,6 +729,7 @@ def extract_questao_completa(block: str) -> QuestionBlock:
     if DEBUG and numero in DEBUG_QS:
         dprint(f"\n    📋 DEBUG PARSING Q{numero}:")
         dprint(f"       Tipo: {tipo}")
+        dprint(f"       Cabeçalho: {instituicao} {ano}")
         dprint(f"       Alternativas extraídas: {len(alternativas)} → {list(alternativas.keys())}")
         dprint(f"       Enunciado: {enunciado[:150]}...")
 
@@ -369,6 +739,8 @@ def extract_questao_completa(block: str) -> QuestionBlock:
         enunciado=enunciado,
         alternativas=alternativas,
         texto_completo=texto_completo,
+        instituicao=instituicao,
+        ano=ano,
     )
 
 
@@ -551,6 +923,84 @@ def build_queries_from_enunciado(enunciado: str) -> List[str]:
     return [q[0] for q in queries]
 
 
+def estimate_query_selectivity(q: str) -> float:
+    """
+    Estimativa barata de quão seletiva é a query no filtro por substring do admin.
+    Tokens longos e raros pesam mais; tokens genéricos ("diagnóstico", "provável") quase nada.
+    Só os 8 primeiros tokens contam (query longa demais fica frágil, não mais seletiva).
+    """
+    toks = _tokenize_for_query(q)
+    if not toks:
+        return 0.0
+    score = 0.0
+    for t in toks[:8]:
+        if t in GENERIC_QUERY_TOKENS or len(t) <= 2:
+            score += 0.2
+        else:
+            score += min(len(t), 12) / 4.0
+    return round(score, 2)
+
+
+def build_queries_from_alternativas(alternativas: Dict[str, str]) -> List[str]:
+    """Queries a partir das alternativas (texto cru, como aparece no site)."""
+    out: List[str] = []
+    for letra in ["A", "B", "C", "D", "E"]:
+        alt = compact_spaces(alternativas.get(letra, ""))
+        if not alt or alt.upper() in ("CERTO", "ERRADO"):
+            continue
+        if len(_tokenize_for_query(alt)) < ALT_QUERY_MIN_TOKENS:
+            continue
+        words = alt.rstrip(".;").split()
+        q = " ".join(words[:ALT_QUERY_MAX_WORDS])
+        if q not in out:
+            out.append(q)
+    return out
+
+
+def build_queries_for_question(questao: QuestionBlock) -> List[str]:
+    """
+    Junta queries do enunciado e das alternativas, intercalando pela seletividade estimada.
+    - enunciado mantém sua ordem de prioridade (só compara "cabeças" das duas listas)
+    - alternativas entram ordenadas da mais seletiva para a menos
+    - enunciado curto/genérico: alternativas começam na frente
+    """
+    enun_qs = build_queries_from_enunciado(questao.enunciado)
+    if not QUERY_ALTERNATIVAS:
+        return enun_qs
+
+    alt_qs = build_queries_from_alternativas(questao.alternativas)
+    if not alt_qs:
+        return enun_qs
+
+    alt_scored = sorted(((estimate_query_selectivity(q), q) for q in alt_qs), key=lambda x: -x[0])
+    enun_scored = [(estimate_query_selectivity(q), q) for q in enun_qs]
+
+    stem_curto = len(_tokenize_for_query(questao.enunciado)) < SHORT_STEM_TOKENS
+    bonus_alt = 1.5 if stem_curto else 0.0
+
+    merged: List[str] = []
+    i = j = 0
+    while i < len(enun_scored) or j < len(alt_scored):
+        take_alt = j < len(alt_scored) and (
+            i >= len(enun_scored) or alt_scored[j][0] + bonus_alt > enun_scored[i][0]
+        )
+        if take_alt:
+            q = alt_scored[j][1]
+            j += 1
+        else:
+            q = enun_scored[i][1]
+            i += 1
+        if q not in merged:
+            merged.append(q)
+
+    if DEBUG and questao.numero in DEBUG_QS:
+        dprint(f"    🔎 DEBUG QUERIES Q{questao.numero} (stem curto={stem_curto}):")
+        for q in merged[:MAX_QUERIES_PER_QUESTION]:
+            dprint(f"       {estimate_query_selectivity(q):5.2f}  {q[:80]}")
+
+    return merged
+
+
 def query_is_generic(q: str) -> bool:
     return len(q.strip().split()) <= 2
 
@@ -566,13 +1016,11 @@ def rows_limit_for_query(q: str) -> int:
 # =========================
 # SITE STRUCTS
 # =========================
-@dataclass
-class SiteQuestion:
-    code: str
-    enunciado: str
-    alternativas: Dict[str, str]
-    is_acesso_direto: bool
-    especialidade: str
+def site_enunciado_norms(sq: SiteQuestion) -> Tuple[str, str]:
+    """(normalize_text, normalize_for_comparison) do enunciado do site, usando o pré-calculado se houver."""
+    if sq.enunciado_norm:
+        return sq.enunciado_norm, sq.enunciado_cmp
+    return normalize_text(sq.enunciado), normalize_for_comparison(sq.enunciado)
 
 
 @dataclass
@@ -585,38 +1033,382 @@ class MatchResult:
     especialidade: str
 
 
+@dataclass
+class SearchScope:
+    """Estado da execução compartilhado pelas buscas (especialidade, códigos suspeitos, banco local)."""
+    especialidade: Optional[str] = None
+    origem: str = ""
+    votos: Dict[str, int] = field(default_factory=dict)
+    codigos_suspeitos: Dict[int, str] = field(default_factory=dict)  # nº da questão no PDF -> código
+    banco_local: Optional["LocalBank"] = None
+    resolvidas: Optional["MinHashLSH"] = None  # enunciados já achados com ALTA nesta execução (chave = código)
+    # matching do banco local já enviado ao pool: fingerprint -> (especialidade usada, Future)
+    resultados_locais: Dict[str, Tuple[Optional[str], Future]] = field(default_factory=dict)
+    upgrades: List["UpgradeTask"] = field(default_factory=list)  # buscas anytime paradas numa MEDIA
+    codigos_conhecidos: Dict[str, str] = field(default_factory=dict)  # KNOWN_CODES_PATH, lido 1x por execução
+
+    def registrar_match(self, result: MatchResult) -> None:
+        """
+        Conta votos dos matches ALTA; com maioria clara, fixa a especialidade
+        (e corrige a inferida pelo título, se o site usar outro nome).
+        """
+        if result.confianca != "ALTA" or not result.especialidade:
+            return
+        self.votos[result.especialidade] = self.votos.get(result.especialidade, 0) + 1
+        total = sum(self.votos.values())
+        if total < ESPECIALIDADE_MIN_VOTOS:
+            return
+        esp, n = max(self.votos.items(), key=lambda kv: kv[1])
+        if esp != self.especialidade and n / total >= ESPECIALIDADE_MIN_MAIORIA:
+            self.especialidade = esp
+            self.origem = f"matches ({n}/{total})"
+            print(f"  🩺 Especialidade inferida pelos matches: {esp} ({n}/{total})")
+
+    def registrar_resolvida(self, questao: QuestionBlock, result: MatchResult) -> None:
+        if result.confianca == "ALTA" and self.resolvidas is not None:
+            self.resolvidas.add(result.code, normalize_text(questao.enunciado))
+
+    def resultado_local(self, questao: QuestionBlock, especialidade: Optional[str]) -> Optional[MatchResult]:
+        """Resultado do banco local: do pool (se foi enviado com a mesma especialidade) ou calculado aqui."""
+        pendente = self.resultados_locais.pop(question_fingerprint(questao.enunciado), None)
+        if pendente is not None and pendente[0] == especialidade:
+            try:
+                return pendente[1].result()
+            except Exception as e:
+                print(f"  ⚠️ Matching em processo falhou ({e}); validando aqui.")
+        return find_code_in_local_bank(self.banco_local, questao, especialidade)
+
+    def codigo_quase_duplicata(self, questao: QuestionBlock) -> Optional[str]:
+        """Código de uma questão já resolvida quase igual a esta (mesmo lote/execução)."""
+        if self.resolvidas is None or not len(self.resolvidas):
+            return None
+        dups = self.resolvidas.query(normalize_text(questao.enunciado))
+        return dups[0][0] if dups else None
+
+
+def infer_especialidade_from_title(pdf_path: str) -> Optional[str]:
+    """Tema da apostila -> especialidade (nome do arquivo + título nos metadados do PDF)."""
+    partes = [Path(pdf_path).stem.replace("_", " ")]
+    try:
+        doc = fitz.open(pdf_path)
+        partes.append((doc.metadata or {}).get("title") or "")
+        doc.close()
+    except Exception:
+        pass
+    tokens = normalize_text(" ".join(partes)).split()
+
+    melhor, melhor_n = None, 0
+    for esp, kws in ESPECIALIDADE_KEYWORDS.items():
+        n = sum(1 for kw in kws if _keyword_no_titulo(kw, tokens))
+        if n > melhor_n:
+            melhor, melhor_n = esp, n
+    return melhor
+
+
+def _keyword_no_titulo(kw: str, tokens: List[str]) -> bool:
+    """Palavra-chave (1+ palavras) como sequência de tokens inteiros; "x*" casa o início do token."""
+    partes = kw.split()
+    for i in range(len(tokens) - len(partes) + 1):
+        if all(
+            tokens[i + j].startswith(p[:-1]) if p.endswith("*") else tokens[i + j] == p
+            for j, p in enumerate(partes)
+        ):
+            return True
+    return False
+
+
+def _especialidade_tokens(esp: str) -> set:
+    return {t for t in normalize_text(esp).split() if t not in STOPWORDS}
+
+
+def especialidade_compativel(alvo: Optional[str], site_esp: str) -> bool:
+    """Por tokens inteiros: "Ginecologia" cabe em "Ginecologia e Obstetrícia"; "Pediatria" x "Neonatologia" não."""
+    if not alvo or not site_esp:
+        return True
+    a = _especialidade_tokens(alvo)
+    b = _especialidade_tokens(site_esp)
+    if not a or not b:
+        return True
+    return a <= b or b <= a
+
+
 # =========================
 # SITE HELPERS
 # =========================
-def goto_filter_page(page, q: str, page_num: int):
+def header_filters_for(questao: QuestionBlock) -> Dict[str, str]:
+    """Filtros extras do admin (instituição/ano) para a URL da listagem."""
+    filters: Dict[str, str] = {}
+    if HEADER_FILTER_INSTITUICAO_PARAM and questao.instituicao:
+        filters[HEADER_FILTER_INSTITUICAO_PARAM] = questao.instituicao
+    if HEADER_FILTER_ANO_PARAM and questao.ano:
+        filters[HEADER_FILTER_ANO_PARAM] = str(questao.ano)
+    return filters
+
+
+@dataclass
+class SearchCost:
+    """Custo da busca de UMA questão no site (vai para o journal)."""
+    queries: int = 0
+    requisicoes: int = 0  # navegações + chamadas à API + prefetches
+    inicio: float = field(default_factory=time.time)
+
+    def segundos(self) -> float:
+        return round(time.time() - self.inicio, 1)
+
+
+SEARCH_COST = SearchCost()
+
+
+def goto_filter_page(page, q: str, page_num: int, extra_filters: Optional[Dict[str, str]] = None):
+    SEARCH_COST.requisicoes += 1
     url = f"{QUESTIONS_URL}?page={page_num}&filters.description={quote_plus(q)}"
-    page.goto(url, wait_until="domcontentloaded", timeout=60000)
+    for k, v in (extra_filters or {}).items():
+        url += f"&filters.{k}={quote_plus(v)}"
+    governor_acquire()
+    inicio = time.time()
+    try:
+        resp = page.goto(url, wait_until="domcontentloaded", timeout=adaptive_timeout_ms("goto", TIMEOUT_GOTO_MS))
+    except PlaywrightTimeoutError:
+        governor_record(None, inicio)
+        latency_timeout("goto", inicio)
+        raise
+    status = resp.status if resp is not None else 200
+    governor_record(status, inicio)
+    latency_record("goto", inicio)
+    if status >= 500:
+        raise SiteError("5xx", f"listagem respondeu {status}")
+    if is_login_url(page.url):
+        raise SiteError("login", "redirecionado para o login")
+
+
+def get_rows(page) -> List[Dict[str, str]]:
+    """Lê as linhas da tabela da listagem já renderizada ({code, desc, esp})."""
+    return page.evaluate(
+        f"""() => {{
+            const out = [];
+            const trs = Array.from(document.querySelectorAll('table tbody tr'));
+            for (const tr of trs) {{
+                const tds = tr.querySelectorAll('td');
+                if (!tds || tds.length < {SPECIALTY_TD_INDEX + 1}) continue;
+
+                const code = (tds[1]?.innerText || '').trim();
+                const desc = (tds[2]?.innerText || '').trim();
+                const esp  = (tds[{SPECIALTY_TD_INDEX}]?.innerText || '').trim();
+
+                if (code && desc) out.push({{code, desc, esp}});
+            }}
+            return out;
+        }}"""
+    )
+
+
+def fetch_rows_ui(page, q: str, page_num: int, extra_filters: Optional[Dict[str, str]] = None) -> List[Dict[str, str]]:
+    """Navega até a página da listagem e lê as linhas (timeout/5xx/login/vazia: with_retry)."""
+    def carregar() -> List[Dict[str, str]]:
+        goto_filter_page(page, q, page_num, extra_filters)
+        wait_results(page)
+        return get_rows(page)
+
+    return with_retry(carregar, "listagem", repetir_vazio=True)
+
+
+def api_list_url(q: str, page_num: int, per_page: int, extra_filters: Optional[Dict[str, str]] = None) -> str:
+    url = f"{QUESTIONS_API_URL}/actions/list?page={page_num}&perPage={per_page}&filters.description={quote_plus(q)}"
+    for k, v in (extra_filters or {}).items():
+        url += f"&filters.{k}={quote_plus(v)}"
+    return url
+
+
+def api_records_to_rows(data: Optional[Dict]) -> Optional[List[Dict[str, str]]]:
+    """
+    JSON da listagem -> linhas. None = resposta não serve (quem chamou usa a navegação):
+    sem "records", ou registros que não rendem NENHUMA linha com código e texto
+    (propriedades diferentes de RECORD_PARAM_*; não é o mesmo que uma página vazia).
+    """
+    if data is None or "records" not in data:
+        return None
+    records = data.get("records") or []
+    rows = [record_to_row(rec) for rec in records]
+    rows = [r for r in rows if r["code"] and r["desc"]]
+    if records and not rows:
+        dprint(f"    ⚠️ API devolveu {len(records)} registros sem código/texto utilizáveis; usando a tabela")
+        return None
+    return rows
+
+
+def api_list_rows(
+    page, q: str, page_num: int, per_page: int, extra_filters: Optional[Dict[str, str]] = None
+) -> Optional[List[Dict[str, str]]]:
+    """Uma página da listagem pela API JSON. None = API indisponível (usa navegação)."""
+    url = api_list_url(q, page_num, per_page, extra_filters)
+    try:
+        return with_retry(lambda: api_records_to_rows(api_get_json(page, url)), "API de listagem")
+    except Exception as e:
+        dprint(f"    ⚠️ API de listagem falhou: {e}")
+        return None
+
+
+# fetch() dentro do navegador: roda em paralelo com o Python (a API sync do Playwright bloqueia)
+# cada prefetch resolve para {status, data, ms} (status 0 = erro de rede, -1 = prazo acabou)
+_JS_PREFETCH_START = """([key, url]) => {
+    window.__roboPrefetch = window.__roboPrefetch || {};
+    const ctrl = new AbortController();
+    const t0 = performance.now();
+    const p = fetch(url, {credentials: 'include', signal: ctrl.signal, headers: {'Accept': 'application/json'}})
+        .then(async r => ({status: r.status, data: r.ok ? await r.json().catch(() => null) : null}))
+        .catch(() => ({status: 0, data: null}))
+        .then(res => Object.assign(res, {ms: performance.now() - t0}));
+    window.__roboPrefetch[key] = {ctrl, p};
+    return true;
+}"""
+
+_JS_PREFETCH_COLLECT = """async ([key, ms]) => {
+    const e = (window.__roboPrefetch || {})[key];
+    if (!e) return null;
+    const res = await Promise.race([e.p, new Promise(r => setTimeout(() => r(undefined), ms))]);
+    if (res === undefined) e.ctrl.abort();  // prazo acabou: não deixa o fetch pendurado
+    delete window.__roboPrefetch[key];
+    return res === undefined ? {status: -1, data: null, ms} : res;
+}"""
+
+_JS_PREFETCH_CANCEL = """(key) => {
+    const e = (window.__roboPrefetch || {})[key];
+    if (!e) return false;
+    e.ctrl.abort();
+    delete window.__roboPrefetch[key];
+    return true;
+}"""
+
+_JS_PREFETCH_RACE = """async ([keys, ms]) => {
+    const store = window.__roboPrefetch || {};
+    const live = keys.filter(k => store[k]);
+    if (!live.length) return {perdidas: true};  // navegação apagou o store: não é timeout
+    const timeout = new Promise(r => setTimeout(() => r(null), ms));
+    const r = await Promise.race([timeout, ...live.map(k => store[k].p.then(res => ({key: k, ...res})))]);
+    if (r) delete store[r.key];
+    return r;  // null = ninguém chegou dentro do prazo
+}"""
+
+_prefetch_seq = 0
+# chaves disparadas que ainda ocupam um slot do governador: cada uma é liberada UMA vez, pelo
+# Python (erro no evaluate, chave sumida do navegador ou navegação no meio não vazam o slot)
+_prefetch_em_voo: set = set()
+
+
+def _liberar_prefetch(key: str) -> None:
+    if key in _prefetch_em_voo:
+        _prefetch_em_voo.discard(key)
+        if site_control.GOVERNOR is not None:
+            site_control.GOVERNOR.liberar()
+
+
+def start_prefetch(page, url: str) -> Optional[str]:
+    """Dispara o download em segundo plano no navegador e devolve a chave para buscar depois."""
+    global _prefetch_seq
+    _prefetch_seq += 1
+    governor_acquire()
+    SEARCH_COST.requisicoes += 1
+    key = f"p{_prefetch_seq}"
+    try:
+        page.evaluate(_JS_PREFETCH_START, [key, url])
+    except Exception as e:
+        dprint(f"    ⚠️ Prefetch não iniciou: {e}")
+        return None
+    _prefetch_em_voo.add(key)
+    if site_control.GOVERNOR is not None:
+        site_control.GOVERNOR.disparou()
+    return key
+
+
+def _prefetch_result(res: Optional[Dict]) -> Optional[Dict]:
+    """{status, data, ms} do navegador -> governador e histograma de latência; devolve o JSON da resposta."""
+    if not res:
+        return None
+    status, latencia_s = res.get("status"), (res.get("ms") or 0) / 1000
+    if site_control.GOVERNOR is not None:
+        site_control.GOVERNOR.registrar(None if status == -1 else status, latencia_s)
+    if site_control.LATENCIES is not None:
+        if status == -1:
+            site_control.LATENCIES.estourou("api", latencia_s)
+        elif status:
+            site_control.LATENCIES.registrar("api", latencia_s)
+    return res.get("data")
+
+
+def collect_prefetch(page, key: str) -> Optional[List[Dict[str, str]]]:
+    """Espera (se ainda precisar) o prefetch terminar e devolve as linhas."""
+    try:
+        res = page.evaluate(_JS_PREFETCH_COLLECT, [key, adaptive_timeout_ms("api", TIMEOUT_API_MS)])
+    except Exception:
+        return None
+    finally:
+        _liberar_prefetch(key)
+    return api_records_to_rows(_prefetch_result(res))
+
+
+def race_prefetch(page, keys: List[str]) -> Optional[Tuple[str, Optional[List[Dict[str, str]]]]]:
+    """Espera o PRIMEIRO dos prefetches pendentes terminar: (chave, linhas | None)."""
+    try:
+        timeout_ms = adaptive_timeout_ms("api", TIMEOUT_API_MS)
+        inicio = time.time()
+        r = page.evaluate(_JS_PREFETCH_RACE, [keys, timeout_ms])
+    except Exception:
+        return None
+    if r and r.get("perdidas"):
+        return None
+    if not r:
+        if site_control.GOVERNOR is not None:
+            site_control.GOVERNOR.registrar(None, timeout_ms / 1000)
+        latency_timeout("api", inicio)
+        return None
+    _liberar_prefetch(r["key"])
+    return r["key"], api_records_to_rows(_prefetch_result(r))
+
+
+def cancel_prefetch(page, key: str) -> None:
+    try:
+        page.evaluate(_JS_PREFETCH_CANCEL, key)
+    except Exception:
+        pass
+    finally:
+        _liberar_prefetch(key)
 
 
 def wait_results(page) -> None:
+    inicio = time.time()
     try:
-        page.wait_for_load_state("networkidle", timeout=15000)
+        page.wait_for_load_state("networkidle", timeout=adaptive_timeout_ms("networkidle", TIMEOUT_NETWORKIDLE_MS))
+        latency_record("networkidle", inicio)
     except PlaywrightTimeoutError:
-        pass
+        latency_timeout("networkidle", inicio)
 
-    page.wait_for_function(
-        """() => {
-            const trs = document.querySelectorAll('table tbody tr');
-            if (trs && trs.length > 0) return true;
-            const t = document.body ? document.body.innerText : '';
-            if (t.includes('Nenhum') && t.includes('registro')) return true;
-            if (t.includes('No records')) return true;
-            return false;
-        }""",
-        timeout=25000,
-    )
+    inicio = time.time()
+    try:
+        page.wait_for_function(
+            """() => {
+                const trs = document.querySelectorAll('table tbody tr');
+                if (trs && trs.length > 0) return true;
+                const t = document.body ? document.body.innerText : '';
+                if (t.includes('Nenhum') && t.includes('registro')) return true;
+                if (t.includes('No records')) return true;
+                return false;
+            }""",
+            timeout=adaptive_timeout_ms("results", TIMEOUT_RESULTS_MS),
+        )
+    except PlaywrightTimeoutError:
+        latency_timeout("results", inicio)
+        raise
+    latency_record("results", inicio)
 
 
-def parse_listagem_texto(raw: str) -> Tuple[str, Dict[str, str], bool]:
+def parse_listagem_texto(raw: str) -> Tuple[str, Dict[str, str], bool, Optional[str], Optional[int]]:
     lines = [l.strip() for l in (raw or "").splitlines() if l.strip()]
     is_ad = any("ACESSO DIRETO" in l.upper() for l in lines[:3])
 
+    instituicao, ano = None, None
     while lines and lines[0].startswith("(") and lines[0].endswith(")"):
+        if ano is None:
+            instituicao, ano = extract_cabecalho(lines[0])
         lines.pop(0)
 
     alternativas: Dict[str, str] = {}
@@ -643,77 +1435,410 @@ def parse_listagem_texto(raw: str) -> Tuple[str, Dict[str, str], bool]:
             enun_parts.append(l)
 
     enunciado = compact_spaces(" ".join(enun_parts))
-    return enunciado, alternativas, is_ad
+    return enunciado, alternativas, is_ad, instituicao, ano
+
+
+def row_to_site_question(r: Dict[str, str]) -> Optional[SiteQuestion]:
+    """Linha da listagem ({code, desc, esp}) -> SiteQuestion (None se não der para parsear)."""
+    code = (r.get("code") or "").strip()
+    raw_desc = (r.get("desc") or "").strip()
+    esp = (r.get("esp") or "").strip()
+    if not code or not raw_desc:
+        return None
+
+    enun, alts, is_ad, inst, ano = parse_listagem_texto(raw_desc)
+    if not enun or len(alts) < 2:
+        return None
+
+    return SiteQuestion(
+        code=code, enunciado=enun, alternativas=alts, is_acesso_direto=is_ad,
+        especialidade=esp, instituicao=inst, ano=ano,
+    )
+
+
+def record_to_row(record: Dict) -> Dict[str, str]:
+    """Registro da API do AdminJS -> mesmo formato das linhas da tabela ({code, desc, esp})."""
+    params = record.get("params") or {}
+    code = params.get(RECORD_PARAM_CODE) or record.get("id") or ""
+    desc = params.get(RECORD_PARAM_DESCRIPTION) or ""
+
+    esp = params.get(RECORD_PARAM_SPECIALTY) or ""
+    populated = (record.get("populated") or {}).get(RECORD_PARAM_SPECIALTY)
+    if isinstance(populated, dict):
+        esp = populated.get("title") or (populated.get("params") or {}).get("name") or esp
+
+    return {"code": str(code).strip(), "desc": str(desc), "esp": str(esp).strip()}
+
+
+def api_get_json(page, url: str, timeout_ms: Optional[int] = None) -> Optional[Dict]:
+    """
+    GET na API do admin usando os cookies do contexto do navegador (ou um APIRequestContext).
+    Sem timeout_ms: pelo histórico de latência da API e pelo prazo da questão (teto TIMEOUT_API_MS);
+    só essas chamadas entram no histograma (o sync pede páginas enormes, com timeout próprio).
+    """
+    SEARCH_COST.requisicoes += 1
+    governor_acquire()
+    inicio = time.time()
+    try:
+        resp = _api_requester(page).get(url, timeout=timeout_ms or adaptive_timeout_ms("api", TIMEOUT_API_MS))
+    except Exception as e:
+        estourou = "timeout" in str(e).lower()
+        governor_record(None if estourou else 0, inicio)
+        if estourou and timeout_ms is None:
+            latency_timeout("api", inicio)
+        raise
+    governor_record(resp.status, inicio)
+    if timeout_ms is None:
+        latency_record("api", inicio)
+    if resp.status >= 500:
+        raise SiteError("5xx", f"API respondeu {resp.status}")
+    if resp.status in (401, 403) or is_login_url(getattr(resp, "url", "")):
+        raise SiteError("login", f"API sem sessão ({resp.status})")
+    if not resp.ok:
+        dprint(f"    ⚠️ API {resp.status}: {url}")
+        return None
+    try:
+        return resp.json()
+    except Exception:
+        return None
+
+
+def fetch_site_question_by_code(page, code: str) -> Optional[SiteQuestion]:
+    """
+    Busca UM registro pelo código (1 request, sem busca/paginação): listagem filtrada pela
+    propriedade do código. O filtro de texto do AdminJS é "contém", então só vale o registro
+    cujo código é exatamente o pedido.
+    """
+    code = str(code).strip()
+    url = (
+        f"{QUESTIONS_API_URL}/actions/list?page=1&perPage={RECORD_LOOKUP_PER_PAGE}"
+        f"&filters.{RECORD_PARAM_CODE}={quote_plus(code)}"
+    )
+    data = with_retry(lambda: api_get_json(page, url), "registro")
+    for record in (data or {}).get("records") or []:
+        row = record_to_row(record)
+        if row["code"] == code:
+            return row_to_site_question(row)
+    return None
+
+
+def load_known_codes(path: str = KNOWN_CODES_PATH) -> Dict[str, str]:
+    p = Path(path)
+    if not p.exists():
+        return {}
+    try:
+        return json.loads(p.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+
+
+def save_known_code(fingerprint: str, code: str, path: str = KNOWN_CODES_PATH) -> None:
+    known = load_known_codes(path)
+    if known.get(fingerprint) == code:
+        return
+    known[fingerprint] = code
+    p = _ensure_parent_dir(path)
+    tmp = p.with_suffix(".tmp")
+    tmp.write_text(json.dumps(known, ensure_ascii=False, indent=1), encoding="utf-8")
+    tmp.replace(p)
+
+
+# =========================
+# CACHE NEGATIVO
+# =========================
+class NegativeCache:
+    """
+    Resultados negativos persistidos (JSON), cada um com timestamp e TTL:
+    - queries: query (+ filtros da URL) que o site respondeu com 0 linhas
+    - questoes: fingerprint + especialidade -> queries que a questão já esgotou sem achar nada
+    """
+
+    def __init__(
+        self,
+        path: str = NEGATIVE_CACHE_PATH,
+        ttl_query_s: float = NEGATIVE_QUERY_TTL_S,
+        ttl_questao_s: float = NEGATIVE_QUESTION_TTL_S,
+    ):
+        self.path = Path(path)
+        self.ttl_query_s = ttl_query_s
+        self.ttl_questao_s = ttl_questao_s
+        self.queries: Dict[str, float] = {}
+        self.questoes: Dict[str, Dict[str, float]] = {}
+        self.sujo = False
+        self.puladas = 0
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception:
+            return
+        agora = time.time()
+        self.queries = {k: ts for k, ts in (data.get("queries") or {}).items() if agora - ts < self.ttl_query_s}
+        for k, qs in (data.get("questoes") or {}).items():
+            vivas = {q: ts for q, ts in qs.items() if agora - ts < self.ttl_questao_s}
+            if vivas:
+                self.questoes[k] = vivas
+
+    def save(self) -> None:
+        if not self.sujo:
+            return
+        p = _ensure_parent_dir(str(self.path))
+        tmp = p.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"queries": self.queries, "questoes": self.questoes}, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(p)
+        self.sujo = False
+
+    @staticmethod
+    def query_key(q: str, extra_filters: Optional[Dict[str, str]] = None) -> str:
+        filtros = "&".join(f"{k}={v}" for k, v in sorted((extra_filters or {}).items()))
+        return f"{q}|{filtros}"
+
+    @staticmethod
+    def questao_key(questao: QuestionBlock, especialidade: Optional[str]) -> str:
+        return f"{question_fingerprint(questao.enunciado)}|{especialidade or ''}"
+
+    def registrar_vazia(self, q: str, extra_filters: Optional[Dict[str, str]] = None) -> None:
+        self.queries[self.query_key(q, extra_filters)] = time.time()
+        self.sujo = True
+
+    def registrar_esgotadas(self, questao: QuestionBlock, especialidade: Optional[str], queries: List[str]) -> None:
+        agora = time.time()
+        self.questoes.setdefault(self.questao_key(questao, especialidade), {}).update({q: agora for q in queries})
+        self.sujo = True
+
+    def filtrar(
+        self,
+        questao: QuestionBlock,
+        especialidade: Optional[str],
+        queries: List[str],
+        extra_filters: Optional[Dict[str, str]] = None,
+    ) -> List[str]:
+        """Tira as queries já sabidamente inúteis (0 linhas ou esgotadas por esta questão)."""
+        esgotadas = self.questoes.get(self.questao_key(questao, especialidade), {})
+        novas = [q for q in queries if q not in esgotadas and self.query_key(q, extra_filters) not in self.queries]
+        self.puladas += len(queries) - len(novas)
+        return novas
+
+    def report(self) -> str:
+        return (
+            f"{self.puladas} queries puladas | {len(self.queries)} queries sem resultado, "
+            f"{len(self.questoes)} questões com queries esgotadas"
+        )
+
+
+NEGATIVE_CACHE: Optional[NegativeCache] = None
 
 
 # =========================
 # VALIDATION (AJUSTADA)
 # =========================
-def validate_question_match(pdf_q: QuestionBlock, site_q: SiteQuestion) -> Tuple[bool, int, int]:
-    a_normal = normalize_text(pdf_q.enunciado)
-    b_normal = normalize_text(site_q.enunciado)
+_MATCH_STATS_LOCK = threading.Lock()
 
-    a_extra = normalize_for_comparison(pdf_q.enunciado)
-    b_extra = normalize_for_comparison(site_q.enunciado)
 
-    ts_enun = int(fuzz.token_set_ratio(a_normal, b_normal))
-    pr_enun = int(fuzz.partial_ratio(a_normal, b_normal))
+@dataclass
+class MatchStats:
+    """
+    Contadores da execução: onde cada candidato foi rejeitado na cascata.
+    Os estágios do pipeline (threads) e os callbacks do pool somam por somar()/merge(), sob lock.
+    """
+    avaliados: int = 0
+    rej_tamanho: int = 0
+    rej_tokens_raros: int = 0
+    rej_enunciado: int = 0
+    rej_alternativas: int = 0
+    aceitos: int = 0
+
+    def somar(self, **deltas: int) -> None:
+        with _MATCH_STATS_LOCK:
+            for k, v in deltas.items():
+                setattr(self, k, getattr(self, k) + v)
+
+    def merge(self, other: Dict[str, int]) -> None:
+        """Soma contadores vindos de outro processo (matching em pool)."""
+        self.somar(**other)
+
+    def report(self) -> str:
+        return (
+            f"candidatos={self.avaliados} | tier1 (heurístico) tamanho={self.rej_tamanho} tokens-raros={self.rej_tokens_raros} | "
+            f"tier2 enunciado={self.rej_enunciado} | tier3 alternativas={self.rej_alternativas} | aceitos={self.aceitos}"
+        )
 
-    ts_extra = int(fuzz.token_set_ratio(a_extra, b_extra))
-    pr_extra = int(fuzz.partial_ratio(a_extra, b_extra))
 
-    ts_best = max(ts_enun, ts_extra)
-    pr_best = max(pr_enun, pr_extra)
+MATCH_STATS = MatchStats()
 
-    if DEBUG and pdf_q.numero in DEBUG_QS:
-        dprint(f"      🕵️ DEBUG VALIDATION Q{pdf_q.numero}:")
-        dprint(f"         Site Code: {site_q.code}")
-        dprint(
-            f"         Enunciado Score: ts={ts_best} (needs {TOKEN_SET_ENUNCIADO}), "
-            f"pr={pr_best} (needs {PARTIAL_ENUNCIADO})"
+
+def rare_tokens(norm_text: str) -> set:
+    return {
+        t for t in norm_text.split()
+        if len(t) >= CASCADE_RARE_TOKEN_LEN and t not in STOPWORDS and t not in GENERIC_QUERY_TOKENS
+    }
+
+
+def cascade_prefilter(pdf_q: QuestionBlock, site_qs: List[SiteQuestion]) -> List[SiteQuestion]:
+    """
+    Tiers 1 e 2 da cascata. Devolve só os candidatos que ainda podem passar no enunciado.
+    O tier 2 dá exatamente a mesma decisão de _enunciado_ok (só sai mais cedo); o tier 1 é
+    heurístico (ver CASCADE_TIER1) e pode recusar um match que o fuzzy completo aceitaria.
+    """
+    a_normal = normalize_text(pdf_q.enunciado)
+    a_extra = normalize_for_comparison(pdf_q.enunciado)
+    a_rare = rare_tokens(a_normal)
+    a_len = max(1, len(a_normal))
+    rej_tamanho = rej_tokens_raros = rej_enunciado = 0
+
+    survivors: List[SiteQuestion] = []
+    for sq in site_qs:
+        b_normal, b_extra = site_enunciado_norms(sq)
+
+        # tier 1: tamanho e tokens raros
+        if CASCADE_TIER1:
+            b_len = max(1, len(b_normal))
+            if max(a_len, b_len) / min(a_len, b_len) > CASCADE_MAX_LEN_RATIO:
+                rej_tamanho += 1
+                continue
+
+            b_rare = rare_tokens(b_normal)
+            if len(a_rare) >= CASCADE_MIN_RARE_TOKENS and len(b_rare) >= CASCADE_MIN_RARE_TOKENS and not (a_rare & b_rare):
+                rej_tokens_raros += 1
+                continue
+
+        # tier 2: limiar de aceite como score_cutoff (abaixo dele o rapidfuzz devolve 0)
+        passa = (
+            fuzz.token_set_ratio(a_normal, b_normal, score_cutoff=TOKEN_SET_ENUNCIADO)
+            or fuzz.token_set_ratio(a_extra, b_extra, score_cutoff=min(TOKEN_SET_ENUNCIADO, 82))
+            or fuzz.partial_ratio(a_normal, b_normal, score_cutoff=PARTIAL_ENUNCIADO)
+            or fuzz.partial_ratio(a_extra, b_extra, score_cutoff=PARTIAL_ENUNCIADO)
         )
+        if not passa:
+            rej_enunciado += 1
+            continue
+
+        survivors.append(sq)
+
+    MATCH_STATS.somar(
+        avaliados=len(site_qs), rej_tamanho=rej_tamanho, rej_tokens_raros=rej_tokens_raros, rej_enunciado=rej_enunciado
+    )
+    return survivors
+
 
-    enunciado_ok = (
+def _enunciado_ok(ts_best: int, pr_best: int, ts_extra: int) -> bool:
+    return (
         ts_best >= TOKEN_SET_ENUNCIADO
         or pr_best >= PARTIAL_ENUNCIADO
         or ts_extra >= 82
     )
-    if not enunciado_ok:
-        return False, ts_best, 0
 
-    alternativas_ok = 0
 
-    for letra in ["A", "B", "C", "D", "E"]:
-        if letra not in pdf_q.alternativas or letra not in site_q.alternativas:
-            continue
-
-        pdf_alt_n = normalize_text(pdf_q.alternativas[letra])
-        site_alt_n = normalize_text(site_q.alternativas[letra])
-
-        pdf_alt_x = normalize_for_comparison(pdf_q.alternativas[letra])
-        site_alt_x = normalize_for_comparison(site_q.alternativas[letra])
-
-        ts_alt = int(fuzz.token_set_ratio(pdf_alt_n, site_alt_n))
-        pr_alt = int(fuzz.partial_ratio(pdf_alt_n, site_alt_n))
+def _alternativa_ok(ts_alt: int, pr_alt: int, ts_alt_x: int, pr_alt_x: int) -> bool:
+    ts_best_alt = max(ts_alt, ts_alt_x)
+    pr_best_alt = max(pr_alt, pr_alt_x)
+    return (
+        ts_best_alt >= ALTERNATIVA_TOKEN_SET
+        or pr_best_alt >= ALTERNATIVA_PARTIAL
+        or ts_alt_x >= 78
+    )
 
-        ts_alt_x = int(fuzz.token_set_ratio(pdf_alt_x, site_alt_x))
-        pr_alt_x = int(fuzz.partial_ratio(pdf_alt_x, site_alt_x))
 
-        ts_best_alt = max(ts_alt, ts_alt_x)
-        pr_best_alt = max(pr_alt, pr_alt_x)
+def align_alternativas(pdf_alts: Dict[str, str], site_alts: Dict[str, str]) -> int:
+    """
+    Nº de alternativas alinhadas 1-para-1 entre PDF e site, sem depender da letra.
+    Matriz PDF x site em cdist (um por scorer), mesmas regras de _alternativa_ok por célula
+    (trocar de letra só com margem, ver _alt_ok_matrix) e o melhor casamento por força bruta
+    (no máximo 5! = 120 permutações).
+    """
+    pdf_letras, pdf_vals = _alt_values_pdf(pdf_alts)
+    site_letras, site_vals = _alt_values_site(site_alts)
+    if not pdf_vals or not site_vals:
+        return 0
+
+    p_n = [normalize_text(v) for v in pdf_vals]
+    s_n = [normalize_text(v) for v in site_vals]
+    p_x = [normalize_for_comparison(v) for v in pdf_vals]
+    s_x = [normalize_for_comparison(v) for v in site_vals]
+
+    def matrix(a: List[str], b: List[str], scorer) -> np.ndarray:
+        return np.floor(process.cdist(a, b, scorer=scorer, dtype=np.float64, workers=1))
+
+    return _melhor_casamento(_alt_ok_matrix(
+        matrix(p_n, s_n, fuzz.token_set_ratio),
+        matrix(p_n, s_n, fuzz.partial_ratio),
+        matrix(p_x, s_x, fuzz.token_set_ratio),
+        matrix(p_x, s_x, fuzz.partial_ratio),
+        pdf_letras,
+        site_letras,
+    ))
+
+
+def _alt_values_pdf(pdf_alts: Dict[str, str]) -> Tuple[List[str], List[str]]:
+    """(letras, textos) das alternativas do PDF, sem texto repetido."""
+    letras: List[str] = []
+    vals: List[str] = []
+    for k in ["A", "B", "C", "D", "E"]:
+        v = (pdf_alts.get(k) or "").strip()
+        if v and v not in vals:  # mesmo critério de count_pdf_alternatives
+            letras.append(k)
+            vals.append(v)
+    return letras, vals
+
+
+def _alt_values_site(site_alts: Dict[str, str]) -> Tuple[List[str], List[str]]:
+    letras = [k for k in ["A", "B", "C", "D", "E"] if (site_alts.get(k) or "").strip()]
+    return letras, [site_alts[k] for k in letras]
+
+
+def _alt_ok_matrix(
+    ts: np.ndarray,
+    pr: np.ndarray,
+    ts_x: np.ndarray,
+    pr_x: np.ndarray,
+    pdf_letras: List[str],
+    site_letras: List[str],
+) -> np.ndarray:
+    """
+    Matriz booleana PDF x site dos pares que podem entrar no casamento (scores já truncados):
+    - mesma letra: regras de _alternativa_ok (o que o letra a letra já aceitava)
+    - letras diferentes: as mesmas regras E o score da célula ganha de todas as outras da linha
+      e da coluna por ALT_ALIGNMENT_MARGIN (alternativas parecidas entre si não trocam de lugar)
+    """
+    ok = (
+        (np.maximum(ts, ts_x) >= ALTERNATIVA_TOKEN_SET)
+        | (np.maximum(pr, pr_x) >= ALTERNATIVA_PARTIAL)
+        | (ts_x >= 78)
+    )
+    mesma_letra = np.array([[lp == ls for ls in site_letras] for lp in pdf_letras], dtype=bool)
+    score = np.maximum(np.maximum(ts, ts_x), np.maximum(pr, pr_x))
+
+    inequivoco = np.zeros_like(ok)
+    for i, j in zip(*np.nonzero(ok & ~mesma_letra)):
+        outros_linha = np.delete(score[i, :], j)
+        outros_coluna = np.delete(score[:, j], i)
+        segundo = max(outros_linha.max(initial=0.0), outros_coluna.max(initial=0.0))
+        inequivoco[i, j] = score[i, j] - segundo >= ALT_ALIGNMENT_MARGIN
+    return ok & (mesma_letra | inequivoco)
+
+
+def _melhor_casamento(ok: np.ndarray) -> int:
+    """Maior nº de pares 1-para-1 (força bruta nas permutações do lado menor, no máximo 5! = 120)."""
+    if ok.shape[0] > ok.shape[1]:
+        ok = ok.T
+
+    n_rows, n_cols = ok.shape
+    best = 0
+    for perm in itertools.permutations(range(n_cols), n_rows):
+        best = max(best, sum(1 for i, j in enumerate(perm) if ok[i, j]))
+        if best == n_rows:
+            break
+    return best
 
-        alt_ok = (
-            ts_best_alt >= ALTERNATIVA_TOKEN_SET
-            or pr_best_alt >= ALTERNATIVA_PARTIAL
-            or ts_alt_x >= 78
-        )
-        if alt_ok:
-            alternativas_ok += 1
 
+def _decide_match(pdf_q: QuestionBlock, ts_best: int, alternativas_ok: int) -> bool:
+    """Regras de aceite (enunciado já OK) a partir do nº de alternativas que bateram."""
     # CERTO/ERRADO: aceitar 1 alternativa OK se enunciado ok
     if is_certo_errado_alts(pdf_q.alternativas):
-        match_final = (alternativas_ok >= 1 and ts_best >= 80)
-        return match_final, ts_best, alternativas_ok
+        return alternativas_ok >= 1 and ts_best >= 80
 
     total_pdf = count_pdf_alternatives(pdf_q.alternativas)
 
@@ -742,138 +1867,997 @@ def validate_question_match(pdf_q: QuestionBlock, site_q: SiteQuestion) -> Tuple
     if (not match_final) and ts_best >= 92 and alternativas_ok >= 2:
         match_final = True
 
-    return match_final, ts_best, alternativas_ok
+    return match_final
+
+
+def validate_question_match(pdf_q: QuestionBlock, site_q: SiteQuestion) -> Tuple[bool, int, int]:
+    a_normal = normalize_text(pdf_q.enunciado)
+    a_extra = normalize_for_comparison(pdf_q.enunciado)
+    b_normal, b_extra = site_enunciado_norms(site_q)
+
+    ts_enun = int(fuzz.token_set_ratio(a_normal, b_normal))
+    pr_enun = int(fuzz.partial_ratio(a_normal, b_normal))
+
+    ts_extra = int(fuzz.token_set_ratio(a_extra, b_extra))
+    pr_extra = int(fuzz.partial_ratio(a_extra, b_extra))
+
+    ts_best = max(ts_enun, ts_extra)
+    pr_best = max(pr_enun, pr_extra)
+
+    if DEBUG and pdf_q.numero in DEBUG_QS:
+        dprint(f"      🕵️ DEBUG VALIDATION Q{pdf_q.numero}:")
+        dprint(f"         Site Code: {site_q.code}")
+        dprint(
+            f"         Enunciado Score: ts={ts_best} (needs {TOKEN_SET_ENUNCIADO}), "
+            f"pr={pr_best} (needs {PARTIAL_ENUNCIADO})"
+        )
+
+    if not _enunciado_ok(ts_best, pr_best, ts_extra):
+        return False, ts_best, 0
+
+    if ALT_ALIGNMENT:
+        alternativas_ok = align_alternativas(pdf_q.alternativas, site_q.alternativas)
+        return _decide_match(pdf_q, ts_best, alternativas_ok), ts_best, alternativas_ok
+
+    alternativas_ok = 0
+
+    for letra in ["A", "B", "C", "D", "E"]:
+        if letra not in pdf_q.alternativas or letra not in site_q.alternativas:
+            continue
+
+        pdf_alt_n = normalize_text(pdf_q.alternativas[letra])
+        site_alt_n = normalize_text(site_q.alternativas[letra])
+
+        pdf_alt_x = normalize_for_comparison(pdf_q.alternativas[letra])
+        site_alt_x = normalize_for_comparison(site_q.alternativas[letra])
+
+        ts_alt = int(fuzz.token_set_ratio(pdf_alt_n, site_alt_n))
+        pr_alt = int(fuzz.partial_ratio(pdf_alt_n, site_alt_n))
+
+        ts_alt_x = int(fuzz.token_set_ratio(pdf_alt_x, site_alt_x))
+        pr_alt_x = int(fuzz.partial_ratio(pdf_alt_x, site_alt_x))
+
+        if _alternativa_ok(ts_alt, pr_alt, ts_alt_x, pr_alt_x):
+            alternativas_ok += 1
+
+    return _decide_match(pdf_q, ts_best, alternativas_ok), ts_best, alternativas_ok
+
+
+def validate_question_matches_batch(pdf_q: QuestionBlock, site_qs: List[SiteQuestion]) -> List[Tuple[bool, int, int]]:
+    """
+    Mesmo resultado de validate_question_match, mas para TODOS os candidatos de uma vez:
+    - enunciado: matriz 1 x N com process.cdist (multi-thread via CDIST_WORKERS)
+    - alternativas: só dos candidatos com enunciado OK, com process.cpdist numa lista só de pares:
+      com ALT_ALIGNMENT, todos os pares PDF x site (matriz de align_alternativas);
+      sem, os pares letra a letra
+    """
+    if not site_qs:
+        return []
+
+    a_normal = normalize_text(pdf_q.enunciado)
+    a_extra = normalize_for_comparison(pdf_q.enunciado)
+    b_norms = [site_enunciado_norms(sq) for sq in site_qs]
+    b_normal = [n for n, _ in b_norms]
+    b_extra = [x for _, x in b_norms]
+
+    def enun_row(a: str, bs: List[str], scorer) -> np.ndarray:
+        # float64 + int(): mesma truncagem do caminho escalar (float32 poderia arredondar 84.99 -> 85)
+        return process.cdist([a], bs, scorer=scorer, dtype=np.float64, workers=CDIST_WORKERS)[0]
+
+    ts_enun = enun_row(a_normal, b_normal, fuzz.token_set_ratio)
+    pr_enun = enun_row(a_normal, b_normal, fuzz.partial_ratio)
+    ts_extra = enun_row(a_extra, b_extra, fuzz.token_set_ratio)
+    pr_extra = enun_row(a_extra, b_extra, fuzz.partial_ratio)
+
+    out: List[Tuple[bool, int, int]] = []
+    ok_idx: List[int] = []
+    for i in range(len(site_qs)):
+        ts_best = max(int(ts_enun[i]), int(ts_extra[i]))
+        pr_best = max(int(pr_enun[i]), int(pr_extra[i]))
+        out.append((False, ts_best, 0))
+        if _enunciado_ok(ts_best, pr_best, int(ts_extra[i])):
+            ok_idx.append(i)
+
+    if not ok_idx:
+        return out
+
+    # pares (pdf_alt, site_alt) de todos os candidatos aprovados no enunciado
+    owners: List[int] = []
+    pa_n: List[str] = []
+    sa_n: List[str] = []
+    pa_x: List[str] = []
+    sa_x: List[str] = []
+    formas: Dict[int, Tuple[int, int]] = {}  # ALT_ALIGNMENT: candidato -> (nº alts PDF, nº alts site)
+
+    def add_par(i: int, pdf_alt: str, site_alt: str) -> None:
+        owners.append(i)
+        pa_n.append(normalize_text(pdf_alt))
+        sa_n.append(normalize_text(site_alt))
+        pa_x.append(normalize_for_comparison(pdf_alt))
+        sa_x.append(normalize_for_comparison(site_alt))
+
+    pdf_letras, pdf_vals = _alt_values_pdf(pdf_q.alternativas)
+    site_letras: Dict[int, List[str]] = {}
+    for i in ok_idx:
+        site_alts = site_qs[i].alternativas
+        if ALT_ALIGNMENT:
+            site_letras[i], site_vals = _alt_values_site(site_alts)
+            if not pdf_vals or not site_vals:
+                continue
+            formas[i] = (len(pdf_vals), len(site_vals))
+            for pv in pdf_vals:  # linha a linha: mesma ordem de np.reshape(n_pdf, n_site)
+                for sv in site_vals:
+                    add_par(i, pv, sv)
+            continue
+        for letra in ["A", "B", "C", "D", "E"]:
+            if letra not in pdf_q.alternativas or letra not in site_alts:
+                continue
+            add_par(i, pdf_q.alternativas[letra], site_alts[letra])
+
+    alt_counts: Dict[int, int] = {i: 0 for i in ok_idx}
+    if owners:
+        def pair_scores(a: List[str], b: List[str], scorer) -> np.ndarray:
+            return np.floor(process.cpdist(a, b, scorer=scorer, dtype=np.float64, workers=CDIST_WORKERS))
+
+        ts_alt = pair_scores(pa_n, sa_n, fuzz.token_set_ratio)
+        pr_alt = pair_scores(pa_n, sa_n, fuzz.partial_ratio)
+        ts_alt_x = pair_scores(pa_x, sa_x, fuzz.token_set_ratio)
+        pr_alt_x = pair_scores(pa_x, sa_x, fuzz.partial_ratio)
+
+        if ALT_ALIGNMENT:
+            ini = 0
+            for i in ok_idx:
+                if i not in formas:
+                    continue
+                forma = formas[i]
+                fim = ini + forma[0] * forma[1]
+                fatia = slice(ini, fim)
+                alt_counts[i] = _melhor_casamento(_alt_ok_matrix(
+                    ts_alt[fatia].reshape(forma), pr_alt[fatia].reshape(forma),
+                    ts_alt_x[fatia].reshape(forma), pr_alt_x[fatia].reshape(forma),
+                    pdf_letras, site_letras[i],
+                ))
+                ini = fim
+        else:
+            for k, i in enumerate(owners):
+                if _alternativa_ok(int(ts_alt[k]), int(pr_alt[k]), int(ts_alt_x[k]), int(pr_alt_x[k])):
+                    alt_counts[i] += 1
+
+    for i in ok_idx:
+        ts_best = out[i][1]
+        alternativas_ok = alt_counts[i]
+        out[i] = (_decide_match(pdf_q, ts_best, alternativas_ok), ts_best, alternativas_ok)
+
+    return out
 
 
 # =========================
 # FIND CODE
 # =========================
-def find_code_for_question(page, questao: QuestionBlock) -> Optional[MatchResult]:
-    queries = build_queries_from_enunciado(questao.enunciado)
+def score_candidate(questao: QuestionBlock, site_q: SiteQuestion, total_pdf: int) -> Optional[Tuple[MatchResult, int]]:
+    """Valida um candidato e classifica a confiança. Retorna (resultado, rank) ou None."""
+    match_ok, score_enun, num_alt = validate_question_match(questao, site_q)
+    if not match_ok:
+        return None
+    return classify_match(site_q, score_enun, num_alt, total_pdf)
+
+
+def iter_scored_candidates(questao: QuestionBlock, site_qs: List[SiteQuestion], total_pdf: int):
+    """
+    Gera (resultado, rank) dos candidatos aprovados, NA ORDEM de site_qs.
+    Com BATCH_SCORING valida a lista inteira de uma vez; o consumidor pode parar no 1º ALTA.
+    """
+    if MATCH_CASCADE:
+        site_qs = cascade_prefilter(questao, site_qs)
+
+    if not BATCH_SCORING or len(site_qs) < 2:
+        validated = [validate_question_match(questao, sq) for sq in site_qs]
+    else:
+        validated = validate_question_matches_batch(questao, site_qs)
+
+    if MATCH_CASCADE:
+        aceitos = sum(1 for match_ok, _, _ in validated if match_ok)
+        MATCH_STATS.somar(aceitos=aceitos, rej_alternativas=len(validated) - aceitos)
+
+    for site_q, (match_ok, score_enun, num_alt) in zip(site_qs, validated):
+        if not match_ok:
+            continue
+        yield classify_match(site_q, score_enun, num_alt, total_pdf)
+
+
+def classify_match(site_q: SiteQuestion, score_enun: int, num_alt: int, total_pdf: int) -> Tuple[MatchResult, int]:
+    """Candidato já aprovado -> confiança (ALTA/MEDIA/BAIXA) e rank de desempate."""
+    ratio = num_alt / total_pdf
+
+    if score_enun >= 90 and ratio >= 0.75:
+        confianca = "ALTA"
+        emoji = "✅"
+    elif score_enun >= 80 and ratio >= 0.70:
+        confianca = "MEDIA"
+        emoji = "🟡"
+    else:
+        confianca = "BAIXA"
+        emoji = "⚠️"
+
+    ad_tag = " (AD)" if site_q.is_acesso_direto else ""
+    print(
+        f"  {emoji} Match! Código: {site_q.code}{ad_tag} "
+        f"(enun={score_enun}, alt={num_alt}/{total_pdf}, confiança={confianca})"
+    )
+
+    result = MatchResult(site_q.code, score_enun, num_alt, confianca, site_q.is_acesso_direto, site_q.especialidade)
+    rank = (1000 if site_q.is_acesso_direto else 0) + (score_enun * 10) + num_alt
+    return result, rank
+
+
+def verify_code_for_question(page, questao: QuestionBlock, code: str) -> Optional[MatchResult]:
+    """Caminho rápido: confere um código suspeito abrindo só o registro dele."""
+    try:
+        site_q = fetch_site_question_by_code(page, code)
+    except Exception as e:
+        dprint(f"    ⚠️ Falha ao verificar código {code}: {e}")
+        return None
+    if site_q is None:
+        return None
+
     total_pdf = count_pdf_alternatives(questao.alternativas) or 5
-    seen_codes = set()
+    scored = score_candidate(questao, site_q, total_pdf)
+    if scored is None:
+        print(f"  ↪️ Código suspeito {code} não confere; buscando normalmente...")
+        return None
+    return scored[0]
+
+
+def find_code_for_question(page, questao: QuestionBlock, scope: Optional[SearchScope] = None) -> Optional[MatchResult]:
+    """Busca o código da questão: banco local primeiro (0 requests); sem ALTA, vai ao site."""
+    local_result = None
+    if scope and scope.banco_local is not None:
+        especialidade = scope.especialidade if ESPECIALIDADE_SCOPE else None
+        local_result = scope.resultado_local(questao, especialidade)
+        if local_result is not None and local_result.confianca == "ALTA":
+            print("  💾 Achado no banco local")
+            return local_result
+    return find_code_on_site(page, questao, scope, local_result)
+
+
+def find_code_on_site(
+    page, questao: QuestionBlock, scope: Optional[SearchScope] = None, local_result: Optional[MatchResult] = None
+) -> Optional[MatchResult]:
+    """
+    Busca no site. Se já existe um código suspeito (memo/run anterior/quase-duplicata),
+    confere direto pelo registro. Com escopo de especialidade:
+    - ordena/desempata as linhas pela especialidade (e/ou filtra na URL)
+    - com filtro na URL e nada achado, alarga automaticamente (busca sem filtro)
+    Se o site não achar nada, fica o melhor resultado do banco local (local_result).
+    """
+    if VERIFY_KNOWN_CODES:
+        suspeito = (scope.codigos_suspeitos.get(questao.numero) if scope else None) or \
+            (scope.codigos_conhecidos if scope else load_known_codes()).get(question_fingerprint(questao.enunciado)) or \
+            (scope.codigo_quase_duplicata(questao) if scope else None)
+        if suspeito:
+            result = verify_code_for_question(page, questao, suspeito)
+            if result is not None and result.confianca == "ALTA":
+                return result
+
+    especialidade = scope.especialidade if (ESPECIALIDADE_SCOPE and scope) else None
+    upgrades = scope.upgrades if (ANYTIME_SEARCH and scope) else None
+
+    result = _find_code_for_question(page, questao, especialidade, upgrades)
+
+    if result is None and especialidade and ESPECIALIDADE_FILTER_PARAM:
+        print(f"  🔓 Nada em '{especialidade}'. Alargando busca para todas as especialidades...")
+        result = _find_code_for_question(page, questao, None, upgrades)
+
+    if result is None:
+        result = local_result
+    return result
+
+
+def upgrade_search(
+    page, task: "UpgradeTask", max_queries: int = 1, max_paginas: Optional[int] = None
+) -> Optional[MatchResult]:
+    """Uma fatia da continuação anytime: até max_queries queries (ou max_paginas páginas) a mais; só devolve se achar ALTA."""
+    task.st.upgrade = True
+    result = _find_code_for_question(
+        page, task.questao, task.especialidade, retomada=task, max_queries=max_queries, max_paginas=max_paginas
+    )
+    return result if (result is not None and result.confianca == "ALTA") else None
 
-    best_media = None
-    best_baixa = None
-    query_count = 0
 
-    for q in queries[:MAX_QUERIES_PER_QUESTION]:
-        query_count += 1
+@dataclass
+class _SearchState:
+    """Estado da busca de UMA questão (compartilhado entre fan-out e loop sequencial)."""
+    total_pdf: int
+    especialidade: Optional[str]
+    seen_codes: set = field(default_factory=set)
+    best_media: Optional[Tuple[MatchResult, int]] = None
+    best_baixa: Optional[Tuple[MatchResult, int]] = None
+    header_skipped: int = 0
+    penalidade: Dict[str, int] = field(default_factory=dict)  # código -> desconto no rank (instituição/especialidade)
+    upgrade: bool = False  # continuação anytime: só ALTA interessa, ignora o corte por códigos vistos
+    esgotadas: List[str] = field(default_factory=list)  # queries paginadas até o fim (cache negativo)
+
+    def keep(self, result: MatchResult, rank: int) -> None:
+        if result.confianca == "MEDIA":
+            if self.best_media is None or rank > self.best_media[1]:
+                self.best_media = (result, rank)
+        elif self.best_baixa is None or rank > self.best_baixa[1]:
+            self.best_baixa = (result, rank)
+
+    def should_stop_paging(self) -> bool:
+        if question_deadline_expired():
+            return True
+        if self.upgrade:
+            return False
+        return len(self.seen_codes) >= MAX_SEEN_CODES_BEFORE_STOP and self.best_media is not None
 
-        limit_pages = pages_limit_for_query(q)
-        per_page_rows = rows_limit_for_query(q)
 
-        for pnum in range(1, limit_pages + 1):
-            goto_filter_page(page, q, pnum)
-            wait_results(page)
+@dataclass
+class UpgradeTask:
+    """Continuação de uma busca que parou numa MEDIA (anytime): de onde seguir para tentar ALTA."""
+    questao: QuestionBlock
+    especialidade: Optional[str]
+    st: _SearchState
+    resultado: MatchResult  # MEDIA registrada
+    queries: List[str] = field(default_factory=list)
+    proxima_query: int = 0
+    proxima_pagina: int = 1
+
+    @property
+    def total_queries(self) -> int:
+        return len(self.queries)
+
+    @property
+    def esgotada(self) -> bool:
+        return self.proxima_query >= self.total_queries
+
+
+def _process_page_rows(
+    questao: QuestionBlock,
+    rows: List[Dict[str, str]],
+    per_page_rows: int,
+    query_count: int,
+    st: _SearchState,
+    so_alta: bool = False,
+) -> Optional[MatchResult]:
+    """
+    Valida as linhas de UMA página. Retorna o resultado se for para parar a busca
+    (ALTA, quick-stop MEDIA ou MEDIA boa o bastante); senão só atualiza o estado.
+    so_alta=True: MEDIA nunca para a busca aqui (fan-out decide depois que todas chegarem).
+    """
+    site_qs: List[SiteQuestion] = []
+    for r in rows[:per_page_rows]:
+        code = (r.get("code") or "").strip()
+        if not code or code in st.seen_codes:
+            continue
+        sq = row_to_site_question(r)
+        if sq is None:
+            st.seen_codes.add(code)
+            continue
+        site_qs.append(sq)
 
-            def get_rows():
-                return page.evaluate(
-                    f"""() => {{
-                        const out = [];
-                        const trs = Array.from(document.querySelectorAll('table tbody tr'));
-                        for (const tr of trs) {{
-                            const tds = tr.querySelectorAll('td');
-                            if (!tds || tds.length < {SPECIALTY_TD_INDEX + 1}) continue;
+    return _process_site_questions(questao, site_qs, query_count, st, so_alta)
 
-                            const code = (tds[1]?.innerText || '').trim();
-                            const desc = (tds[2]?.innerText || '').trim();
-                            const esp  = (tds[{SPECIALTY_TD_INDEX}]?.innerText || '').trim();
 
-                            if (code && desc) out.push({{code, desc, esp}});
-                        }}
-                        return out;
-                    }}"""
-                )
+def _triar_candidatos(questao: QuestionBlock, site_qs: List[SiteQuestion], st: _SearchState) -> List[SiteQuestion]:
+    """
+    Tira os já vistos e os de ano diferente; o resto vai na ordem de validação:
+    especialidade do escopo antes das outras, instituição que bate antes da divergente,
+    AD antes de não-AD. Os de fora ganham penalidade no rank (só desempate de MEDIA/BAIXA).
+    """
+    triados: List[Tuple[int, SiteQuestion]] = []
+    for sq in site_qs:
+        if sq.code in st.seen_codes:
+            continue
+        st.seen_codes.add(sq.code)
+        if HEADER_PREFILTER and header_conflicts(questao.instituicao, questao.ano, sq.instituicao, sq.ano):
+            st.header_skipped += 1
+            continue
+        ordem = 0 if sq.is_acesso_direto else 1
+        penalidade = 0
+        if HEADER_PREFILTER and instituicao_diverge(questao.instituicao, sq.instituicao):
+            penalidade += HEADER_INSTITUICAO_PENALTY
+            ordem += 2
+        if not especialidade_compativel(st.especialidade, sq.especialidade):
+            penalidade += ESPECIALIDADE_PENALTY
+            ordem += 4
+        if penalidade:
+            st.penalidade[sq.code] = penalidade
+        triados.append((ordem, sq))
+    triados.sort(key=lambda t: t[0])  # estável: dentro do grupo, a ordem do site
+    return [sq for _, sq in triados]
+
+
+def _process_site_questions(
+    questao: QuestionBlock,
+    site_qs: List[SiteQuestion],
+    query_count: int,
+    st: _SearchState,
+    so_alta: bool = False,
+) -> Optional[MatchResult]:
+    """Valida candidatos já parseados (da página do site ou do banco local). Mesmo retorno de _process_page_rows."""
+    site_qs = _triar_candidatos(questao, site_qs, st)
+
+    for result, rank in iter_scored_candidates(questao, site_qs, st.total_pdf):
+        if result.confianca == "ALTA":
+            return result
+
+        rank -= st.penalidade.get(result.code, 0)
+        st.keep(result, rank)
+        if result.confianca == "MEDIA" and not st.upgrade and not so_alta:
+            if query_count <= QUICK_STOP_AFTER_QUERIES and result.score_enunciado >= QUICK_STOP_MIN_SCORE:
+                return result
+
+    if so_alta:
+        return None
+    return _media_boa_o_bastante(st)
+
+
+def _media_boa_o_bastante(st: _SearchState) -> Optional[MatchResult]:
+    """Early-stop: a melhor MEDIA já vista basta (enunciado e proporção de alternativas altos)?"""
+    if EARLY_STOP_IF_GOOD_MEDIA and st.best_media is not None and not st.upgrade:
+        bm = st.best_media[0]
+        if bm.score_enunciado >= MEDIA_EARLY_MIN_ENUN and (bm.num_alternativas / st.total_pdf) >= MEDIA_EARLY_MIN_ALT_RATIO:
+            return bm
+    return None
 
-            rows = get_rows()
 
-            if not rows:
-                page.wait_for_timeout(800)
-                goto_filter_page(page, q, pnum)
-                wait_results(page)
-                rows = get_rows()
+def _fanout_first_pages(
+    page,
+    questao: QuestionBlock,
+    queries: List[str],
+    extra_filters: Dict[str, str],
+    st: _SearchState,
+) -> Optional[MatchResult]:
+    """
+    Dispara a página 1 das K primeiras queries ao mesmo tempo e valida na ordem de chegada.
+    Só ALTA cancela as pendentes; as regras de parada por MEDIA (quick-stop/early-stop)
+    só valem depois que as K respostas chegaram (ou falharam), com a melhor MEDIA de todas.
+    Retorna o resultado para parar, ou None. As linhas da API só servem para achar match:
+    vazia/curta não vai para o cache negativo nem esgota a query — o loop normal relê tudo
+    pela tabela a partir da página 1 (os códigos já validados aqui são pulados).
+    """
+    pending: Dict[str, Tuple[str, int]] = {}
+    SEARCH_COST.queries = max(SEARCH_COST.queries, len(queries))
+    for idx, q in enumerate(queries, 1):
+        key = start_prefetch(page, api_list_url(q, 1, rows_limit_for_query(q), extra_filters))
+        if key:
+            pending[key] = (q, idx)
 
+    try:
+        while pending and not question_deadline_expired():
+            arrived = race_prefetch(page, list(pending.keys()))
+            if arrived is None:
+                break
+            key, rows = arrived
+            q, idx = pending.pop(key)
             if not rows:
+                continue
+            dprint(f"    🏁 fan-out: query #{idx} chegou com {len(rows)} linhas")
+            stop = _process_page_rows(questao, rows, rows_limit_for_query(q), idx, st, so_alta=True)
+            if stop is not None:
+                return stop
+    finally:
+        for key in pending:
+            cancel_prefetch(page, key)
+
+    if st.best_media is not None and not st.upgrade:
+        bm = st.best_media[0]
+        if len(queries) <= QUICK_STOP_AFTER_QUERIES and bm.score_enunciado >= QUICK_STOP_MIN_SCORE:
+            return bm
+    return _media_boa_o_bastante(st)
+
+
+def _find_code_for_question(
+    page,
+    questao: QuestionBlock,
+    especialidade: Optional[str],
+    upgrades: Optional[List[UpgradeTask]] = None,
+    retomada: Optional[UpgradeTask] = None,
+    max_queries: Optional[int] = None,
+    max_paginas: Optional[int] = None,
+) -> Optional[MatchResult]:
+    """
+    Busca no site query a query, página a página.
+    - upgrades (anytime): na 1ª MEDIA devolve já e deixa a continuação na lista
+    - retomada: continua uma busca anytime de onde parou (max_queries/max_paginas = tamanho da fatia)
+    """
+    extra_filters = header_filters_for(questao)
+    if especialidade and ESPECIALIDADE_FILTER_PARAM:
+        extra_filters[ESPECIALIDADE_FILTER_PARAM] = especialidade
+
+    if retomada is not None:
+        queries = retomada.queries
+        st = retomada.st
+        q_ini, p_ini = retomada.proxima_query, retomada.proxima_pagina
+    else:
+        queries = build_queries_for_question(questao)
+        if NEGATIVE_CACHE is not None:
+            total = len(queries)
+            queries = NEGATIVE_CACHE.filtrar(questao, especialidade, queries, extra_filters)
+            if not queries:
+                print(f"  🚫 As {total} queries já foram esgotadas em execuções anteriores (cache negativo)")
+            elif len(queries) < total:
+                dprint(f"  🚫 Cache negativo: {total - len(queries)} queries puladas")
+        queries = queries[:MAX_QUERIES_PER_QUESTION]
+        st = _SearchState(
+            total_pdf=count_pdf_alternatives(questao.alternativas) or 5,
+            especialidade=especialidade,
+        )
+        q_ini, p_ini = 0, 1
+
+    def pausar(result: MatchResult, qi: int, proxima_pagina: int) -> MatchResult:
+        """MEDIA: devolve já; o resto da busca vira tarefa de upgrade (se ainda houver o que tentar)."""
+        if upgrades is not None and result.confianca == "MEDIA" and qi < len(queries):
+            upgrades.append(UpgradeTask(
+                questao=questao, especialidade=especialidade, st=st, resultado=result, queries=queries, proxima_query=qi, proxima_pagina=proxima_pagina,
+            ))
+        return result
+
+    # página 1 das K primeiras queries em paralelo (fan-out)
+    governor = site_control.GOVERNOR
+    fanout_k = governor.concorrencia(FANOUT_TOP_K) if governor is not None else FANOUT_TOP_K
+    if retomada is None and fanout_k > 1 and len(queries) > 1:
+        stop = _fanout_first_pages(page, questao, queries[:fanout_k], extra_filters, st)
+        if stop is not None:
+            return pausar(stop, 0, 1)
+        if upgrades is not None and st.best_media is not None:
+            return pausar(st.best_media[0], 0, 1)
+
+    use_api = PREFETCH_NEXT_PAGE  # API desligada: tudo pela tabela, inclusive a página 1 que o fan-out já viu
+    prefetch_key: Optional[str] = None
+    feitas = 0
+    paginas = 0
+
+    erro_site: Optional[SiteError] = None
+    try:
+        for qi in range(q_ini, len(queries)):
+            q = queries[qi]
+            query_count = qi + 1
+            if retomada is not None:
+                if qi != q_ini:
+                    retomada.proxima_query, retomada.proxima_pagina = qi, 1
+                if max_queries is not None and feitas >= max_queries:
+                    return None
+            if st.should_stop_paging():
                 break
+            feitas += 1
+
+            limit_pages = pages_limit_for_query(q)
+            per_page_rows = rows_limit_for_query(q)
+            SEARCH_COST.queries = max(SEARCH_COST.queries, query_count)
+
+            first_page = p_ini if qi == q_ini else 1
+
+            esgotou = True
+            for pnum in range(first_page, limit_pages + 1):
+                if retomada is not None and max_paginas is not None:
+                    if paginas >= max_paginas:
+                        retomada.proxima_query, retomada.proxima_pagina = qi, pnum
+                        return None
+                    paginas += 1
+                if use_api:
+                    if prefetch_key:
+                        rows = collect_prefetch(page, prefetch_key)
+                        prefetch_key = None
+                    else:
+                        rows = api_list_rows(page, q, pnum, per_page_rows, extra_filters)
+                    if rows is None:
+                        dprint("    ⚠️ API de listagem indisponível; voltando para navegação normal")
+                        use_api = False
+                    elif PREFETCH_NEXT_PAGE and len(rows) >= per_page_rows and pnum < limit_pages and \
+                            (governor is None or governor.pode_disparar()):
+                        prefetch_key = start_prefetch(page, api_list_url(q, pnum + 1, per_page_rows, extra_filters))
+
+                if not use_api:
+                    rows = fetch_rows_ui(page, q, pnum, extra_filters)
+
+                if not rows:
+                    if pnum == 1 and NEGATIVE_CACHE is not None:
+                        NEGATIVE_CACHE.registrar_vazia(q, extra_filters)
+                    break
 
-            ad_list: List[SiteQuestion] = []
-            nonad_list: List[SiteQuestion] = []
+                stop = _process_page_rows(questao, rows, per_page_rows, query_count, st)
+                if stop is not None:
+                    return pausar(stop, qi, pnum + 1)
+                if upgrades is not None and st.best_media is not None:
+                    return pausar(st.best_media[0], qi, pnum + 1)
 
-            for r in rows[:per_page_rows]:
-                code = (r.get("code") or "").strip()
-                if not code or code in seen_codes:
-                    continue
-                seen_codes.add(code)
+                if st.should_stop_paging():
+                    esgotou = False
+                    break
+            if esgotou:
+                st.esgotadas.append(q)
+
+            # saiu da paginação desta query: prefetch pendente não serve mais
+            if prefetch_key:
+                cancel_prefetch(page, prefetch_key)
+                prefetch_key = None
+        else:
+            if retomada is not None:
+                retomada.proxima_query = len(queries)
+    except SiteError as e:
+        if retomada is not None:
+            raise  # fatia de upgrade: quem chamou descarta a continuação (fica a MEDIA)
+        print(f"  ⚠️ Site falhou depois dos retries ({e}); fica o melhor candidato já visto")
+        erro_site = e
+    finally:
+        if prefetch_key:
+            cancel_prefetch(page, prefetch_key)
+
+    if question_deadline_expired():
+        print(f"  ⏱️ Prazo da questão acabou; fica o melhor candidato já visto ({len(st.seen_codes)} códigos vistos)")
+    result = _finish_search(questao, st)
+    if result is None and erro_site is not None and erro_site.tipo != "prazo":
+        raise erro_site  # nada visto: não vale como "não encontrada" (fica para a próxima execução)
+    if result is None and NEGATIVE_CACHE is not None and st.esgotadas:
+        NEGATIVE_CACHE.registrar_esgotadas(questao, especialidade, st.esgotadas)
+    return result
+
+
+def _finish_search(questao: QuestionBlock, st: _SearchState) -> Optional[MatchResult]:
+    """Fim da busca sem ALTA: devolve a melhor MEDIA/BAIXA."""
+    if st.header_skipped:
+        dprint(f"  🏷️ Q{questao.numero}: {st.header_skipped} linhas descartadas pelo ano ({questao.instituicao} {questao.ano})")
+
+    if st.best_media is not None:
+        return st.best_media[0]
+    if st.best_baixa is not None:
+        return st.best_baixa[0]
+    return None
 
-                raw_desc = (r.get("desc") or "").strip()
-                esp = (r.get("esp") or "").strip()
-                if not raw_desc:
-                    continue
 
-                enun, alts, is_ad = parse_listagem_texto(raw_desc)
-                if not enun or len(alts) < 2:
-                    continue
+# =========================
+# BANCO LOCAL (RECUPERAÇÃO + SYNC)
+# =========================
+def rerank_with_tfidf(bank: LocalBank, questao: QuestionBlock, cands: List[SiteQuestion]) -> List[SiteQuestion]:
+    """
+    Junta os candidatos do FTS com até TFIDF_KEEP extras do top do TF-IDF no banco inteiro
+    (pega o que a tokenização perdeu) e ordena tudo pelo cosseno do enunciado.
+    Nenhum candidato do FTS é descartado: o BM25 usou também as alternativas.
+    """
+    index = bank.ngram_index()
+    if not len(index):
+        return cands
+    sims = index.similarities(normalize_text(questao.enunciado))
 
-                sq = SiteQuestion(code=code, enunciado=enun, alternativas=alts, is_acesso_direto=is_ad, especialidade=esp)
-                (ad_list if is_ad else nonad_list).append(sq)
+    known = {sq.code for sq in cands}
+    extra_codes = [code for code, _ in index.top_k_from(sims, TFIDF_TOP_K) if code not in known][:TFIDF_KEEP]
+    cands = cands + bank.get_many(extra_codes)
 
-            for bucket in (ad_list, nonad_list):
-                for site_q in bucket:
-                    match_ok, score_enun, num_alt = validate_question_match(questao, site_q)
-                    if not match_ok:
-                        continue
+    def score(sq: SiteQuestion) -> float:
+        i = bank.ngram_position(sq.code)
+        return -float(sims[i]) if i is not None else 0.0
 
-                    ratio = num_alt / total_pdf
+    cands.sort(key=score)
+    return cands
 
-                    if score_enun >= 90 and ratio >= 0.75:
-                        confianca = "ALTA"
-                        emoji = "✅"
-                    elif score_enun >= 80 and ratio >= 0.70:
-                        confianca = "MEDIA"
-                        emoji = "🟡"
-                    else:
-                        confianca = "BAIXA"
-                        emoji = "⚠️"
 
-                    ad_tag = " (AD)" if site_q.is_acesso_direto else ""
-                    print(
-                        f"  {emoji} Match! Código: {site_q.code}{ad_tag} "
-                        f"(enun={score_enun}, alt={num_alt}/{total_pdf}, confiança={confianca})"
-                    )
+def fts_query_for_question(questao: QuestionBlock) -> str:
+    """
+    Termos do enunciado + alternativas em OR (o BM25 ordena por quantos/quais batem).
+    Sem stopwords/genéricos; se passar de FTS_MAX_TERMS, ficam os mais longos (mais raros).
+    """
+    texto = normalize_text(questao.enunciado + " " + " ".join(questao.alternativas.values()))
+    termos: List[str] = []
+    for t in texto.split():
+        if len(t) < 3 or t.isdigit() or t in STOPWORDS or t in GENERIC_QUERY_TOKENS or t in termos:
+            continue
+        termos.append(t)
+    if len(termos) > FTS_MAX_TERMS:
+        termos = sorted(termos, key=len, reverse=True)[:FTS_MAX_TERMS]
+    return " OR ".join(f'"{t}"' for t in termos)
 
-                    result = MatchResult(site_q.code, score_enun, num_alt, confianca, site_q.is_acesso_direto, site_q.especialidade)
-                    rank = (1000 if site_q.is_acesso_direto else 0) + (score_enun * 10) + num_alt
 
-                    if confianca == "ALTA":
-                        return result
+def _api_requester(obj):
+    """Page do Playwright -> page.request; APIRequestContext já serve direto."""
+    return getattr(obj, "request", obj)
 
-                    if confianca == "MEDIA":
-                        if best_media is None or rank > best_media[1]:
-                            best_media = (result, rank)
 
-                        if query_count <= QUICK_STOP_AFTER_QUERIES and score_enun >= QUICK_STOP_MIN_SCORE:
-                            return result
-                    else:
-                        if best_baixa is None or rank > best_baixa[1]:
-                            best_baixa = (result, rank)
+def _parse_updated_at(valor: str) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(valor.replace("Z", "+00:00"))
+    except (ValueError, AttributeError):
+        return None
 
-            if EARLY_STOP_IF_GOOD_MEDIA and best_media is not None:
-                bm = best_media[0]
-                if bm.score_enunciado >= MEDIA_EARLY_MIN_ENUN and (bm.num_alternativas / total_pdf) >= MEDIA_EARLY_MIN_ALT_RATIO:
-                    return bm
 
-            if len(seen_codes) >= MAX_SEEN_CODES_BEFORE_STOP and best_media is not None:
-                break
+def sync_local_bank(requester, bank: LocalBank, api_url: str = QUESTIONS_API_URL, full: bool = False) -> int:
+    """
+    Sincroniza o espelho com o admin.
+    - sem marca d'água (ou full=True): baixa tudo e apaga do espelho o que não existe mais no admin
+    - com marca d'água: pagina por updatedAt decrescente e para no 1º registro estritamente
+      anterior a (marca - LOCAL_BANK_SYNC_OVERLAP_S): empates na marca e edições durante a
+      paginação por offset são relidos. Sobrou registro local a mais que o admin -> sync completo.
+    Retorna quantos registros foram gravados.
+    """
+    watermark = None if full else bank.get_meta("watermark")
+    corte = _parse_updated_at(watermark) if watermark else None
+    if corte is not None:
+        corte -= timedelta(seconds=LOCAL_BANK_SYNC_OVERLAP_S)
+    modo = "completo" if watermark is None else f"incremental (desde {watermark})"
+    print(f"🔄 Sincronizando banco local ({modo})...")
+
+    gravados = 0
+    nova_marca = watermark or ""
+    vistos: set = set()
+    total_admin: Optional[int] = None
+    page_num = 1
+    while True:
+        url = (
+            f"{api_url}/actions/list?page={page_num}&perPage={LOCAL_BANK_SYNC_PER_PAGE}"
+            f"&sortBy={RECORD_PARAM_UPDATED_AT}&direction=desc"
+        )
+        data = with_retry(lambda: api_get_json(requester, url, timeout_ms=120000), "sync do banco local")
+        if data is None or "records" not in data:
+            raise RuntimeError(f"Sync do banco local falhou na página {page_num}")
+        total = (data.get("meta") or {}).get("total")
+        if isinstance(total, int):
+            total_admin = total
+
+        records = data.get("records") or []
+        lote: List[Tuple[SiteQuestion, str]] = []
+        chegou_na_marca = False
+        for rec in records:
+            updated_at = str((rec.get("params") or {}).get(RECORD_PARAM_UPDATED_AT) or "")
+            if watermark and updated_at:
+                momento = _parse_updated_at(updated_at)
+                if (momento < corte) if (momento is not None and corte is not None) else (updated_at < watermark):
+                    chegou_na_marca = True
+                    break
+            row = record_to_row(rec)
+            vistos.add(row["code"])
+            sq = row_to_site_question(row)
+            if sq is None:
+                continue
+            lote.append((sq, updated_at))
+            nova_marca = max(nova_marca, updated_at)
+
+        if lote:
+            bank.upsert(lote)
+            gravados += len(lote)
 
-        if len(seen_codes) >= MAX_SEEN_CODES_BEFORE_STOP and best_media is not None:
+        if chegou_na_marca or len(records) < LOCAL_BANK_SYNC_PER_PAGE:
             break
+        page_num += 1
+        if page_num % 10 == 0:
+            print(f"   ... {gravados} registros")
 
-    if best_media is not None:
-        return best_media[0]
-    if best_baixa is not None:
-        return best_baixa[0]
-    return None
+    removidos: List[str] = []
+    if watermark is None:
+        removidos = sorted(bank.codes() - vistos)
+        if removidos:
+            bank.delete(removidos)
+            print(f"🗑️ Banco local: {len(removidos)} registros apagados no admin removidos do espelho")
+
+    if nova_marca:
+        bank.set_meta("watermark", nova_marca)
+    bank.conn.commit()
+
+    if watermark is not None and total_admin is not None and bank.count() > total_admin:
+        print(f"⚠️ Espelho com {bank.count()} registros e admin com {total_admin}: registros apagados; sync completo...")
+        return gravados + sync_local_bank(requester, bank, api_url, full=True)
+
+    if local_bank.LOCAL_BANK_COLUMNAR and (gravados or removidos or bank.store is None) and bank.count():
+        bank.refresh_store()
+    print(f"✅ Banco local: {gravados} registros gravados ({bank.count()} no total)")
+    return gravados
+
+
+def local_bank_candidates(bank: LocalBank, questao: QuestionBlock) -> List[Tuple[int, List[SiteQuestion]]]:
+    """
+    Recuperação no espelho local (sem validar): rodadas de candidatos na ordem em que devem
+    ser validadas, como (nº da query, candidatos). Um código só aparece na 1ª rodada em que surge.
+    - quase-duplicatas (MinHash/LSH) primeiro: mesma questão de outra apostila/edição
+    - com FTS: UMA consulta BM25 (top-N), reordenada pelo TF-IDF
+    - sem FTS: mesmas queries do site, por substring
+    """
+    rodadas: List[Tuple[int, List[SiteQuestion]]] = []
+    vistos: set = set()
+
+    def add(query_count: int, cands: List[SiteQuestion]) -> None:
+        novos = [sq for sq in cands if sq.code not in vistos]
+        vistos.update(sq.code for sq in novos)
+        if novos:
+            rodadas.append((query_count, novos))
+
+    if local_bank.MINHASH_LSH:
+        add(1, bank.search_near_duplicates(questao))
+
+    if bank.has_fts:
+        cands = [sq for sq in bank.search_fts(fts_query_for_question(questao), FTS_TOP_N) if sq.code not in vistos]
+        if LOCAL_BANK_TFIDF:
+            cands = rerank_with_tfidf(bank, questao, cands)
+        add(1, cands)
+        return rodadas
+
+    for query_count, q in enumerate(build_queries_for_question(questao)[:MAX_QUERIES_PER_QUESTION], 1):
+        add(query_count, bank.search_substring(q, LOCAL_BANK_MAX_CANDIDATES))
+    return rodadas
+
+
+def validate_local_candidates(
+    questao: QuestionBlock, rodadas: List[Tuple[int, List[SiteQuestion]]], especialidade: Optional[str]
+) -> Optional[MatchResult]:
+    """Validação das rodadas de local_bank_candidates (mesmas regras/early-stops da busca no site)."""
+    st = _SearchState(
+        total_pdf=count_pdf_alternatives(questao.alternativas) or 5,
+        especialidade=especialidade,
+    )
+    for query_count, cands in rodadas:
+        stop = _process_site_questions(questao, cands, query_count, st)
+        if stop is not None:
+            return stop
+    return _finish_search(questao, st)
+
+
+def find_code_in_local_bank(bank: LocalBank, questao: QuestionBlock, especialidade: Optional[str]) -> Optional[MatchResult]:
+    """Busca no espelho local: recuperação + validação."""
+    return validate_local_candidates(questao, local_bank_candidates(bank, questao), especialidade)
+
+
+# =========================
+# MATCHING EM PROCESSOS (BANCO LOCAL)
+# =========================
+# estado de cada processo do pool (carregado 1x no initializer)
+_WORKER_BANK: Optional[LocalBank] = None
+
+
+def _match_worker_init(bank_path: str, ngram: Optional["CharNgramIndex"]) -> None:
+    global _WORKER_BANK
+    # prints do worker não vão para a GUI (stdout redirecionado só no processo principal)
+    sys.stdout = open(os.devnull, "w", encoding="utf-8")
+    _WORKER_BANK = LocalBank(bank_path, read_only=True)
+    if ngram is not None:
+        _WORKER_BANK.use_ngram_index(ngram)
+
+
+def _match_worker(
+    batch: List[QuestionBlock], especialidade: Optional[str]
+) -> Tuple[List[Optional[MatchResult]], Dict[str, int]]:
+    global MATCH_STATS
+    MATCH_STATS = MatchStats()
+    results = [find_code_in_local_bank(_WORKER_BANK, q, especialidade) for q in batch]
+    return results, asdict(MATCH_STATS)
+
+
+class MatchingService:
+    """
+    Pool de processos para o matching contra o banco local (validação fuzzy = CPU em Python).
+    Cada worker abre o banco 1x, só leitura (store colunar por mmap: páginas compartilhadas pelo SO).
+    Processos por spawn em todo SO: fork com o Playwright/threads da GUI vivos herdaria locks travados.
+    submit() não bloqueia: o loop de busca (Playwright) segue enquanto os núcleos validam.
+    """
+
+    def __init__(self, bank: LocalBank, workers: int = MATCH_WORKERS):
+        self.workers = workers or min(os.cpu_count() or 1, MATCH_WORKERS_MAX)
+        # montado 1x aqui (o banco já foi aberto para escrita e está em dia) e enviado a cada worker
+        ngram = bank.ngram_index() if LOCAL_BANK_TFIDF else None
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_match_worker_init,
+            initargs=(bank.path, ngram),
+        )
+
+    def submit(self, questoes: List[QuestionBlock], especialidade: Optional[str]) -> List[Future]:
+        """Um Future por questão (na ordem de `questoes`), em lotes de MATCH_BATCH_SIZE."""
+        out: List[Future] = []
+        for i in range(0, len(questoes), MATCH_BATCH_SIZE):
+            lote = questoes[i: i + MATCH_BATCH_SIZE]
+            fut = self.pool.submit(_match_worker, lote, especialidade)
+            for j in range(len(lote)):
+                out.append(self._unpack(fut, j))
+        return out
+
+    @staticmethod
+    def _unpack(batch_future: Future, j: int) -> Future:
+        """Future do lote -> Future da j-ésima questão (e soma os contadores da cascata 1x por lote)."""
+        item: Future = Future()
+
+        def done(f: Future) -> None:
+            try:
+                results, stats = f.result()
+                if j == 0:
+                    MATCH_STATS.merge(stats)
+                item.set_result(results[j])
+            except BaseException as e:  # noqa: BLE001 - repassa para quem esperar o item
+                item.set_exception(e)
+
+        batch_future.add_done_callback(done)
+        return item
+
+    def match_batch(self, questoes: List[QuestionBlock], especialidade: Optional[str]) -> List[Optional[MatchResult]]:
+        """Versão bloqueante de submit()."""
+        return [f.result() for f in self.submit(questoes, especialidade)]
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+# =========================
+# JOURNAL (CHECKPOINT / RETOMADA)
+# =========================
+def pdf_hash(pdf_path: str) -> str:
+    """Hash do conteúdo do PDF (o mesmo arquivo renomeado/movido cai no mesmo journal)."""
+    h = hashlib.sha1()
+    with open(pdf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def journal_key(questao: QuestionBlock) -> str:
+    return f"{questao.tipo}:{questao.numero}:{question_fingerprint(questao.enunciado)}"
+
+
+class RunJournal:
+    """
+    Journal append-only (JSONL) das questões de UM PDF.
+    Cada linha é gravada com flush + fsync assim que a questão termina; uma linha cortada
+    no fim (queda no meio da escrita) é ignorada na leitura. A última linha de cada questão vale.
+    """
+
+    def __init__(self, pdf_path: str, journal_dir: str = JOURNAL_DIR):
+        self.path = Path(journal_dir) / f"{pdf_hash(pdf_path)}.jsonl"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._linha_cortada = False  # última linha sem "\n": a próxima gravação começa numa linha nova
+        self.entries: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        entries: Dict[str, Dict] = {}
+        if not self.path.exists():
+            return entries
+        with open(self.path, encoding="utf-8") as f:
+            line = ""
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if "key" in entry:
+                    entries[entry["key"]] = entry
+        self._linha_cortada = bool(line) and not line.endswith("\n")
+        return entries
+
+    def _append(self, entry: Dict) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            if self._linha_cortada:
+                f.write("\n")
+                self._linha_cortada = False
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def record(self, questao: QuestionBlock, result: Optional[MatchResult], cost: SearchCost) -> None:
+        entry = {
+            "key": journal_key(questao),
+            "numero": questao.numero,
+            "tipo": questao.tipo,
+            "status": "encontrada" if result else "nao_encontrada",
+            "resultado": asdict(result) if result else None,
+            "queries": cost.queries,
+            "requisicoes": cost.requisicoes,
+            "segundos": cost.segundos(),
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        self._append(entry)
+        self.entries[entry["key"]] = entry
+
+    def lookup(self, questao: QuestionBlock) -> Optional[Dict]:
+        """
+        Entrada ENCONTRADA já gravada para a questão, ou None se ainda falta buscar.
+        "nao_encontrada" não é retomada: o site/banco podem ter mudado desde então, e o
+        cache negativo já evita repetir as mesmas queries caras.
+        """
+        entry = self.entries.get(journal_key(questao))
+        return entry if entry is not None and entry.get("status") == "encontrada" else None
+
+    def resolvidas(self) -> int:
+        return sum(1 for e in self.entries.values() if e.get("status") == "encontrada")
+
+    @staticmethod
+    def to_match_result(entry: Dict) -> Optional[MatchResult]:
+        return MatchResult(**entry["resultado"]) if entry.get("resultado") else None
 
 
 # =========================
@@ -897,17 +2881,39 @@ def _create_context_with_optional_state(browser, storage_state_path: str):
     return browser.new_context()
 
 
-def _ensure_logged_in_and_save_state(page, context, storage_state_path: str):
+@contextmanager
+def admin_session(browser_service=None, headless: bool = False):
+    """
+    (page, context) do admin:
+    - com browser_service (GUI): página do navegador compartilhado, já aquecido; não fecha no fim
+    - sem: Chromium próprio, fechado ao sair
+    """
+    if browser_service is not None:
+        yield browser_service.admin_page(STORAGE_STATE, headless=headless)
+        return
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=headless, slow_mo=30)
+        try:
+            context = _create_context_with_optional_state(browser, STORAGE_STATE)
+            yield context.new_page(), context
+        finally:
+            browser.close()
+
+
+def _ensure_logged_in_and_save_state(page, context, storage_state_path: str, headless: bool = False):
     """
     Garante login no admin.
     Se cair na tela /admin/login, espera o usuário logar manualmente e salva storage_state.
+    Headless não tem janela para logar: LoginNecessario na hora (sem esperar os 10 minutos).
     """
     page.goto(QUESTIONS_URL, wait_until="domcontentloaded", timeout=60000)
 
-    url = (page.url or "").lower()
-    is_login = ("/admin/login" in url) or ("/login" in url) or url.endswith("/login")
-
-    if is_login:
+    if is_login_url(page.url) and headless:
+        raise LoginNecessario(
+            f"Sessão do admin expirou e o navegador está headless (sem janela para logar). "
+            f"Rode uma vez com headless=False, faça login e a sessão fica salva em {storage_state_path}."
+        )
+    if is_login_url(page.url):
         print("\n🔐 LOGIN NECESSÁRIO (SITE)")
         print("1) Faça login manualmente no navegador que abriu.")
         print("2) Quando terminar, volte aqui — o robô vai detectar e salvar a sessão.\n")
@@ -915,10 +2921,7 @@ def _ensure_logged_in_and_save_state(page, context, storage_state_path: str):
         t0 = time.time()
         while True:
             time.sleep(1)
-            url = (page.url or "").lower()
-            is_login = ("/admin/login" in url) or ("/login" in url) or url.endswith("/login")
-
-            if not is_login:
+            if not is_login_url(page.url):
                 print("✅ Login detectado. Salvando sessão...")
                 sp = _ensure_parent_dir(storage_state_path)
                 context.storage_state(path=str(sp))
@@ -935,21 +2938,389 @@ def _ensure_logged_in_and_save_state(page, context, storage_state_path: str):
             print(f"✅ Sessão salva em: {sp}")
 
 
+# =========================
+# ORDEM DAS QUESTÕES (CUSTO x CHANCE)
+# =========================
+@dataclass
+class QuestionPlan:
+    questao: QuestionBlock
+    chance: float  # probabilidade estimada de achar o código
+    custo: float  # requisições ao site esperadas
+    motivo: str = ""
+
+    @property
+    def valor(self) -> float:
+        return self.chance / max(self.custo, 0.1)
+
+
+def journal_cost_history(journal_dir: str = JOURNAL_DIR) -> Tuple[float, float]:
+    """(requisições médias de uma questão achada, de uma não achada) nos journals anteriores."""
+    hit: List[int] = []
+    miss: List[int] = []
+    for path in Path(journal_dir).glob("*.jsonl"):
+        try:
+            linhas = path.read_text(encoding="utf-8").splitlines()
+        except OSError:
+            continue
+        for line in linhas:
+            try:
+                e = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if e.get("requisicoes"):
+                (hit if e.get("status") == "encontrada" else miss).append(int(e["requisicoes"]))
+    custo_hit = sum(hit) / len(hit) if len(hit) >= COST_MIN_HISTORY else COST_DEFAULT_HIT
+    custo_miss = sum(miss) / len(miss) if len(miss) >= COST_MIN_HISTORY else COST_DEFAULT_MISS
+    return custo_hit, custo_miss
+
+
+def parse_quality(questao: QuestionBlock) -> float:
+    """1.0 = parse limpo; cai com alternativas faltando/duplicadas e texto com lixo de extração."""
+    q = 1.0
+    n_alts = count_pdf_alternatives(questao.alternativas)
+    if not is_certo_errado_alts(questao.alternativas):
+        if n_alts < 4:
+            q *= 0.6
+        if len(questao.alternativas) > n_alts:
+            q *= 0.85  # letra repetida/realocada
+    texto = questao.enunciado or ""
+    if texto:
+        lixo = sum(1 for c in texto if not (c.isalnum() or c.isspace() or c in ".,;:!?()-/%'\"ºª°"))
+        if lixo / len(texto) > 0.05:
+            q *= 0.7
+    return q
+
+
+def estimate_question_plan(
+    questao: QuestionBlock,
+    custo_hit: float,
+    custo_miss: float,
+    scope: Optional[SearchScope] = None,
+    journal: Optional[RunJournal] = None,
+    known_codes: Optional[Dict[str, str]] = None,
+) -> QuestionPlan:
+    """
+    Heurística barata (nada vai ao site):
+    - journal: custo 0; memo/código suspeito: 1 requisição, chance alta
+    - resto: chance cai com CERTO/ERRADO, enunciado curto, query pouco seletiva e parse ruim;
+      custo = mistura do custo médio de acerto e de erro pela chance (query genérica pagina mais)
+    """
+    if journal is not None:
+        entrada = journal.lookup(questao)
+        if entrada is not None:
+            return QuestionPlan(questao, 1.0, 0.0, "journal")
+
+    fp = question_fingerprint(questao.enunciado)
+    if (scope and questao.numero in scope.codigos_suspeitos) or fp in (known_codes or {}):
+        return QuestionPlan(questao, 0.95, 1.0, "código conhecido")
+
+    chance = 0.85
+    motivos: List[str] = []
+    if is_certo_errado_alts(questao.alternativas):
+        chance *= 0.6
+        motivos.append("certo/errado")
+    if len(_tokenize_for_query(questao.enunciado)) < SHORT_STEM_TOKENS:
+        chance *= 0.75
+        motivos.append("enunciado curto")
+
+    queries = build_queries_for_question(questao)[:MAX_QUERIES_PER_QUESTION]
+    melhor = max(queries[:3], key=estimate_query_selectivity) if queries else ""
+    sel = estimate_query_selectivity(melhor) if melhor else 0.0
+    if sel < 3.0:
+        chance *= 0.7
+        motivos.append(f"query pouco seletiva ({sel:.1f})")
+
+    qualidade = parse_quality(questao)
+    if qualidade < 1.0:
+        chance *= qualidade
+        motivos.append(f"parse {qualidade:.2f}")
+
+    fator_paginas = 1.5 if (melhor and query_is_generic(melhor)) else 1.0
+    custo = chance * custo_hit * fator_paginas + (1 - chance) * custo_miss
+    return QuestionPlan(questao, round(chance, 3), round(custo, 1), ", ".join(motivos))
+
+
+def plan_question_order(
+    ad_questions: List[QuestionBlock],
+    outras_questions: List[QuestionBlock],
+    scope: Optional[SearchScope] = None,
+    journal: Optional[RunJournal] = None,
+) -> List[QuestionBlock]:
+    """AD na ordem do PDF; as outras pela razão chance/custo (maior primeiro, empate = ordem do PDF)."""
+    custo_hit, custo_miss = journal_cost_history()
+    known = scope.codigos_conhecidos if scope is not None else load_known_codes()
+    planos = [estimate_question_plan(q, custo_hit, custo_miss, scope, journal, known) for q in outras_questions]
+    planos.sort(key=lambda pl: -pl.valor)  # sort estável: empate mantém a ordem do PDF
+
+    dprint(f"  🧭 Custo médio: achada={custo_hit:.1f} req, não achada={custo_miss:.1f} req")
+    for pl in planos[:5]:
+        dprint(f"  🧭 Q{pl.questao.numero}: chance={pl.chance:.2f} custo={pl.custo:.1f} req {pl.motivo}")
+    return ad_questions + [pl.questao for pl in planos]
+
+
 # =========================
 # MAIN
 # =========================
+@dataclass
+class PipelineItem:
+    seq: int  # ordem de processamento
+    questao: QuestionBlock
+    posicao: int = 0  # ordem no PDF (AD primeiro): ordem das linhas do CSV
+    rodadas: List[Tuple[int, List[SiteQuestion]]] = field(default_factory=list)  # candidatos do banco local
+    futuro: Optional[Future] = None  # matching do banco local já enviado ao pool de processos
+    local: Optional[MatchResult] = None
+    resultado: Optional[MatchResult] = None
+    origem: str = ""  # "journal" | "banco local" | "site" | "falha" (site falhou: fica fora do journal)
+    custo: Optional[SearchCost] = None
+    escrito: bool = False  # já foi para o journal/CSV (upgrade anytime depois disso troca a linha)
+
+
+@dataclass
+class ExtractionRun:
+    """Estado de UMA extração + os estágios do pipeline (cada método = um estágio)."""
+    page: Any
+    scope: SearchScope
+    journal: Optional[RunJournal]
+    retomar: bool
+    total: int
+    pipeline: Optional[Pipeline] = None
+    linhas: List[Tuple[int, str]] = field(default_factory=list)  # (posição no PDF, linha do CSV)
+    ad_nao_encontradas: List[int] = field(default_factory=list)
+    found_count: int = 0
+    upgrades: List[Tuple[PipelineItem, UpgradeTask]] = field(default_factory=list)  # MEDIAs ainda buscando ALTA
+    promovidas: int = 0
+    browser_service: Any = None  # GUI: parando=True (janela fechando) -> não começa questão nova
+    _lock: threading.Lock = field(default_factory=threading.Lock)  # escrita (thread) x upgrade (principal)
+
+    def build_pipeline(self) -> Pipeline:
+        self.pipeline = Pipeline([
+            Stage("recuperacao", self.recuperacao, workers=PIPELINE_WORKERS.get("recuperacao", 1)),
+            Stage("validacao", self.validacao, workers=PIPELINE_WORKERS.get("validacao", 1)),
+            Stage("site", self.site, thread_principal=True, ordenado=True,
+                  ocioso=self.upgrade_ocioso if ANYTIME_SEARCH else None),
+            Stage("escrita", self.escrita, ordenado=True, sempre=True),
+        ])
+        return self.pipeline
+
+    def _especialidade(self) -> Optional[str]:
+        return self.scope.especialidade if ESPECIALIDADE_SCOPE else None
+
+    def _encerrando(self) -> bool:
+        return self.browser_service is not None and self.browser_service.parando
+
+    @staticmethod
+    def _codigo_contexto(item: PipelineItem) -> str:
+        categoria = "ACESSO DIRETO" if item.questao.tipo == "ACESSO_DIRETO" else "ESP"
+        return f"{item.resultado.code} ({categoria}, Q{item.questao.numero or item.seq} PDF)"
+
+    @property
+    def results(self) -> List[str]:
+        """Linhas do CSV na ordem do PDF (o processamento pode ter sido em outra ordem)."""
+        return [linha for _, linha in sorted(self.linhas)]
+
+    def itens(self, questoes: List[QuestionBlock], ordem: Optional[List[QuestionBlock]] = None) -> Iterable[PipelineItem]:
+        """
+        Estágio parse: questões do PDF (AD primeiro) -> itens, na `ordem` de processamento
+        (default: a do PDF); já resolvidas no journal saem prontas.
+        """
+        posicao = {id(q): i for i, q in enumerate(questoes)}
+        for seq, questao in enumerate(ordem or questoes, 1):
+            item = PipelineItem(seq=seq, questao=questao, posicao=posicao[id(questao)])
+            entrada = self.journal.lookup(questao) if (self.journal is not None and self.retomar) else None
+            if entrada is not None:
+                item.resultado = RunJournal.to_match_result(entrada)
+                item.origem = "journal"
+            yield item
+
+    def recuperacao(self, item: PipelineItem) -> PipelineItem:
+        """Candidatos do banco local (ou o Future do pool, se a questão já foi enviada a ele)."""
+        if item.origem or self.scope.banco_local is None:
+            return item
+        pendente = self.scope.resultados_locais.pop(question_fingerprint(item.questao.enunciado), None)
+        if pendente is not None and pendente[0] == self._especialidade():
+            item.futuro = pendente[1]
+        else:
+            item.rodadas = local_bank_candidates(self.scope.banco_local, item.questao)
+        return item
+
+    def validacao(self, item: PipelineItem) -> PipelineItem:
+        """Fuzzy dos candidatos locais; ALTA aqui = a questão nem passa pelo navegador."""
+        if item.origem:
+            return item
+        if item.futuro is not None:
+            try:
+                item.local = item.futuro.result()
+            except Exception as e:
+                print(f"  ⚠️ Matching em processo falhou na Q{item.questao.numero} ({e}); segue para o site.")
+        elif item.rodadas:
+            item.local = validate_local_candidates(item.questao, item.rodadas, self._especialidade())
+        if item.local is not None and item.local.confianca == "ALTA":
+            item.resultado, item.origem = item.local, "banco local"
+        return item
+
+    def site(self, item: PipelineItem) -> PipelineItem:
+        """Busca no navegador (só o que não foi resolvido antes). Ordenado: decide a meta de códigos."""
+        global SEARCH_COST
+        questao = item.questao
+        if not item.origem and site_control.DEADLINES is not None and site_control.DEADLINES.run_expired():
+            print(f"\n⏱️ Prazo da execução acabou antes da Q{questao.numero}; parando (rodar de novo retoma daqui).")
+            self.pipeline.stop.set()
+            return None
+        if not item.origem and self._encerrando():
+            print(f"\n🛑 Navegador encerrando antes da Q{questao.numero}; parando (rodar de novo retoma daqui).")
+            self.pipeline.stop.set()
+            return None
+
+        numero_pdf = questao.numero or item.seq
+        tipo_label = "🔵 AD" if questao.tipo == "ACESSO_DIRETO" else "⚪ ESP"
+        preview = (questao.enunciado[:100] + "...") if len(questao.enunciado) > 100 else questao.enunciado
+        cab = f" [{questao.instituicao or '?'} {questao.ano or '?'}]" if (questao.instituicao or questao.ano) else ""
+        print(f"\n[{item.seq}/{self.total}] {tipo_label} Q{numero_pdf}{cab}")
+        print(f"  {preview}")
+
+        if item.origem == "journal":
+            print("  ↩️ Do journal (já resolvida antes)")
+        elif item.origem == "banco local":
+            print("  💾 Achado no banco local")
+        else:
+            SEARCH_COST = SearchCost()
+            if site_control.DEADLINES is not None:
+                dprint(f"  ⏱️ Orçamento da questão: {site_control.DEADLINES.start_question():.0f}s")
+            item.origem = "site"
+            try:
+                item.resultado = find_code_on_site(self.page, questao, self.scope, item.local)
+            except SiteError as e:
+                print(f"  ⚠️ Site falhou depois dos retries ({e}); a questão fica para a próxima execução.")
+                item.resultado, item.origem = item.local, "falha"
+            finally:
+                if site_control.DEADLINES is not None:
+                    site_control.DEADLINES.finish_question()
+            item.custo = SEARCH_COST
+            if NEGATIVE_CACHE is not None:
+                NEGATIVE_CACHE.save()
+            for task in self.scope.upgrades:
+                self.upgrades.append((item, task))
+                print(f"  ⏩ MEDIA registrada; as queries que faltam ({task.total_queries - task.proxima_query}) continuam depois")
+            self.scope.upgrades.clear()
+
+        if item.resultado:
+            self.found_count += 1
+            self.scope.registrar_match(item.resultado)
+            self.scope.registrar_resolvida(questao, item.resultado)
+            print(f"  ✅ Código: {self._codigo_contexto(item)} ({self.found_count}/{TARGET_ENCONTRADAS})")
+        else:
+            print(f"  ❌ Não encontrado ({self.found_count}/{TARGET_ENCONTRADAS})")
+            if questao.tipo == "ACESSO_DIRETO":
+                self.ad_nao_encontradas.append(numero_pdf)
+
+        if self.found_count >= TARGET_ENCONTRADAS and self.pipeline is not None:
+            self.pipeline.stop.set()
+        return item
+
+    def escrita(self, item: PipelineItem) -> None:
+        """Journal (na hora) + linha do CSV, na ordem das questões."""
+        with self._lock:
+            if item.origem not in ("journal", "falha") and self.journal is not None:
+                self.journal.record(item.questao, item.resultado, item.custo or SearchCost())
+            if item.resultado:
+                self.linhas.append((item.posicao, self._codigo_contexto(item)))
+                if item.resultado.confianca == "ALTA":
+                    save_known_code(question_fingerprint(item.questao.enunciado), item.resultado.code)
+            item.escrito = True
+        return None
+
+    def upgrade_slice(self, max_paginas: Optional[int] = None, prazo_s: float = ANYTIME_SLICE_S) -> bool:
+        """
+        Anytime: 1 query (ou max_paginas páginas) da MEDIA pendente mais antiga (fila circular),
+        com prazo próprio. Roda na thread do navegador. False = nada pendente.
+        Só SiteError fica na fatia (a MEDIA continua); LoginNecessario/SiteIndisponivel param a execução.
+        """
+        global SEARCH_COST
+        if not self.upgrades or self._encerrando():
+            return False
+        item, task = self.upgrades.pop(0)
+        SEARCH_COST = SearchCost()
+        if site_control.DEADLINES is not None:
+            site_control.DEADLINES.start_window(prazo_s)
+        dprint(f"  🔁 Upgrade Q{item.questao.numero}: query {task.proxima_query + 1}/{task.total_queries}, "
+               f"página {task.proxima_pagina}")
+        try:
+            novo = upgrade_search(self.page, task, max_paginas=max_paginas)
+        except SiteError as e:
+            print(f"  ⚠️ Upgrade da Q{item.questao.numero} falhou ({e}); fica a MEDIA.")
+            return True
+        finally:
+            if site_control.DEADLINES is not None:
+                site_control.DEADLINES.finish_window()
+        if item.custo is not None:
+            item.custo.requisicoes += SEARCH_COST.requisicoes
+            item.custo.queries = max(item.custo.queries, SEARCH_COST.queries)
+
+        if novo is not None:
+            self._promover(item, novo)
+        elif not task.esgotada:
+            self.upgrades.append((item, task))
+        return True
+
+    def upgrade_ocioso(self) -> bool:
+        """Navegador ocioso no meio da execução: fatia curta (1 página); o pipeline confere a fila entre fatias."""
+        return self.upgrade_slice(ANYTIME_IDLE_SLICE_PAGES, ANYTIME_IDLE_SLICE_S)
+
+    def _promover(self, item: PipelineItem, novo: MatchResult) -> None:
+        """MEDIA -> ALTA: troca o resultado; se já foi escrito, regrava journal e linha do CSV."""
+        anterior = item.resultado
+        with self._lock:
+            item.resultado = novo
+            if item.escrito:
+                linha = self._codigo_contexto(item)
+                self.linhas = [(pos, linha if pos == item.posicao else l) for pos, l in self.linhas]
+                if self.journal is not None:
+                    self.journal.record(item.questao, novo, item.custo or SearchCost())
+                save_known_code(question_fingerprint(item.questao.enunciado), novo.code)
+        self.promovidas += 1
+        self.scope.registrar_match(novo)
+        self.scope.registrar_resolvida(item.questao, novo)
+        print(f"  ⬆️ Q{item.questao.numero or item.seq}: MEDIA {anterior.code if anterior else '?'} -> ALTA {novo.code}")
+
+    def upgrade_pass(self) -> None:
+        """Fim da execução: continua as MEDIAs pendentes até esgotar as queries (ou o prazo da execução)."""
+        if not self.upgrades:
+            return
+        print(f"\n🔁 Tentando promover {len(self.upgrades)} MEDIA(s) para ALTA com as queries que faltavam...")
+        while self.upgrades:
+            if site_control.DEADLINES is not None and site_control.DEADLINES.run_expired():
+                print(f"⏱️ Prazo da execução acabou; {len(self.upgrades)} MEDIA(s) ficam como estão.")
+                break
+            if not self.upgrade_slice():
+                break  # navegador encerrando
+        print(f"✅ Anytime: {self.promovidas} MEDIA(s) promovidas para ALTA")
+
+
 def main(
     pdf_path: str | None = None,
     *,
     headless: bool | None = None,
     target_encontradas: int | None = None,
+    codigos_suspeitos: Dict[int, str] | None = None,
+    sincronizar_banco: bool | None = None,
+    retomar: bool | None = None,
+    prazo_execucao_s: float | None = None,
+    browser_service=None,
 ):
+    """
+    browser_service: navegador compartilhado da GUI (scripts/browser_service.py). Nesse caso
+    main() precisa rodar na thread dele: browser_service.call(lambda svc: main(..., browser_service=svc)).
+    """
+    # pool de matching: fechado no finally (a GUI é um processo de longa duração; erro no meio
+    # não pode deixar os workers vivos)
+    matching: Optional[MatchingService] = None
     try:
         Path("debug").mkdir(parents=True, exist_ok=True)
         Path("outputs").mkdir(parents=True, exist_ok=True)
         Path("inputs").mkdir(parents=True, exist_ok=True)
 
-        global PDF_PATH, HEADLESS, TARGET_ENCONTRADAS
+        global PDF_PATH, HEADLESS, TARGET_ENCONTRADAS, MATCH_STATS, NEGATIVE_CACHE
+        MATCH_STATS = MatchStats()
         if pdf_path:
             PDF_PATH = pdf_path
         if headless is not None:
@@ -975,47 +3346,102 @@ def main(
         print(f"✅ Questões NÃO-AD: {len(outras_questions)}")
         print(f"✅ Meta: {TARGET_ENCONTRADAS} códigos")
 
-        ad_nao_encontradas: List[int] = []
-
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=HEADLESS, slow_mo=30)
-
-            context = _create_context_with_optional_state(browser, STORAGE_STATE)
-            page = context.new_page()
-
-            _ensure_logged_in_and_save_state(page, context, STORAGE_STATE)
-
-            results: List[str] = []
-            found_count = 0
-
-            all_questions = ad_questions + outras_questions
-
-            for idx, questao in enumerate(all_questions, 1):
-                if found_count >= TARGET_ENCONTRADAS:
-                    break
-
-                numero_pdf = questao.numero or idx
-                tipo_label = "🔵 AD" if questao.tipo == "ACESSO_DIRETO" else "⚪ ESP"
-                preview = (questao.enunciado[:100] + "...") if len(questao.enunciado) > 100 else questao.enunciado
-
-                print(f"\n[{idx}/{len(all_questions)}] {tipo_label} Q{numero_pdf}")
-                print(f"  {preview}")
-
-                match_result = find_code_for_question(page, questao)
-
-                if match_result:
-                    categoria = "ACESSO DIRETO" if questao.tipo == "ACESSO_DIRETO" else "ESP"
-                    codigo_contexto = f"{match_result.code} ({categoria}, Q{numero_pdf} PDF)"
-                    results.append(codigo_contexto)
-                    found_count += 1
-                    print(f"  ✅ Código: {codigo_contexto} ({found_count}/{TARGET_ENCONTRADAS})")
-                else:
-                    print(f"  ❌ Não encontrado ({found_count}/{TARGET_ENCONTRADAS})")
-                    if questao.tipo == "ACESSO_DIRETO":
-                        ad_nao_encontradas.append(numero_pdf)
-
-            browser.close()
-
+        all_questions = ad_questions + outras_questions
+
+        journal: Optional[RunJournal] = RunJournal(PDF_PATH) if JOURNAL_ENABLED else None
+        retomar = RESUME_FROM_JOURNAL if retomar is None else retomar
+        if journal is not None and retomar and journal.entries:
+            print(f"↩️ Retomando: {journal.resolvidas()} questões já encontradas no journal ({journal.path}); "
+                  f"as não encontradas serão buscadas de novo")
+        elif journal is not None and journal.entries:
+            print("🧹 retomar=False: journal anterior ignorado (as questões serão buscadas de novo)")
+
+        scope = SearchScope(codigos_suspeitos=dict(codigos_suspeitos or {}), codigos_conhecidos=load_known_codes())
+        NEGATIVE_CACHE = NegativeCache() if NEGATIVE_CACHE_ENABLED else None
+        site_control.DEBUG = local_bank.DEBUG = DEBUG
+        site_control.GOVERNOR = (
+            RequestGovernor(max_concorrencia=max(float(FANOUT_TOP_K), GOVERNOR_MAX_CONCURRENCY))
+            if GOVERNOR_ENABLED else None
+        )
+        site_control.LATENCIES = LatencyTracker() if ADAPTIVE_TIMEOUTS else None
+        if local_bank.MINHASH_LSH:
+            scope.resolvidas = MinHashLSH()
+            grupos = near_duplicate_groups(all_questions)
+            if grupos:
+                nums = ", ".join("/".join(f"Q{all_questions[i].numero}" for i in g) for g in grupos)
+                print(f"✅ Quase-duplicatas no PDF: {nums} (código da 1ª é conferido nas outras)")
+        if ESPECIALIDADE_SCOPE:
+            esp_titulo = infer_especialidade_from_title(PDF_PATH)
+            if esp_titulo:
+                scope.especialidade = esp_titulo
+                scope.origem = "título do PDF"
+                print(f"✅ Especialidade (pelo título): {esp_titulo}")
+
+        with admin_session(browser_service, HEADLESS) as (page, context):
+            _ensure_logged_in_and_save_state(page, context, STORAGE_STATE, HEADLESS)
+            site_control.BREAKER = CircuitBreaker(
+                lambda: _ensure_logged_in_and_save_state(page, context, STORAGE_STATE, HEADLESS)
+            )
+
+            if LOCAL_BANK_ENABLED:
+                sync = LOCAL_BANK_SYNC_ON_START if sincronizar_banco is None else sincronizar_banco
+                if sync or Path(local_bank.LOCAL_BANK_PATH).exists():
+                    scope.banco_local = LocalBank(local_bank.LOCAL_BANK_PATH)
+                    if sync:
+                        try:
+                            sync_local_bank(page, scope.banco_local)
+                        except Exception as e:
+                            print(f"⚠️ Sync do banco local falhou ({e}); seguindo com o que já tem.")
+                    print(f"💾 Banco local: {scope.banco_local.count()} questões")
+
+            if scope.banco_local is not None and scope.banco_local.count() and MATCH_WORKERS != 1:
+                matching = MatchingService(scope.banco_local)
+                esp = scope.especialidade if ESPECIALIDADE_SCOPE else None
+                for q, fut in zip(all_questions, matching.submit(all_questions, esp)):
+                    scope.resultados_locais[question_fingerprint(q.enunciado)] = (esp, fut)
+                print(f"🧵 Matching do banco local em {matching.workers} processos")
+
+            run = ExtractionRun(
+                page=page, scope=scope, journal=journal, retomar=retomar, total=len(all_questions),
+                browser_service=browser_service,
+            )
+            pipeline = run.build_pipeline()
+            site_control.DEADLINES = DeadlineScheduler(
+                run_deadline_s=RUN_DEADLINE_S if prazo_execucao_s is None else prazo_execucao_s
+            )
+            ordem = (
+                plan_question_order(ad_questions, outras_questions, scope, journal if retomar else None)
+                if COST_AWARE_ORDER else None
+            )
+            try:
+                pipeline.run(run.itens(all_questions, ordem))
+                run.upgrade_pass()
+            finally:
+                print("\n📊 Pipeline:")
+                for linha in pipeline.report():
+                    print(f"   {linha}")
+                print(f"⏱️ Prazos: {site_control.DEADLINES.report()}")
+                site_control.DEADLINES = None
+                if NEGATIVE_CACHE is not None:
+                    NEGATIVE_CACHE.save()
+                    print(f"🚫 Cache negativo: {NEGATIVE_CACHE.report()}")
+                    NEGATIVE_CACHE = None
+                if site_control.GOVERNOR is not None:
+                    print(f"🚦 Governador: {site_control.GOVERNOR.report()}")
+                    site_control.GOVERNOR = None
+                print(f"🧯 Retry: {site_control.BREAKER.report()}")
+                site_control.BREAKER = None
+                if site_control.LATENCIES is not None:
+                    print("📶 Latência / timeouts:")
+                    for linha in site_control.LATENCIES.report():
+                        print(f"   {linha}")
+                    site_control.LATENCIES = None
+
+        if scope.banco_local is not None:
+            scope.banco_local.close()
+
+        results = run.results
+        ad_nao_encontradas = run.ad_nao_encontradas
         if ad_nao_encontradas:
             for n in ad_nao_encontradas:
                 results.append(f"Q{n} ACESSO DIRETO (NÃO ENCONTRADA)")
@@ -1028,6 +3454,8 @@ def main(
         print(f"✅ Total de linhas no CSV: {len(results)}")
         if ad_nao_encontradas:
             print(f"⚠️ AD não encontradas (registradas no final): {len(ad_nao_encontradas)} -> {ad_nao_encontradas}")
+        if MATCH_CASCADE:
+            print(f"📊 Cascata: {MATCH_STATS.report()}")
         print("=" * 60)
 
     except Exception:
@@ -1037,6 +3465,9 @@ def main(
             input("\nPressione ENTER para sair...")
         except Exception:
             pass
+    finally:
+        if matching is not None:
+            matching.close()
 
 
 if __name__ == "__main__":
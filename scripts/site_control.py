@@ -0,0 +1,530 @@
+# -*- coding: utf-8 -*-
+"""
+CONTROLE DAS CHAMADAS AO ADMIN (PRAZOS, GOVERNADOR, TIMEOUTS, RETRY)
+
+Usado pelo robo_pdf_para_codigos.py em toda chamada ao site (navegação, API, prefetch/fan-out):
+   - DeadlineScheduler: prazo por questão (sobra das fáceis vai para as difíceis) + prazo da execução
+   - RequestGovernor: token bucket (taxa + rajada) e concorrência AIMD (429/5xx/timeout/lenta reduzem)
+   - LatencyTracker: timeout de cada tipo de chamada = p99 das últimas latências x fator, entre piso e teto
+   - with_retry + CircuitBreaker: erro classificado, backoff exponencial com jitter, pausa e confere a sessão
+O estado da execução fica nos globais DEADLINES/GOVERNOR/LATENCIES/BREAKER deste módulo
+(main() do robo liga e desliga; None = desligado).
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+import numpy as np
+from playwright.sync_api import Error as PlaywrightError
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+# =========================
+# CONFIG
+# =========================
+# tela de login do AdminJS (redirect aqui = sessão caiu)
+ADMIN_LOGIN_PATH = "/admin/login"
+
+DEBUG = False  # main() do robo copia o DEBUG de lá
+
+# Orçamento de tempo: cada questão recebe QUESTION_BUDGET_S + a sobra das fáceis (até o teto).
+QUESTION_BUDGET_S = 90.0
+QUESTION_BUDGET_MAX_S = 300.0
+MIN_CALL_TIMEOUT_MS = 3000  # nenhuma chamada recebe menos que isso (nem começa, se o prazo já acabou)
+
+# Governador de requisições ao admin:
+# - token bucket: no máximo GOVERNOR_RATE_PER_S req/s (rajada de até GOVERNOR_BURST)
+# - concorrência AIMD: +1/limite por resposta rápida; x GOVERNOR_DECREASE em 429/5xx/timeout/lenta
+# - 429: pausa tudo por GOVERNOR_429_PAUSE_S
+GOVERNOR_RATE_PER_S = 4.0
+GOVERNOR_BURST = 6
+GOVERNOR_START_CONCURRENCY = 2.0
+GOVERNOR_MAX_CONCURRENCY = 3.0  # o robo sobe até FANOUT_TOP_K, se for maior
+GOVERNOR_DECREASE = 0.5
+GOVERNOR_DECREASE_COOLDOWN_S = 2.0  # respostas ruins da mesma rajada reduzem só 1 vez
+GOVERNOR_SLOW_LATENCY_S = 5.0  # resposta acima disso conta como congestionamento
+GOVERNOR_429_PAUSE_S = 10.0
+
+# Timeouts adaptativos: timeout = p99 x fator, entre o piso do tipo e o teto da chamada (TIMEOUT_*_MS do robo).
+# Estourou -> o próximo timeout daquele tipo dobra (dia lento não vira reload atrás de reload).
+ADAPTIVE_TIMEOUT_WINDOW = 200  # latências guardadas por tipo
+ADAPTIVE_TIMEOUT_MIN_SAMPLES = 20  # antes disso usa o teto
+ADAPTIVE_TIMEOUT_PERCENTILE = 99.0
+ADAPTIVE_TIMEOUT_FACTOR = 3.0
+ADAPTIVE_TIMEOUT_FLOOR_MS = {"goto": 5000, "networkidle": 1500, "results": 4000, "api": 4000}
+ADAPTIVE_TIMEOUT_SLACK_DECAY = 0.9  # folga depois de um estouro: cada resposta boa tira 10% (não volta de uma vez)
+
+# Retry das chamadas ao site: erro classificado (timeout, vazio, login, 5xx, erro do navegador),
+# backoff exponencial com jitter (sorteio entre 0 e base x 2^n, até RETRY_MAX_S).
+RETRY_MAX_ATTEMPTS = 3
+RETRY_EMPTY_ATTEMPTS = 2  # listagem vazia: 1 releitura (pode ser só a tabela atrasada)
+RETRY_BASE_S = 0.8
+RETRY_MAX_S = 10.0
+# Circuit breaker: N falhas seguidas (já depois dos retries) ou redirect para o login ->
+# pausa, confere/refaz a sessão e só então continua. Abriu BREAKER_MAX_TRIPS vezes sem
+# nenhum sucesso no meio -> para a execução (o journal retoma depois).
+BREAKER_THRESHOLD = 3
+BREAKER_PAUSE_S = 30.0
+BREAKER_MAX_TRIPS = 3
+
+
+def dprint(*args, **kwargs):
+    """Print de debug controlado por flag."""
+    if DEBUG:
+        print(*args, **kwargs)
+
+
+# =========================
+# ORÇAMENTO DE TEMPO (PRAZOS)
+# =========================
+class DeadlineScheduler:
+    """
+    Prazo por questão + prazo da execução.
+    - cada questão recebe QUESTION_BUDGET_S + a sobra acumulada (até QUESTION_BUDGET_MAX_S)
+    - terminou antes: a diferença vai para a sobra; passou do base: sai da sobra
+    - nunca além do que falta para o prazo da execução
+    """
+
+    def __init__(
+        self,
+        base_s: float = QUESTION_BUDGET_S,
+        max_s: float = QUESTION_BUDGET_MAX_S,
+        run_deadline_s: Optional[float] = None,
+    ):
+        self.base_s = base_s
+        self.max_s = max_s
+        self.run_deadline = time.time() + run_deadline_s if run_deadline_s else None
+        self.sobra_s = 0.0
+        self.q_inicio: Optional[float] = None
+        self.q_prazo: Optional[float] = None
+        self.estouradas = 0
+
+    def start_question(self) -> float:
+        """Abre o prazo da próxima questão; devolve o orçamento dela em segundos."""
+        budget = min(self.max_s, self.base_s + self.sobra_s)
+        if self.run_deadline is not None:
+            budget = max(0.0, min(budget, self.run_deadline - time.time()))
+        self.q_inicio = time.time()
+        self.q_prazo = self.q_inicio + budget
+        return budget
+
+    def finish_question(self) -> None:
+        if self.q_inicio is None:
+            return
+        usado = time.time() - self.q_inicio
+        if time.time() >= (self.q_prazo or 0):
+            self.estouradas += 1
+        self.sobra_s = max(0.0, self.sobra_s + self.base_s - usado)
+        self.q_inicio = self.q_prazo = None
+
+    def start_window(self, segundos: float) -> None:
+        """Prazo avulso (fatia de upgrade anytime): não conta como questão nem mexe na sobra."""
+        self.q_inicio = None
+        self.q_prazo = time.time() + segundos
+
+    def finish_window(self) -> None:
+        self.q_prazo = None
+
+    def remaining_s(self) -> Optional[float]:
+        prazos = [t for t in (self.q_prazo, self.run_deadline) if t is not None]
+        return min(prazos) - time.time() if prazos else None
+
+    def question_expired(self) -> bool:
+        return self.q_prazo is not None and time.time() >= self.q_prazo
+
+    def run_expired(self) -> bool:
+        return self.run_deadline is not None and time.time() >= self.run_deadline
+
+    def report(self) -> str:
+        return f"sobra acumulada={self.sobra_s:.0f}s | questões que estouraram o prazo={self.estouradas}"
+
+
+DEADLINES: Optional[DeadlineScheduler] = None
+
+
+def budget_timeout_ms(cap_ms: int) -> int:
+    """
+    Timeout de uma chamada: o que resta do prazo (questão/execução), entre MIN_CALL_TIMEOUT_MS e o teto.
+    Prazo já acabou: SiteError("prazo") — a chamada nem começa.
+    """
+    restante = DEADLINES.remaining_s() if DEADLINES is not None else None
+    if restante is None:
+        return cap_ms
+    if restante <= 0:
+        raise SiteError("prazo", "prazo acabou antes da chamada")
+    return int(max(MIN_CALL_TIMEOUT_MS, min(cap_ms, restante * 1000)))
+
+
+def question_deadline_expired() -> bool:
+    return DEADLINES is not None and DEADLINES.question_expired()
+
+
+# =========================
+# GOVERNADOR DE REQUISIÇÕES (TOKEN BUCKET + AIMD)
+# =========================
+class RequestGovernor:
+    """
+    Ritmo e concorrência das requisições ao admin.
+    - acquire(): espera um token (taxa fixa + rajada) antes de cada requisição
+    - registrar(status, latência): None = timeout; 0 = erro de rede. Ajusta o limite por AIMD
+    - em_voo: prefetches disparados no navegador e ainda não coletados/cancelados
+    """
+
+    def __init__(
+        self,
+        rate_per_s: float = GOVERNOR_RATE_PER_S,
+        burst: int = GOVERNOR_BURST,
+        concorrencia: float = GOVERNOR_START_CONCURRENCY,
+        max_concorrencia: float = GOVERNOR_MAX_CONCURRENCY,
+    ):
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self.tokens = float(burst)
+        self.t_tokens = time.time()
+        self.limite = max(1.0, min(concorrencia, max_concorrencia))
+        self.max_concorrencia = max(1.0, max_concorrencia)
+        self.limite_min = self.limite
+        self.em_voo = 0
+        self.pico_em_voo = 0
+        self.pausa_ate = 0.0
+        self.ultima_reducao = 0.0
+        self.requisicoes = 0
+        self.espera_s = 0.0
+        self.sinais: Dict[str, int] = {"429": 0, "5xx": 0, "timeout": 0, "erro": 0, "lenta": 0}
+        self.reducoes = 0
+        self._lock = threading.Lock()
+
+    def _repor(self, agora: float) -> None:
+        self.tokens = min(float(self.burst), self.tokens + (agora - self.t_tokens) * self.rate_per_s)
+        self.t_tokens = agora
+
+    def acquire(self) -> None:
+        """Bloqueia até poder disparar mais uma requisição (taxa + pausa de 429)."""
+        while True:
+            with self._lock:
+                agora = time.time()
+                self._repor(agora)
+                if agora >= self.pausa_ate and self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    self.requisicoes += 1
+                    return
+                espera = max(self.pausa_ate - agora, (1.0 - self.tokens) / self.rate_per_s, 0.01)
+                self.espera_s += espera
+            time.sleep(espera)
+
+    def registrar(self, status: Optional[int], latencia_s: float) -> None:
+        with self._lock:
+            if status is None:
+                sinal = "timeout"
+            elif status == 429:
+                sinal = "429"
+                self.pausa_ate = time.time() + GOVERNOR_429_PAUSE_S
+            elif status >= 500:
+                sinal = "5xx"
+            elif status == 0:
+                sinal = "erro"
+            elif latencia_s > GOVERNOR_SLOW_LATENCY_S:
+                sinal = "lenta"
+            else:
+                self.limite = min(self.max_concorrencia, self.limite + 1.0 / self.limite)
+                return
+            self.sinais[sinal] += 1
+            agora = time.time()
+            if agora - self.ultima_reducao >= GOVERNOR_DECREASE_COOLDOWN_S:
+                self.limite = max(1.0, self.limite * GOVERNOR_DECREASE)
+                self.limite_min = min(self.limite_min, self.limite)
+                self.ultima_reducao = agora
+                self.reducoes += 1
+                dprint(f"    🚦 Admin respondeu {sinal}: concorrência -> {self.limite:.1f}")
+
+    def concorrencia(self, pedida: int) -> int:
+        """Quantas requisições simultâneas disparar agora (fan-out), dentro do limite atual."""
+        with self._lock:
+            return max(1, min(pedida, int(self.limite)))
+
+    def pode_disparar(self) -> bool:
+        # em_voo/limite mudam em outras threads (coleta do prefetch, registrar): lê os dois juntos
+        with self._lock:
+            return self.em_voo < int(self.limite)
+
+    def disparou(self) -> None:
+        with self._lock:
+            self.em_voo += 1
+            self.pico_em_voo = max(self.pico_em_voo, self.em_voo)
+
+    def liberar(self) -> None:
+        with self._lock:
+            self.em_voo = max(0, self.em_voo - 1)
+
+    def report(self) -> str:
+        sinais = ", ".join(f"{k}={v}" for k, v in self.sinais.items() if v) or "nenhum"
+        return (
+            f"limite atual={self.limite:.1f} (mín {self.limite_min:.1f}, máx {self.max_concorrencia:.0f}) | "
+            f"{self.requisicoes} requisições a {self.rate_per_s:g}/s, espera {self.espera_s:.1f}s | "
+            f"pico em voo={self.pico_em_voo} | reduções={self.reducoes} ({sinais})"
+        )
+
+
+GOVERNOR: Optional[RequestGovernor] = None
+
+
+def governor_acquire() -> None:
+    if GOVERNOR is not None:
+        GOVERNOR.acquire()
+
+
+def governor_record(status: Optional[int], inicio: float) -> None:
+    if GOVERNOR is not None:
+        GOVERNOR.registrar(status, time.time() - inicio)
+
+
+# =========================
+# TIMEOUTS ADAPTATIVOS (HISTOGRAMA DE LATÊNCIA)
+# =========================
+class LatencyTracker:
+    """
+    Janela das últimas latências por tipo de chamada -> timeout de cada tipo.
+    - timeout = percentil x fator, entre o piso (ADAPTIVE_TIMEOUT_FLOOR_MS) e o teto da chamada
+    - timeout estourado entra na janela com o tempo esperado (amostra censurada: a latência real
+      foi pelo menos isso) e dobra a folga daquele tipo; cada resposta boa tira ADAPTIVE_TIMEOUT_SLACK_DECAY
+    """
+
+    def __init__(
+        self,
+        janela: int = ADAPTIVE_TIMEOUT_WINDOW,
+        min_amostras: int = ADAPTIVE_TIMEOUT_MIN_SAMPLES,
+        percentil: float = ADAPTIVE_TIMEOUT_PERCENTILE,
+        fator: float = ADAPTIVE_TIMEOUT_FACTOR,
+    ):
+        self.janela = janela
+        self.min_amostras = min_amostras
+        self.percentil = percentil
+        self.fator = fator
+        self.amostras: Dict[str, deque] = {}
+        self.folga: Dict[str, float] = {}
+        self.estouros: Dict[str, int] = {}
+        self.ultimo_ms: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, tipo: str, latencia_s: float) -> None:
+        with self._lock:
+            self.amostras.setdefault(tipo, deque(maxlen=self.janela)).append(latencia_s)
+            self.folga[tipo] = max(1.0, self.folga.get(tipo, 1.0) * ADAPTIVE_TIMEOUT_SLACK_DECAY)
+
+    def estourou(self, tipo: str, esperado_s: float) -> None:
+        """Timeout depois de esperar esperado_s: amostra censurada (sem ela o percentil só vê quem respondeu)."""
+        with self._lock:
+            self.amostras.setdefault(tipo, deque(maxlen=self.janela)).append(esperado_s)
+            self.estouros[tipo] = self.estouros.get(tipo, 0) + 1
+            self.folga[tipo] = min(8.0, self.folga.get(tipo, 1.0) * 2)
+
+    def _quantil(self, tipo: str, percentil: float) -> Optional[float]:
+        valores = sorted(self.amostras.get(tipo) or ())
+        if not valores:
+            return None
+        idx = min(len(valores) - 1, max(0, int(np.ceil(percentil / 100 * len(valores))) - 1))
+        return valores[idx]
+
+    def quantil_s(self, tipo: str, percentil: float) -> Optional[float]:
+        with self._lock:
+            return self._quantil(tipo, percentil)
+
+    def timeout_ms(self, tipo: str, teto_ms: int) -> int:
+        with self._lock:
+            if len(self.amostras.get(tipo) or ()) < self.min_amostras:
+                ms = teto_ms
+            else:
+                p = self._quantil(tipo, self.percentil) or 0.0
+                ms = p * 1000 * self.fator * self.folga.get(tipo, 1.0)
+                ms = int(min(teto_ms, max(ADAPTIVE_TIMEOUT_FLOOR_MS.get(tipo, MIN_CALL_TIMEOUT_MS), ms)))
+            self.ultimo_ms[tipo] = ms
+        return ms
+
+    def report(self) -> List[str]:
+        linhas = []
+        for tipo in sorted(set(self.amostras) | set(self.estouros)):
+            n = len(self.amostras.get(tipo) or ())
+            p50, pxx = self.quantil_s(tipo, 50), self.quantil_s(tipo, self.percentil)
+            lat = f"p50={p50:.2f}s p{self.percentil:g}={pxx:.2f}s" if n else "sem amostras"
+            timeout = self.ultimo_ms.get(tipo)
+            timeout_txt = f"{timeout / 1000:.1f}s" if timeout else "-"
+            linhas.append(f"{tipo}: n={n} {lat} | timeout atual={timeout_txt} | estouros={self.estouros.get(tipo, 0)}")
+        return linhas
+
+
+LATENCIES: Optional[LatencyTracker] = None
+
+
+def adaptive_timeout_ms(tipo: str, teto_ms: int) -> int:
+    """Timeout de uma chamada do tipo: pelo histórico de latência (se ligado) e pelo prazo que resta."""
+    if LATENCIES is not None:
+        teto_ms = LATENCIES.timeout_ms(tipo, teto_ms)
+    return budget_timeout_ms(teto_ms)
+
+
+def latency_record(tipo: str, inicio: float) -> None:
+    if LATENCIES is not None:
+        LATENCIES.registrar(tipo, time.time() - inicio)
+
+
+def latency_timeout(tipo: str, inicio: float) -> None:
+    if LATENCIES is not None:
+        LATENCIES.estourou(tipo, time.time() - inicio)
+
+
+# =========================
+# RETRY + CIRCUIT BREAKER
+# =========================
+class SiteError(RuntimeError):
+    """Falha classificada de uma chamada ao site: timeout | vazio | login | 5xx | erro | prazo."""
+
+    def __init__(self, tipo: str, msg: str = ""):
+        super().__init__(msg or tipo)
+        self.tipo = tipo
+
+
+class LoginNecessario(RuntimeError):
+    """Sessão caiu e não há como logar à mão (navegador headless): para a execução na hora."""
+
+
+class SiteIndisponivel(RuntimeError):
+    """Circuit breaker desistiu (pausas seguidas sem o site voltar): para a execução; o journal retoma."""
+
+
+def is_login_url(url: Optional[str]) -> bool:
+    """Só a tela de login do admin (um /login em query, registro ou outra rota não conta)."""
+    path = urlparse(url or "").path.rstrip("/").lower()
+    return path == ADMIN_LOGIN_PATH
+
+
+def classify_site_error(e: BaseException) -> str:
+    if isinstance(e, SiteError):
+        return e.tipo
+    if isinstance(e, PlaywrightTimeoutError) or "timeout" in str(e).lower():
+        return "timeout"
+    return "erro"
+
+
+def retry_backoff_s(tentativa: int) -> float:
+    """Backoff exponencial com jitter completo (tentativa 1 = primeira repetição)."""
+    return random.uniform(0, min(RETRY_MAX_S, RETRY_BASE_S * 2 ** (tentativa - 1)))
+
+
+class CircuitBreaker:
+    """
+    Fechado: chamadas passam. Aberto (falhas seguidas ou login): antes da próxima chamada
+    pausa, confere a sessão (verificar_sessao) e fecha de novo se ela responder.
+    """
+
+    def __init__(
+        self,
+        verificar_sessao: Optional[Callable[[], None]] = None,
+        limite: int = BREAKER_THRESHOLD,
+        pausa_s: float = BREAKER_PAUSE_S,
+        max_aberturas: int = BREAKER_MAX_TRIPS,
+    ):
+        self.verificar_sessao = verificar_sessao
+        self.limite = limite
+        self.pausa_s = pausa_s
+        self.max_aberturas = max_aberturas
+        self.falhas_seguidas = 0
+        self.ultimo_tipo = ""
+        self.aberto = False
+        self.aberturas_seguidas = 0
+        self.aberturas = 0
+        self.repeticoes: Dict[str, int] = {}
+
+    def sucesso(self) -> None:
+        self.falhas_seguidas = 0
+        self.aberturas_seguidas = 0
+
+    def falha(self, tipo: str) -> None:
+        self.falhas_seguidas += 1
+        self.ultimo_tipo = tipo
+        if tipo == "login" or self.falhas_seguidas >= self.limite:
+            self.aberto = True
+
+    def repetiu(self, tipo: str) -> None:
+        self.repeticoes[tipo] = self.repeticoes.get(tipo, 0) + 1
+
+    def antes(self) -> None:
+        """Chamado antes de cada chamada ao site: se aberto, pausa e confere a sessão."""
+        if not self.aberto:
+            return
+        self.aberturas += 1
+        self.aberturas_seguidas += 1
+        if self.aberturas_seguidas > self.max_aberturas:
+            raise SiteIndisponivel(
+                f"Site falhando há {self.aberturas_seguidas - 1} pausas seguidas ({self.ultimo_tipo}); "
+                "parando a execução (rodar de novo retoma pelo journal)."
+            )
+        if self.ultimo_tipo == "login":
+            print("\n🧯 Sessão caiu (redirect para o login). Conferindo a sessão...")
+        else:
+            print(f"\n🧯 {self.falhas_seguidas} falhas seguidas no site ({self.ultimo_tipo}). "
+                  f"Pausando {self.pausa_s:.0f}s e conferindo a sessão...")
+            time.sleep(self.pausa_s)
+        if self.verificar_sessao is not None:
+            try:
+                self.verificar_sessao()
+            except LoginNecessario:
+                raise
+            except Exception as e:
+                print(f"  ⚠️ Sessão não respondeu ({e}); nova pausa na próxima chamada.")
+                return
+        print("  ✅ Sessão ok; retomando.")
+        self.aberto = False
+        self.falhas_seguidas = 0
+
+    def report(self) -> str:
+        reps = ", ".join(f"{k}={v}" for k, v in self.repeticoes.items()) or "nenhuma"
+        return f"repetições: {reps} | pausas do circuit breaker: {self.aberturas}"
+
+
+BREAKER: Optional[CircuitBreaker] = None
+
+
+def with_retry(fn: Callable[[], Any], nome: str, repetir_vazio: bool = False) -> Any:
+    """
+    Executa uma chamada ao site com a política de retry + circuit breaker.
+    - erro do Playwright/SiteError: repete até RETRY_MAX_ATTEMPTS; esgotou -> SiteError
+    - repetir_vazio: resultado vazio é relido (RETRY_EMPTY_ATTEMPTS) e, se continuar, devolvido
+    - prazo da questão acabou: não repete; acabou antes da chamada (SiteError "prazo"): nem conta como falha do site
+    """
+    res: Any = None
+    erro: Optional[BaseException] = None
+    tipo = ""
+    for tentativa in range(1, RETRY_MAX_ATTEMPTS + 1):
+        if BREAKER is not None:
+            BREAKER.antes()
+        try:
+            res = fn()
+        except (PlaywrightError, SiteError) as e:
+            erro, tipo = e, classify_site_error(e)
+            if tipo == "prazo":
+                break
+            if BREAKER is not None:
+                BREAKER.falha(tipo)
+        else:
+            if BREAKER is not None:
+                BREAKER.sucesso()
+            if res or not repetir_vazio or tentativa >= RETRY_EMPTY_ATTEMPTS:
+                return res
+            erro, tipo = None, "vazio"
+
+        if tentativa == RETRY_MAX_ATTEMPTS or question_deadline_expired():
+            break
+        if BREAKER is not None:
+            BREAKER.repetiu(tipo)
+        espera = 0.0 if tipo == "login" else retry_backoff_s(tentativa)
+        dprint(f"    🔁 {nome}: {tipo}; tentativa {tentativa + 1} em {espera:.1f}s")
+        time.sleep(espera)
+
+    if erro is None:
+        return res
+    raise SiteError(tipo, f"{nome}: {erro}") from erro
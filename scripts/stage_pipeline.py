@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+PIPELINE DA EXTRAÇÃO (ESTÁGIOS + FILAS LIMITADAS)
+
+Estágios ligados por filas limitadas, usados pelo robo_pdf_para_codigos.py
+(parse -> recuperação -> validação -> site -> escrita):
+   - fila cheia = o estágio de cima espera (backpressure)
+   - estágio com thread_principal roda na thread que chamou run() (Playwright sync)
+   - estágio ordenado devolve a ordem do item.seq; `sempre` processa mesmo depois do stop
+   - erro em qualquer estágio (fn ou ocioso) para tudo e é relançado por run()
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# =========================
+# CONFIG
+# =========================
+PIPELINE_QUEUE_SIZE = 8  # tamanho de cada fila entre estágios
+
+_FIM = object()  # sentinela de fim de fluxo
+
+
+@dataclass
+class StageMetrics:
+    nome: str
+    processados: int = 0
+    ocupado_s: float = 0.0
+    fila_max: int = 0
+    fila_soma: int = 0
+    leituras: int = 0
+
+    def amostrar_fila(self, profundidade: int) -> None:
+        self.leituras += 1
+        self.fila_soma += profundidade
+        self.fila_max = max(self.fila_max, profundidade)
+
+    def report(self) -> str:
+        vazao = self.processados / self.ocupado_s if self.ocupado_s else 0.0
+        media = self.fila_soma / self.leituras if self.leituras else 0.0
+        return (
+            f"{self.nome}: {self.processados} itens em {self.ocupado_s:.1f}s ocupado ({vazao:.1f}/s) | "
+            f"fila média {media:.1f}, máx {self.fila_max}"
+        )
+
+
+@dataclass
+class Stage:
+    """
+    Um estágio: fn(item) -> item para o próximo estágio (None = não repassa).
+    - workers: threads consumindo a mesma fila de entrada
+    - thread_principal: roda na thread que chamou run() (Playwright sync não troca de thread)
+    - ordenado: processa na ordem do item.seq, mesmo se estágios paralelos antes embaralharem (só com 1 worker)
+    - sempre: processa o que chegar mesmo depois do stop (escrita: nada já resolvido se perde)
+    - ocioso: chamado enquanto a fila de entrada está vazia (True = fez algo, chama de novo);
+      erro nele para o pipeline como erro de fn
+    """
+    nome: str
+    fn: Callable[[Any], Optional[Any]]
+    workers: int = 1
+    thread_principal: bool = False
+    ordenado: bool = False
+    sempre: bool = False
+    ocioso: Optional[Callable[[], bool]] = None
+
+
+class Pipeline:
+    """
+    Produtor (parse) -> estágios ligados por filas limitadas (queue.Queue(maxsize)).
+    Fila cheia = o estágio de cima espera (backpressure); cada estágio pode ser trocado
+    sem mexer nos outros. stop: ninguém começa item novo, as filas só são drenadas.
+    Erro em qualquer estágio para tudo e é relançado por run().
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = PIPELINE_QUEUE_SIZE):
+        for st in stages:
+            if st.ordenado and st.workers != 1:
+                raise ValueError(f"Estágio ordenado precisa de 1 worker: {st.nome}")
+        self.stages = stages
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages]  # fila de ENTRADA de cada estágio
+        self.metrics: Dict[str, StageMetrics] = {"parse": StageMetrics("parse")}
+        self.metrics.update({st.nome: StageMetrics(st.nome) for st in stages})
+        self.stop = threading.Event()
+        self._erro: Optional[BaseException] = None
+
+    def _falhou(self, e: BaseException) -> None:
+        if self._erro is None:
+            self._erro = e
+        self.stop.set()
+
+    def _produzir(self, itens: Iterable[Any]) -> None:
+        m = self.metrics["parse"]
+        it = iter(itens)
+        try:
+            while not self.stop.is_set():
+                t0 = time.time()
+                try:
+                    item = next(it)
+                except StopIteration:
+                    break
+                m.ocupado_s += time.time() - t0
+                m.processados += 1
+                self.queues[0].put(item)
+        except BaseException as e:  # noqa: BLE001 - vira erro do pipeline
+            self._falhou(e)
+        finally:
+            self.queues[0].put(_FIM)
+
+    def _trabalhar(self, idx: int) -> None:
+        stage = self.stages[idx]
+        entrada = self.queues[idx]
+        saida = self.queues[idx + 1] if idx + 1 < len(self.stages) else None
+        m = self.metrics[stage.nome]
+        fora_de_ordem: Dict[int, Any] = {}
+        proximo_seq = 1
+
+        while True:
+            m.amostrar_fila(entrada.qsize())
+            if stage.ocioso is not None:
+                try:
+                    while entrada.empty() and not self.stop.is_set() and stage.ocioso():
+                        pass
+                except BaseException as e:  # noqa: BLE001 - vira erro do pipeline (e para tudo)
+                    self._falhou(e)
+            item = entrada.get()
+            if item is _FIM:
+                entrada.put(_FIM)  # os outros workers do estágio também precisam ver o fim
+                return
+
+            prontos = [item]
+            if stage.ordenado:
+                fora_de_ordem[item.seq] = item
+                prontos = []
+                while proximo_seq in fora_de_ordem:
+                    prontos.append(fora_de_ordem.pop(proximo_seq))
+                    proximo_seq += 1
+
+            for it in prontos:
+                if self.stop.is_set() and not stage.sempre:
+                    continue  # só drena
+                t0 = time.time()
+                try:
+                    out = stage.fn(it)
+                except BaseException as e:  # noqa: BLE001 - vira erro do pipeline
+                    self._falhou(e)
+                    continue
+                m.ocupado_s += time.time() - t0
+                m.processados += 1
+                if out is not None and saida is not None:
+                    saida.put(out)
+
+    def _fechar_estagio(self, idx: int, workers: List[threading.Thread]) -> None:
+        for t in workers:
+            t.join()
+        if idx + 1 < len(self.stages):
+            self.queues[idx + 1].put(_FIM)
+
+    def run(self, itens: Iterable[Any]) -> None:
+        threads = [threading.Thread(target=self._produzir, args=(itens,), name="parse", daemon=True)]
+        principal: Optional[int] = None
+        for idx, stage in enumerate(self.stages):
+            if stage.thread_principal:
+                principal = idx
+                continue
+            workers = [
+                threading.Thread(target=self._trabalhar, args=(idx,), name=f"{stage.nome}-{w}", daemon=True)
+                for w in range(stage.workers)
+            ]
+            threads += workers
+            threads.append(threading.Thread(target=self._fechar_estagio, args=(idx, workers), daemon=True))
+
+        for t in threads:
+            t.start()
+        if principal is not None:
+            self._trabalhar(principal)
+            self._fechar_estagio(principal, [])
+        for t in threads:
+            t.join()
+
+        if self._erro is not None:
+            raise self._erro
+
+    def report(self) -> List[str]:
+        return [m.report() for m in self.metrics.values()]
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Fixtures dos testes: o módulo de extração isolado num diretório temporário e o admin fake."""
+
+import importlib.util
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture
+def site_control(monkeypatch):
+    """scripts.site_control sem estado global da execução (prazos, governador, latências, breaker) e sem backoff."""
+    from scripts import site_control as mod
+
+    for nome in ("BREAKER", "GOVERNOR", "LATENCIES", "DEADLINES"):
+        monkeypatch.setattr(mod, nome, None)
+    monkeypatch.setattr(mod, "RETRY_BASE_S", 0.0)
+    return mod
+
+
+@pytest.fixture
+def robo(tmp_path, monkeypatch, site_control):
+    """scripts.robo_pdf_para_codigos com cwd temporário (debug/, outputs/) e sem estado global da execução."""
+    from scripts import robo_pdf_para_codigos as mod
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(mod, "NEGATIVE_CACHE", None)
+    return mod
+
+
+@pytest.fixture
+def fake_admin():
+    """tools/fake_admin_server.py numa thread, porta livre. Devolve o módulo (RECORDS) e a URL da API."""
+    spec = importlib.util.spec_from_file_location("fake_admin_server", ROOT / "tools" / "fake_admin_server.py")
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    mod.RECORDS = mod.gerar_questoes(60)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), mod.Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    mod.BASE_URL = f"http://127.0.0.1:{server.server_address[1]}"
+    mod.API_URL = mod.BASE_URL + mod.API_PREFIX
+    try:
+        yield mod
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(scope="session")
+def api_requester():
+    """APIRequestContext do Playwright (só o driver; não abre navegador)."""
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        ctx = p.request.new_context()
+        try:
+            yield ctx
+        finally:
+            ctx.dispose()
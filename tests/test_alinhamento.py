@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Alinhamento das alternativas PDF x site: embaralhadas contam, parecidas entre si não trocam de letra."""
+
+ALTS = {
+    "A": "Hipertensão arterial sistêmica descompensada",
+    "B": "Insuficiência renal aguda pré-renal",
+    "C": "Tromboembolismo pulmonar maciço",
+    "D": "Cetoacidose diabética grave",
+    "E": "Pneumonia adquirida na comunidade",
+}
+
+
+def test_mesma_ordem_conta_todas(robo):
+    assert robo.align_alternativas(ALTS, dict(ALTS)) == 5
+
+
+def test_alternativas_embaralhadas_no_site(robo):
+    site = dict(zip("ABCDE", [ALTS[k] for k in "DAECB"]))
+    assert robo.align_alternativas(ALTS, site) == 5
+
+
+def test_letra_repetida_realocada_no_pdf(robo):
+    pdf = {"A": ALTS["A"], "B": ALTS["B"], "C": ALTS["B"], "D": ALTS["C"], "E": ALTS["D"]}
+    assert robo.align_alternativas(pdf, dict(ALTS)) == 4
+
+
+def test_quase_iguais_nao_trocam_de_letra(robo):
+    pdf = {"A": "Apenas I e II", "B": "I, II e III", "C": "Apenas III", "D": "Todas"}
+    site = {"A": "I, II e III", "B": "Apenas I e II", "C": "Apenas III", "D": "Todas"}
+
+    # letra a letra só C e D batem. "I, II e III" é inequívoca e casa trocada de letra;
+    # "Apenas I e II" fica perto demais de "Apenas III" (100 x 88) e não troca de letra
+    assert robo.align_alternativas(pdf, site) == 3
+
+
+def test_quase_iguais_na_mesma_letra_continuam_contando(robo):
+    alts = {"A": "Apenas I e II", "B": "I, II e III", "C": "Apenas III", "D": "Todas"}
+    assert robo.align_alternativas(alts, dict(alts)) == 4
+
+
+def test_margem_zero_volta_ao_casamento_livre(robo, monkeypatch):
+    monkeypatch.setattr(robo, "ALT_ALIGNMENT_MARGIN", 0)
+    pdf = {"A": "Apenas I e II", "B": "I, II e III", "C": "Apenas III", "D": "Todas"}
+    site = {"A": "I, II e III", "B": "Apenas I e II", "C": "Apenas III", "D": "Todas"}
+    assert robo.align_alternativas(pdf, site) == 4
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Recuperação no espelho local por FTS5/BM25: a questão certa vem no topo, sem tocar no site."""
+
+import pytest
+
+from scripts import local_bank
+
+
+def _site_questions(robo, fake_admin, registros):
+    return [robo.row_to_site_question(robo.record_to_row(fake_admin._record(r))) for r in registros]
+
+
+def _questao(robo, sq):
+    return robo.QuestionBlock(1, "ESPECIALIDADE", sq.enunciado, dict(sq.alternativas), "")
+
+
+def _buscar(robo, b, questao, limit):
+    return b.search_fts(robo.fts_query_for_question(questao), limit)
+
+
+@pytest.fixture
+def bank(robo, tmp_path, fake_admin):
+    b = robo.LocalBank(str(tmp_path / "banco.sqlite"))
+    sqs = _site_questions(robo, fake_admin, fake_admin.gerar_questoes(80, seed=3))
+    b.upsert([(sq, "2024-01-01T00:00:00.000Z") for sq in sqs])
+    b.conn.commit()
+    yield b, sqs
+    b.close()
+
+
+def test_questao_do_banco_vem_em_primeiro(robo, bank):
+    b, sqs = bank
+    assert b.has_fts
+    for sq in sqs[:10]:
+        top = _buscar(robo, b, _questao(robo, sq), 5)
+        assert top[0].code == sq.code
+
+
+def test_busca_ignora_acento_e_caixa(robo, bank):
+    b, sqs = bank
+    alvo = sqs[4]
+    sem_acento = robo.normalize_text(alvo.enunciado).upper()
+    q = robo.QuestionBlock(1, "ESPECIALIDADE", sem_acento, {}, "")
+
+    assert _buscar(robo, b, q, 3)[0].code == alvo.code
+
+
+def test_enunciado_pesa_mais_que_alternativas(robo, tmp_path):
+    b = robo.LocalBank(str(tmp_path / "pesos.sqlite"))
+    no_enunciado = robo.SiteQuestion("1", "Paciente com bradicardia sinusal sintomática", {"A": "atropina"}, False, "")
+    na_alternativa = robo.SiteQuestion("2", "Paciente com dor torácica", {"A": "bradicardia sinusal sintomática"}, False, "")
+    b.upsert([(no_enunciado, ""), (na_alternativa, "")])
+    b.conn.commit()
+    q = robo.QuestionBlock(1, "ESPECIALIDADE", "bradicardia sinusal sintomática", {}, "")
+
+    assert [sq.code for sq in _buscar(robo, b, q, 2)] == ["1", "2"]
+    b.close()
+
+
+def test_indice_fts_dessincronizado_e_reconstruido_ao_abrir(robo, bank, tmp_path):
+    b, sqs = bank
+    b.conn.execute("DELETE FROM questions_fts")
+    b.conn.commit()
+    b.close()
+
+    reaberto = robo.LocalBank(str(tmp_path / "banco.sqlite"))
+    assert _buscar(robo, reaberto, _questao(robo, sqs[0]), 1)[0].code == sqs[0].code
+    reaberto.close()
+
+
+def test_query_fts_sem_stopwords_e_limitada(robo, monkeypatch):
+    q = robo.QuestionBlock(
+        1, "ESPECIALIDADE", "Qual a conduta para o lactente com hepatoesplenomegalia, febre prolongada e linfadenopatia?", {}, ""
+    )
+    sem_limite = robo.fts_query_for_question(q)
+    assert '"para"' not in sem_limite and '"com"' not in sem_limite and '"conduta"' not in sem_limite
+
+    monkeypatch.setattr(robo, "FTS_MAX_TERMS", 3)
+    assert robo.fts_query_for_question(q) == '"hepatoesplenomegalia" OR "linfadenopatia" OR "prolongada"'
+
+
+def test_sem_fts_cai_na_busca_por_substring(robo, tmp_path, monkeypatch, fake_admin):
+    monkeypatch.setattr(local_bank, "LOCAL_BANK_FTS", False)
+    b = robo.LocalBank(str(tmp_path / "sem_fts.sqlite"))
+    sqs = _site_questions(robo, fake_admin, fake_admin.gerar_questoes(20, seed=5))
+    b.upsert([(sq, "") for sq in sqs])
+    b.conn.commit()
+
+    rodadas = robo.local_bank_candidates(b, _questao(robo, sqs[7]))
+    assert not b.has_fts
+    assert sqs[7].code in {sq.code for _, cands in rodadas for sq in cands}
+    b.close()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Sync do espelho local contra tools/fake_admin_server.py: completo, incremental e remoção."""
+
+import json
+import urllib.request
+
+import pytest
+
+
+def _post(fake_admin, caminho: str) -> dict:
+    req = urllib.request.Request(fake_admin.BASE_URL + caminho, method="POST")
+    with urllib.request.urlopen(req) as resp:
+        return json.loads(resp.read())
+
+
+@pytest.fixture
+def bank(robo, tmp_path, monkeypatch):
+    monkeypatch.setattr(robo, "LOCAL_BANK_SYNC_PER_PAGE", 25)  # força várias páginas
+    monkeypatch.setattr(robo, "LOCAL_BANK_SYNC_OVERLAP_S", 5)
+    b = robo.LocalBank(str(tmp_path / "banco.sqlite"))
+    yield b
+    b.close()
+
+
+def test_sync_completo_baixa_tudo(robo, bank, fake_admin, api_requester):
+    gravados = robo.sync_local_bank(api_requester, bank, fake_admin.API_URL)
+
+    assert gravados == 60
+    assert bank.codes() == {r["code"] for r in fake_admin.RECORDS}
+    assert bank.get_meta("watermark") == max(r["updatedAt"] for r in fake_admin.RECORDS)
+    assert not bank._fts_needs_rebuild()
+
+
+def test_sync_incremental_so_relê_a_janela_da_marca(robo, bank, fake_admin, api_requester):
+    robo.sync_local_bank(api_requester, bank, fake_admin.API_URL)
+    novo = _post(fake_admin, "/touch/100003")["updatedAt"]
+
+    gravados = robo.sync_local_bank(api_requester, bank, fake_admin.API_URL)
+
+    # o tocado + a marca anterior + os 5 s de sobreposição (registros a 1 s um do outro)
+    assert gravados == 7
+    assert bank.get_meta("watermark") == novo
+    assert bank.count() == 60
+
+
+def test_sync_incremental_pega_registro_com_o_mesmo_updated_at_da_marca(robo, bank, fake_admin, api_requester):
+    robo.sync_local_bank(api_requester, bank, fake_admin.API_URL)
+    marca = bank.get_meta("watermark")
+    fake_admin.RECORDS.append({
+        "code": "999999",
+        "description": "(USP-SP 2024)\nLactente com febre e exantema. Qual a conduta?\nA. x\nB. y",
+        "specialty": "Pediatria",
+        "updatedAt": marca,
+    })
+
+    robo.sync_local_bank(api_requester, bank, fake_admin.API_URL)
+
+    assert "999999" in bank.codes()
+
+
+def test_sync_remove_registro_apagado_no_admin(robo, bank, fake_admin, api_requester):
+    robo.sync_local_bank(api_requester, bank, fake_admin.API_URL)
+    _post(fake_admin, "/delete/100010")
+
+    robo.sync_local_bank(api_requester, bank, fake_admin.API_URL)
+
+    assert "100010" not in bank.codes()
+    assert bank.count() == 59
+    assert not bank._fts_needs_rebuild()
+
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""BrowserService: relançamento, health check, call na thread do daemon e stop com prazo (sem Playwright real)."""
+
+import threading
+from concurrent.futures import CancelledError
+
+import pytest
+
+from scripts import browser_service
+
+
+class NavegadorFalso:
+    def __init__(self):
+        self.contexts = []
+
+    def is_connected(self):
+        return True
+
+    def new_context(self, **kwargs):
+        if "storage_state" in kwargs:
+            raise ValueError("storage_state: Unexpected token in JSON")
+        self.contexts.append(kwargs)
+        return object()
+
+
+def test_abrir_sem_a_sessao_quando_ela_nao_carrega(tmp_path):
+    estado = tmp_path / "state.json"
+    estado.write_text("{corrompido", encoding="utf-8")
+    svc = browser_service.BrowserService()
+    svc.playwright = object()  # não sobe o driver
+    navegador = NavegadorFalso()
+    slot = svc._slots["admin"]
+
+    svc._abrir(slot, True, str(estado), lambda pw: navegador, {"user_agent": "x"})
+
+    assert slot.context is not None
+    assert navegador.contexts == [{"user_agent": "x"}]
+    assert slot.storage_state == str(estado)  # ao fechar, a sessão nova sobrescreve a corrompida
+
+
+class Navegador:
+    """Browser falso: conectado até cair(); context grava o storage_state pedido."""
+
+    def __init__(self):
+        self.conectado = True
+        self.fechado = False
+        self.sessoes_salvas = []
+
+    def is_connected(self):
+        return self.conectado
+
+    def cair(self):
+        self.conectado = False
+
+    def new_context(self, **kwargs):
+        navegador = self
+
+        class Context:
+            def storage_state(self, path):
+                navegador.sessoes_salvas.append(path)
+
+            def close(self):
+                pass
+
+        return Context()
+
+    def close(self):
+        self.fechado = True
+
+
+@pytest.fixture
+def svc():
+    s = browser_service.BrowserService()
+    s.playwright = object()  # não sobe o driver
+    yield s
+    s.stop(timeout_s=5)
+
+
+def test_navegador_caido_e_relancado_e_desiste_depois_de_max_restarts(svc, monkeypatch):
+    monkeypatch.setattr(browser_service, "MAX_RESTARTS", 2)
+    lancados = []
+
+    def lancar(pw):
+        lancados.append(Navegador())
+        return lancados[-1]
+
+    slot = svc._slots["admin"]
+    svc._abrir(slot, True, None, lancar, {})
+    for _ in range(2):
+        lancados[-1].cair()
+        svc._abrir(slot, True, None, lancar, {})
+
+    assert len(lancados) == 3 and svc.reinicios == 2
+    lancados[-1].cair()
+    with pytest.raises(RuntimeError, match="caiu 2x"):
+        svc._abrir(slot, True, None, lancar, {})
+
+
+def test_tarefa_concluida_zera_os_relancamentos_seguidos(svc):
+    svc._reinicios_seguidos = 3
+    assert svc.call(lambda s: "ok") == "ok"
+    assert svc._reinicios_seguidos == 0
+
+
+def test_health_check_descarta_navegador_caido_quando_ocioso(svc, monkeypatch):
+    monkeypatch.setattr(browser_service, "HEALTH_INTERVAL_S", 0.01)
+    navegador = Navegador()
+    slot = svc._slots["sheets"]
+    svc._abrir(slot, True, None, lambda pw: navegador, {})
+    assert svc.call(lambda s: s._slots["sheets"].browser) is navegador
+
+    navegador.cair()
+    for _ in range(200):
+        if slot.browser is None:
+            break
+        threading.Event().wait(0.01)
+
+    assert slot.browser is None and navegador.fechado
+    assert svc.reinicios == 1
+
+
+def test_call_dentro_de_uma_tarefa_roda_direto_na_thread_do_daemon(svc):
+    threads = []
+
+    def interna(s):
+        threads.append(threading.current_thread())
+        return "interna"
+
+    def externa(s):
+        threads.append(threading.current_thread())
+        return s.call(interna)  # sem o atalho, esperaria a si mesma para sempre
+
+    assert svc.submit(externa).result(timeout=5) == "interna"
+    assert threads[0] is threads[1] is svc._thread
+
+
+def test_stop_salva_as_sessoes(svc, tmp_path):
+    navegador = Navegador()
+    estado = tmp_path / "state.json"
+    svc.call(lambda s: s._abrir(s._slots["admin"], True, str(estado), lambda pw: navegador, {}))
+
+    assert svc.stop(timeout_s=5) is True
+    assert navegador.sessoes_salvas == [str(estado)] and navegador.fechado
+
+
+def test_stop_com_tarefa_presa_avisa_cancela_a_fila_e_sinaliza(svc):
+    comecou, soltar = threading.Event(), threading.Event()
+    viu_parando = []
+
+    def presa(s):
+        comecou.set()
+        soltar.wait(5)
+        viu_parando.append(s.parando)
+
+    rodando = svc.submit(presa)
+    comecou.wait(5)
+    na_fila = svc.submit(lambda s: "nunca")
+
+    assert svc.stop(timeout_s=0.2) is False
+    assert svc.parando and na_fila.cancelled()
+    with pytest.raises(RuntimeError, match="encerrando"):
+        svc.submit(lambda s: None)
+
+    soltar.set()
+    rodando.result(timeout=5)
+    assert viu_parando == [True]
+    assert svc.stop(timeout_s=5) is True
+    with pytest.raises(CancelledError):
+        na_fila.result()
+
+
+
+def test_extracao_para_entre_questoes_quando_o_navegador_encerra(robo):
+    class Servico:
+        parando = True
+
+    questao = robo.QuestionBlock(1, "OUTRAS", "Gestante com 32 semanas. Qual a conduta?", {"A": "x"}, "")
+    run = robo.ExtractionRun(page=None, scope=robo.SearchScope(), journal=None, retomar=False, total=1,
+                             browser_service=Servico())
+    run.pipeline = robo.Pipeline([])
+    task = robo.UpgradeTask(questao, None, robo._SearchState(total_pdf=1, especialidade=None),
+                            robo.MatchResult("1", 80, 1, "MEDIA", False, ""), ["q"])
+    run.upgrades.append((robo.PipelineItem(seq=2, questao=questao), task))
+
+    assert run.site(robo.PipelineItem(seq=1, questao=questao)) is None
+    assert run.pipeline.stop.is_set()
+    assert run.upgrade_slice() is False and len(run.upgrades) == 1
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Cabeçalho da prova (instituição + ano) no PDF e na listagem do site, e a triagem que usa ele."""
+
+import pytest
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("SES-DF 2022 ACESSO DIRETO. Paciente de 30 anos", ("SES-DF", 2022)),
+    ("(UERJ-RJ 2024)", ("UERJ-RJ", 2024)),
+    ("SÃO PAULO 2022 ACESSO DIRETO.", ("SÃO PAULO", 2022)),
+    ("HOSPITAL SÍRIO-LIBANÊS 2020 Criança com tosse", ("HOSPITAL SÍRIO-LIBANÊS", 2020)),
+    ("(Unicamp 2023)", ("Unicamp", 2023)),
+    ("Santa Casa de São Paulo 2021\nPaciente", ("Santa Casa de São Paulo", 2021)),
+    ("UERJ 2022 Paciente de 40 anos", ("UERJ", 2022)),
+])
+def test_cabecalho_reconhecido(robo, texto, esperado):
+    assert robo.extract_cabecalho(texto) == esperado
+
+
+@pytest.mark.parametrize("texto", [
+    "Em 2019, paciente com dor torácica procurou o PS",
+    "Paciente de 45 anos com febre",
+    "",
+])
+def test_enunciado_sem_cabecalho(robo, texto):
+    assert robo.extract_cabecalho(texto) == (None, None)
+
+
+def test_questao_do_pdf_com_cabecalho_acentuado(robo):
+    q = robo.extract_questao_completa(
+        "12. SÃO PAULO 2022 ACESSO DIRETO. Paciente de 30 anos com febre. Qual o diagnóstico?\n"
+        "A) Dengue\nB) Malária\nC) Zika\nD) Febre amarela"
+    )
+
+    assert (q.instituicao, q.ano, q.tipo) == ("SÃO PAULO", 2022, "ACESSO_DIRETO")
+    assert q.enunciado == "Paciente de 30 anos com febre. Qual o diagnóstico?"
+
+
+def test_listagem_do_site_com_cabecalho_minusculo(robo):
+    enunciado, alts, is_ad, inst, ano = robo.parse_listagem_texto(
+        "(Unicamp 2023)\nPaciente com febre. Qual o diagnóstico?\nA) Dengue\nB) Malária"
+    )
+
+    assert (inst, ano) == ("Unicamp", 2023)
+    assert enunciado == "Paciente com febre. Qual o diagnóstico?"
+    assert alts == {"A": "Dengue", "B": "Malária"} and not is_ad
+
+
+def test_triagem_descarta_ano_e_penaliza_instituicao_acentuada(robo, monkeypatch):
+    monkeypatch.setattr(robo, "HEADER_PREFILTER", True)
+    questao = robo.QuestionBlock(3, "ESPECIALIDADE", "Paciente com febre", {}, "", "SÃO PAULO", 2022)
+    site = [
+        robo.SiteQuestion("1", "x", {}, False, "", "SÃO PAULO", 2021),  # ano diferente: fora
+        robo.SiteQuestion("2", "x", {}, False, "", "Unicamp", 2022),  # instituição diverge: penalidade
+        robo.SiteQuestion("3", "x", {}, False, "", "Sao Paulo", 2022),
+    ]
+    st = robo._SearchState(total_pdf=4, especialidade=None)
+
+    triados = robo._triar_candidatos(questao, site, st)
+
+    assert [sq.code for sq in triados] == ["3", "2"]
+    assert st.header_skipped == 1
+    assert st.penalidade == {"2": robo.HEADER_INSTITUICAO_PENALTY}
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""NegativeCache: queries vazias e esgotadas, TTL persistido."""
+
+import time
+
+
+def _questao(robo, numero: int):
+    return robo.QuestionBlock(
+        numero=numero,
+        tipo="OUTRAS",
+        enunciado=f"Paciente {numero} com dor torácica há duas horas. Qual a conduta inicial?",
+        alternativas={"A": "AAS", "B": "Heparina"},
+        texto_completo="",
+    )
+
+
+def test_cache_negativo_persiste_e_filtra(robo, tmp_path):
+    path = str(tmp_path / "neg.json")
+    q = _questao(robo, 1)
+    c = robo.NegativeCache(path)
+    c.registrar_vazia("dor toracica", {"year": "2024"})
+    c.registrar_esgotadas(q, "Cardiologia", ["aas heparina"])
+    c.save()
+
+    c2 = robo.NegativeCache(path)
+    queries = ["dor toracica", "aas heparina", "conduta inicial"]
+
+    assert c2.filtrar(q, "Cardiologia", queries, {"year": "2024"}) == ["conduta inicial"]
+    assert c2.filtrar(q, "Pediatria", queries) == queries  # outros filtros/especialidade: nada pulado
+    assert c2.puladas == 2
+
+
+def test_cache_negativo_descarta_entradas_vencidas_ao_carregar(robo, tmp_path):
+    path = str(tmp_path / "neg.json")
+    q = _questao(robo, 1)
+    c = robo.NegativeCache(path)
+    c.registrar_vazia("velha")
+    c.registrar_vazia("nova")
+    c.registrar_esgotadas(q, None, ["esgotada velha"])
+    c.queries[c.query_key("velha")] = time.time() - 120
+    c.questoes[c.questao_key(q, None)]["esgotada velha"] = time.time() - 120
+    c.save()
+
+    c2 = robo.NegativeCache(path, ttl_query_s=60, ttl_questao_s=60)
+
+    assert c2.query_key("velha") not in c2.queries
+    assert c2.query_key("nova") in c2.queries
+    assert c2.questoes == {}
+    assert c2.filtrar(q, None, ["velha", "nova", "esgotada velha"]) == ["velha", "esgotada velha"]
+
+
+def test_cache_negativo_so_grava_quando_sujo(robo, tmp_path):
+    path = tmp_path / "neg.json"
+    c = robo.NegativeCache(str(path))
+    c.save()
+    assert not path.exists()
+
+    c.registrar_vazia("x")
+    c.save()
+    assert path.exists() and not c.sujo
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Cascata barata antes do fuzzy completo: tier 2 exato, tier 1 heurístico e contadores."""
+
+import threading
+
+import pytest
+
+
+ENUNCIADO = (
+    "Lactente de oito meses com febre alta há três dias, irritabilidade, abaulamento de fontanela "
+    "e petéquias em tronco. Qual o agente etiológico mais provável?"
+)
+
+
+@pytest.fixture
+def stats(robo, monkeypatch):
+    s = robo.MatchStats()
+    monkeypatch.setattr(robo, "MATCH_STATS", s)
+    return s
+
+
+def _sq(robo, code, enunciado):
+    return robo.SiteQuestion(code, enunciado, {}, False, "")
+
+
+def _enunciado_passa(robo, questao, sq):
+    a_n, a_x = robo.normalize_text(questao.enunciado), robo.normalize_for_comparison(questao.enunciado)
+    b_n, b_x = robo.site_enunciado_norms(sq)
+    ts = max(robo.fuzz.token_set_ratio(a_n, b_n), robo.fuzz.token_set_ratio(a_x, b_x))
+    pr = max(robo.fuzz.partial_ratio(a_n, b_n), robo.fuzz.partial_ratio(a_x, b_x))
+    return robo._enunciado_ok(int(ts), int(pr), int(robo.fuzz.token_set_ratio(a_x, b_x)))
+
+
+def test_tier2_da_a_mesma_decisao_do_fuzzy_completo(robo, stats, monkeypatch):
+    monkeypatch.setattr(robo, "CASCADE_TIER1", False)
+    questao = robo.QuestionBlock(1, "ESPECIALIDADE", ENUNCIADO, {}, "")
+    palavras = ENUNCIADO.split()
+    cands = [_sq(robo, str(i), " ".join(palavras[i:] + palavras[:i])) for i in range(0, len(palavras), 3)]
+    cands += [_sq(robo, "x", ENUNCIADO[:60]), _sq(robo, "y", "Gestante com sangramento vaginal indolor.")]
+
+    survivors = {sq.code for sq in robo.cascade_prefilter(questao, cands)}
+
+    assert survivors == {sq.code for sq in cands if _enunciado_passa(robo, questao, sq)}
+    assert stats.avaliados == len(cands)
+    assert "y" not in survivors and "0" in survivors
+    assert stats.rej_enunciado == len(cands) - len(survivors)
+    assert stats.rej_tamanho == stats.rej_tokens_raros == 0
+
+
+def test_tier1_corta_tamanho_e_tokens_raros_disjuntos(robo, stats, monkeypatch):
+    monkeypatch.setattr(robo, "CASCADE_TIER1", True)
+    questao = robo.QuestionBlock(1, "ESPECIALIDADE", ENUNCIADO, {}, "")
+    cands = [
+        _sq(robo, "igual", ENUNCIADO),
+        _sq(robo, "curto", "Febre."),
+        _sq(robo, "outro", "Gestante primigesta apresentando sangramento vaginal indolor, placenta inserida "
+                           "anteriormente, hemoglobina diminuída, taquicardia materna. Conduta imediata?"),
+    ]
+
+    survivors = [sq.code for sq in robo.cascade_prefilter(questao, cands)]
+
+    assert survivors == ["igual"]
+    assert stats.rej_tamanho == 1 and stats.rej_tokens_raros == 1
+
+
+def test_contadores_somados_de_varias_threads(robo, stats):
+    def somar():
+        for _ in range(2000):
+            stats.somar(avaliados=1, aceitos=1)
+
+    threads = [threading.Thread(target=somar) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats.merge({"rej_alternativas": 3})
+
+    assert stats.avaliados == stats.aceitos == 16000
+    assert stats.rej_alternativas == 3
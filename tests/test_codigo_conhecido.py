@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Caminho rápido por código: registro exato pela API, memo de códigos e verificação antes da busca."""
+
+import pytest
+
+
+@pytest.fixture
+def api(robo, fake_admin, monkeypatch):
+    monkeypatch.setattr(robo, "QUESTIONS_API_URL", fake_admin.API_URL)
+    return fake_admin
+
+
+def _questao_do_registro(robo, rec):
+    enunciado, alts, is_ad, inst, ano = robo.parse_listagem_texto(rec["description"])
+    return robo.QuestionBlock(7, "ACESSO_DIRETO" if is_ad else "ESPECIALIDADE", enunciado, alts, "", inst, ano)
+
+
+def test_registro_por_codigo_usa_o_filtro_e_confere_igualdade(robo, api, api_requester):
+    sq = robo.fetch_site_question_by_code(api_requester, "100010")
+
+    assert sq is not None and sq.code == "100010"
+    assert robo.fetch_site_question_by_code(api_requester, "1000") is None  # "contém" não basta
+    assert robo.fetch_site_question_by_code(api_requester, "999999") is None
+
+
+def test_verificar_codigo_da_propria_questao_da_alta(robo, api, api_requester):
+    questao = _questao_do_registro(robo, api.RECORDS[5])
+
+    result = robo.verify_code_for_question(api_requester, questao, api.RECORDS[5]["code"])
+
+    assert result is not None and result.code == api.RECORDS[5]["code"]
+    assert result.confianca == "ALTA"
+
+
+def test_verificar_codigo_de_outra_questao_nao_confere(robo, api, api_requester):
+    questao = _questao_do_registro(robo, api.RECORDS[5])
+
+    assert robo.verify_code_for_question(api_requester, questao, api.RECORDS[6]["code"]) is None
+
+
+def test_codigo_conhecido_dispensa_a_busca(robo, api, api_requester, monkeypatch):
+    questao = _questao_do_registro(robo, api.RECORDS[3])
+    robo.save_known_code(robo.question_fingerprint(questao.enunciado), api.RECORDS[3]["code"])
+    scope = robo.SearchScope(codigos_conhecidos=robo.load_known_codes())
+
+    def busca(*a, **k):
+        raise AssertionError("não devia buscar")
+
+    monkeypatch.setattr(robo, "_find_code_for_question", busca)
+
+    assert robo.find_code_on_site(api_requester, questao, scope).code == api.RECORDS[3]["code"]
+
+
+def test_codigo_conhecido_errado_cai_na_busca(robo, api, api_requester, monkeypatch):
+    questao = _questao_do_registro(robo, api.RECORDS[3])
+    scope = robo.SearchScope(codigos_conhecidos={robo.question_fingerprint(questao.enunciado): api.RECORDS[4]["code"]})
+    buscas = []
+    monkeypatch.setattr(robo, "_find_code_for_question", lambda *a, **k: buscas.append(1))
+
+    assert robo.find_code_on_site(api_requester, questao, scope) is None
+    assert buscas == [1]
+
+
+def test_memo_de_codigos_nao_regrava_o_mesmo(robo, tmp_path):
+    path = str(tmp_path / "memo.json")
+    robo.save_known_code("abc", "100001", path)
+    mtime = (tmp_path / "memo.json").stat().st_mtime_ns
+
+    robo.save_known_code("abc", "100001", path)
+    assert (tmp_path / "memo.json").stat().st_mtime_ns == mtime
+    robo.save_known_code("abc", "100002", path)
+    assert robo.load_known_codes(path) == {"abc": "100002"}
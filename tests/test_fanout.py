@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Fan-out da página 1: as linhas da API só servem para achar match; a tabela relê tudo."""
+
+import pytest
+
+
+@pytest.fixture
+def busca(robo, tmp_path, monkeypatch):
+    monkeypatch.setattr(robo, "FANOUT_TOP_K", 3)
+    monkeypatch.setattr(robo, "PREFETCH_NEXT_PAGE", False)
+    monkeypatch.setattr(robo, "rows_limit_for_query", lambda q: 2)
+    monkeypatch.setattr(robo, "pages_limit_for_query", lambda q: 1)
+    monkeypatch.setattr(robo, "build_queries_for_question", lambda q: ["q1", "q2", "q3"])
+    monkeypatch.setattr(robo, "NEGATIVE_CACHE", robo.NegativeCache(str(tmp_path / "neg.json")))
+
+    api = {"q1": [], "q2": [{"code": "9", "desc": "x", "esp": ""}], "q3": None}  # vazia, curta, falhou
+    chaves = {}
+
+    def start(page, url):
+        q = url.rsplit("filters.description=", 1)[1]
+        chaves[f"k{q}"] = q
+        return f"k{q}"
+
+    def race(page, keys):
+        key = keys[0]
+        return key, api[chaves[key]]
+
+    tabela = []
+
+    def fetch(page, q, pnum, extra_filters=None):
+        tabela.append((q, pnum))
+        return [{"code": f"{q}-{pnum}", "desc": "y", "esp": ""}]
+
+    monkeypatch.setattr(robo, "start_prefetch", start)
+    monkeypatch.setattr(robo, "race_prefetch", race)
+    monkeypatch.setattr(robo, "cancel_prefetch", lambda page, key: None)
+    monkeypatch.setattr(robo, "fetch_rows_ui", fetch)
+    monkeypatch.setattr(robo, "_process_page_rows", lambda *a, **k: None)
+    questao = robo.QuestionBlock(1, "ESPECIALIDADE", "Paciente com febre", {"A": "a", "B": "b"}, "")
+    return questao, tabela
+
+
+def test_api_vazia_ou_curta_nao_esgota_nem_vai_para_o_cache_negativo(robo, busca):
+    questao, tabela = busca
+
+    robo._find_code_for_question(None, questao, None)
+
+    assert tabela == [("q1", 1), ("q2", 1), ("q3", 1)]  # página 1 de todas pela tabela
+    assert robo.NEGATIVE_CACHE.queries == {}
+
+
+def test_fanout_desligado_por_padrao():
+    from scripts import robo_pdf_para_codigos as mod
+
+    assert mod.FANOUT_TOP_K == 1
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""RequestGovernor (token bucket + AIMD) e os slots de prefetch em voo."""
+
+import threading
+import time
+
+import pytest
+from playwright.sync_api import Error as PlaywrightError
+
+
+# =========================
+# GOVERNOR
+# =========================
+def test_governor_respeita_rajada_e_taxa(site_control):
+    g = site_control.RequestGovernor(rate_per_s=50.0, burst=2)
+
+    t0 = time.time()
+    for _ in range(4):
+        g.acquire()
+    decorrido = time.time() - t0
+
+    assert g.requisicoes == 4
+    assert decorrido >= 0.03  # 2 da rajada + 2 a 50/s
+    assert g.espera_s > 0
+
+
+def test_governor_aimd_sobe_devagar_e_cai_pela_metade(site_control, monkeypatch):
+    monkeypatch.setattr(site_control, "GOVERNOR_DECREASE_COOLDOWN_S", 0.0)
+    g = site_control.RequestGovernor(concorrencia=2.0, max_concorrencia=6.0)
+
+    g.registrar(200, 0.1)
+    assert g.limite == pytest.approx(2.5)
+    g.registrar(None, 0.1)
+    assert g.limite == pytest.approx(1.25)
+    g.registrar(503, 0.1)
+    assert g.limite == 1.0  # nunca abaixo de 1
+    assert g.sinais["timeout"] == 1 and g.sinais["5xx"] == 1
+    assert g.reducoes == 2
+
+    for _ in range(100):
+        g.registrar(200, 0.1)
+    assert g.limite == 6.0
+    assert g.concorrencia(10) == 6 and g.concorrencia(3) == 3
+
+
+def test_governor_reduz_uma_vez_por_rajada(site_control):
+    g = site_control.RequestGovernor(concorrencia=4.0, max_concorrencia=4.0)
+
+    for _ in range(3):
+        g.registrar(0, 0.1)
+
+    assert g.limite == pytest.approx(2.0)
+    assert g.sinais["erro"] == 3 and g.reducoes == 1
+
+
+def test_governor_429_pausa_e_resposta_lenta_conta(site_control, monkeypatch):
+    monkeypatch.setattr(site_control, "GOVERNOR_429_PAUSE_S", 0.05)
+    g = site_control.RequestGovernor(rate_per_s=1000.0, burst=5)
+
+    g.registrar(429, 0.1)
+    t0 = time.time()
+    g.acquire()
+    assert time.time() - t0 >= 0.04
+
+    g.registrar(200, site_control.GOVERNOR_SLOW_LATENCY_S + 1)
+    assert g.sinais["lenta"] == 1
+
+
+def test_governor_conta_em_voo(site_control):
+    g = site_control.RequestGovernor(concorrencia=2.0)
+
+    g.disparou()
+    assert g.pode_disparar()
+    g.disparou()
+    assert not g.pode_disparar()
+    g.liberar()
+    g.liberar()
+    g.liberar()  # liberar a mais não fica negativo
+    assert g.em_voo == 0 and g.pico_em_voo == 2
+
+
+def test_governor_le_em_voo_e_limite_sob_o_lock(site_control):
+    g = site_control.RequestGovernor(concorrencia=2.0)
+    resposta = []
+
+    with g._lock:  # outra thread no meio de registrar()/liberar()
+        t = threading.Thread(target=lambda: resposta.append(g.pode_disparar()))
+        t.start()
+        t.join(0.2)
+        assert t.is_alive() and resposta == []
+        g.em_voo = 2
+    t.join(5)
+
+    assert resposta == [False]
+
+
+# =========================
+# PREFETCH x SLOTS DO GOVERNOR
+# =========================
+@pytest.fixture
+def governor(robo, site_control, monkeypatch):
+    g = site_control.RequestGovernor(rate_per_s=1000.0, burst=10, concorrencia=4.0)
+    monkeypatch.setattr(site_control, "GOVERNOR", g)
+    monkeypatch.setattr(robo, "_prefetch_em_voo", set())
+    return g
+
+
+def _pagina(robo, collect=None, cancel=None, race=None):
+    class Pagina:
+        def evaluate(self, script, arg=None):
+            resposta = {robo._JS_PREFETCH_COLLECT: collect, robo._JS_PREFETCH_CANCEL: cancel,
+                        robo._JS_PREFETCH_RACE: race}.get(script, True)
+            if isinstance(resposta, BaseException):
+                raise resposta
+            return resposta
+    return Pagina()
+
+
+def test_prefetch_libera_o_slot_mesmo_com_erro_no_evaluate(robo, governor):
+    page = _pagina(robo, collect=PlaywrightError("Execution context was destroyed"))
+    key = robo.start_prefetch(page, "http://x/actions/list")
+    assert governor.em_voo == 1
+
+    assert robo.collect_prefetch(page, key) is None
+    assert governor.em_voo == 0
+    robo.cancel_prefetch(page, key)  # segunda liberação não desconta de outro prefetch
+    other = robo.start_prefetch(page, "http://x/actions/list?page=2")
+    robo.cancel_prefetch(page, key)
+    assert governor.em_voo == 1
+    robo.cancel_prefetch(page, other)
+    assert governor.em_voo == 0
+
+
+def test_prefetch_cancelado_depois_de_navegar_libera_o_slot(robo, governor):
+    page = _pagina(robo, cancel=False)  # store apagado: o JS não acha a chave
+    keys = [robo.start_prefetch(page, f"http://x/{i}") for i in range(3)]
+    assert governor.em_voo == 3
+
+    for k in keys:
+        robo.cancel_prefetch(page, k)
+
+    assert governor.em_voo == 0
+
+
+def test_race_sem_chaves_vivas_nao_conta_timeout(robo, governor):
+    page = _pagina(robo, race={"perdidas": True}, cancel=False)
+    key = robo.start_prefetch(page, "http://x/1")
+
+    assert robo.race_prefetch(page, [key]) is None
+    assert governor.sinais["timeout"] == 0
+    robo.cancel_prefetch(page, key)
+    assert governor.em_voo == 0
+
+
+def test_race_libera_so_quem_chegou(robo, governor):
+    page = _pagina(robo)
+    k1 = robo.start_prefetch(page, "http://x/1")
+    k2 = robo.start_prefetch(page, "http://x/2")
+    page = _pagina(robo, race={"key": k2, "status": 200, "data": {"records": []}, "ms": 10})
+
+    assert robo.race_prefetch(page, [k1, k2]) == (k2, [])
+    assert governor.em_voo == 1
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""RunJournal: checkpoint por PDF, retomada depois de queda no meio da escrita."""
+
+import json
+
+import pytest
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    p = tmp_path / "prova.pdf"
+    p.write_bytes(b"%PDF-1.4 prova de teste")
+    return str(p)
+
+
+def _questao(robo, numero: int):
+    return robo.QuestionBlock(
+        numero=numero,
+        tipo="OUTRAS",
+        enunciado=f"Paciente {numero} com dor torácica há duas horas. Qual a conduta inicial?",
+        alternativas={"A": "AAS", "B": "Heparina"},
+        texto_completo="",
+    )
+
+
+def _resultado(robo, code: str):
+    return robo.MatchResult(code, 97, 2, "ALTA", False, "Clínica Médica")
+
+
+def test_journal_recarrega_o_que_foi_gravado(robo, pdf, tmp_path):
+    j = robo.RunJournal(pdf, str(tmp_path / "journal"))
+    j.record(_questao(robo, 1), _resultado(robo, "100001"), robo.SearchCost(queries=2, requisicoes=3))
+
+    entrada = robo.RunJournal(pdf, str(tmp_path / "journal")).lookup(_questao(robo, 1))
+
+    assert entrada is not None
+    assert robo.RunJournal.to_match_result(entrada) == _resultado(robo, "100001")
+    assert entrada["queries"] == 2 and entrada["requisicoes"] == 3
+
+
+def test_journal_ignora_linha_cortada_e_continua_numa_linha_nova(robo, pdf, tmp_path):
+    j = robo.RunJournal(pdf, str(tmp_path / "journal"))
+    j.record(_questao(robo, 1), _resultado(robo, "100001"), robo.SearchCost())
+    j.record(_questao(robo, 2), _resultado(robo, "100002"), robo.SearchCost())
+    with open(j.path, "a", encoding="utf-8") as f:
+        f.write('{"key": "OUTRAS:3:abc", "status": "encon')  # queda no meio da escrita
+
+    j2 = robo.RunJournal(pdf, str(tmp_path / "journal"))
+    assert len(j2.entries) == 2
+    j2.record(_questao(robo, 3), _resultado(robo, "100003"), robo.SearchCost())
+
+    linhas = j2.path.read_text(encoding="utf-8").splitlines()
+    assert json.loads(linhas[-1])["resultado"]["code"] == "100003"
+    j3 = robo.RunJournal(pdf, str(tmp_path / "journal"))
+    assert {robo.RunJournal.to_match_result(e).code for e in j3.entries.values()} == {"100001", "100002", "100003"}
+
+
+def test_journal_ultima_linha_da_questao_vale(robo, pdf, tmp_path):
+    j = robo.RunJournal(pdf, str(tmp_path / "journal"))
+    j.record(_questao(robo, 1), _resultado(robo, "100001"), robo.SearchCost())
+    j.record(_questao(robo, 1), _resultado(robo, "100099"), robo.SearchCost())  # upgrade anytime
+
+    entrada = robo.RunJournal(pdf, str(tmp_path / "journal")).lookup(_questao(robo, 1))
+    assert entrada["resultado"]["code"] == "100099"
+
+
+def test_journal_nao_retoma_questao_nao_encontrada(robo, pdf, tmp_path):
+    j = robo.RunJournal(pdf, str(tmp_path / "journal"))
+    j.record(_questao(robo, 1), None, robo.SearchCost(queries=5))
+    j.record(_questao(robo, 2), _resultado(robo, "100002"), robo.SearchCost())
+
+    j2 = robo.RunJournal(pdf, str(tmp_path / "journal"))
+    assert j2.lookup(_questao(robo, 1)) is None
+    assert j2.lookup(_questao(robo, 2)) is not None
+    assert j2.resolvidas() == 1
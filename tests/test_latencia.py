@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""LatencyTracker: timeout adaptativo por tipo de chamada, amostra censurada e folga."""
+
+
+def test_latencia_timeout_entra_como_amostra_censurada(site_control):
+    lat = site_control.LatencyTracker(janela=100, min_amostras=10, percentil=90, fator=1.0)
+    for _ in range(80):
+        lat.registrar("api", 1.0)
+    for _ in range(20):
+        lat.estourou("api", 6.0)
+
+    assert lat.quantil_s("api", 90) == 6.0  # sem as censuradas o p90 seria 1 s
+    assert lat.estouros["api"] == 20
+
+
+def test_latencia_folga_volta_aos_poucos(site_control):
+    lat = site_control.LatencyTracker(janela=100, min_amostras=5, percentil=50, fator=1.0)
+    for _ in range(10):
+        lat.registrar("results", 10.0)
+    base = lat.timeout_ms("results", 120000)
+
+    lat.estourou("results", 10.0)
+    assert lat.timeout_ms("results", 120000) == 2 * base
+    lat.registrar("results", 10.0)
+    depois = lat.timeout_ms("results", 120000)
+    assert base < depois < 2 * base  # uma resposta boa não zera a folga
+
+    for _ in range(50):
+        lat.registrar("results", 10.0)
+    assert lat.timeout_ms("results", 120000) == base
+    assert lat.ultimo_ms["results"] == base
+
+
+def test_latencia_sem_amostras_suficientes_usa_o_teto_e_respeita_o_piso(site_control):
+    lat = site_control.LatencyTracker(janela=100, min_amostras=5, percentil=90, fator=2.0)
+    for _ in range(4):
+        lat.registrar("api", 0.001)
+    assert lat.timeout_ms("api", 30000) == 30000
+
+    lat.registrar("api", 0.001)
+    piso = site_control.ADAPTIVE_TIMEOUT_FLOOR_MS.get("api", site_control.MIN_CALL_TIMEOUT_MS)
+    assert lat.timeout_ms("api", 30000) == piso
+
+    for _ in range(100):
+        lat.registrar("api", 60.0)
+    assert lat.timeout_ms("api", 30000) == 30000
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Matching do banco local em processos: mesmo resultado do caminho em série, banco só leitura."""
+
+import hashlib
+import sqlite3
+
+import pytest
+
+
+def _hash(path):
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+
+@pytest.fixture
+def banco(robo, tmp_path, fake_admin):
+    registros = fake_admin.gerar_questoes(40, seed=13)
+    sqs = [robo.row_to_site_question(robo.record_to_row(fake_admin._record(r))) for r in registros]
+    b = robo.LocalBank(str(tmp_path / "banco.sqlite"))
+    b.upsert([(sq, "2024-01-01T00:00:00.000Z") for sq in sqs])
+    b.set_meta("watermark", "2024-01-01T00:00:00.000Z")
+    b.conn.commit()
+    b.refresh_store()
+    questoes = [robo.QuestionBlock(i + 1, "ESPECIALIDADE", sq.enunciado, dict(sq.alternativas), "") for i, sq in enumerate(sqs[:6])]
+    yield b, questoes
+    b.close()
+
+
+def test_pool_desligado_por_padrao(robo):
+    assert robo.MATCH_WORKERS == 1
+
+
+def test_pool_da_o_mesmo_resultado_que_em_serie(robo, banco):
+    b, questoes = banco
+    em_serie = [robo.find_code_in_local_bank(b, q, None) for q in questoes]
+
+    servico = robo.MatchingService(b, workers=2)
+    try:
+        em_pool = servico.match_batch(questoes, None)
+    finally:
+        servico.close()
+
+    assert [(r.code, r.confianca) for r in em_pool] == [(r.code, r.confianca) for r in em_serie]
+    assert all(r.confianca == "ALTA" for r in em_pool)
+
+
+def test_banco_somente_leitura_nao_escreve_nada(robo, banco, tmp_path):
+    b, questoes = banco
+    # índices e store desatualizados: o modo normal reconstruiria e regravaria
+    b.conn.execute("DELETE FROM questions_fts")
+    b.set_meta("watermark", "2025-01-01T00:00:00.000Z")
+    b.conn.commit()
+    antes = {p.name: _hash(p) for p in tmp_path.iterdir() if p.is_file()}
+
+    ro = robo.LocalBank(str(tmp_path / "banco.sqlite"), read_only=True)
+    assert ro.store is None and ro.has_fts
+    assert ro.get_many([b.codes().pop()])
+    with pytest.raises(sqlite3.OperationalError):
+        ro.set_meta("x", "y")
+    ro.close()
+
+    assert {p.name: _hash(p) for p in tmp_path.iterdir() if p.is_file()} == antes
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Quase-duplicatas por MinHash + LSH: mesma questão de outra apostila/edição, sem falso positivo."""
+
+import re
+
+import pytest
+
+from scripts import local_bank
+
+
+@pytest.fixture
+def textos(robo, fake_admin):
+    return [robo.normalize_text(r["description"]) for r in fake_admin.gerar_questoes(30, seed=21)]
+
+
+def _edicao(texto: str) -> str:
+    """Mesma questão com pequena edição (outra apostila): troca uma palavra e corta o fim."""
+    editado = re.sub("qual a conduta", "qual e a conduta mais adequada", texto, count=1, flags=re.IGNORECASE)
+    assert editado != texto
+    return editado[:-8]
+
+
+def test_assinatura_estavel_e_jaccard_estimado(robo, textos):
+    a = local_bank.minhash_signature(textos[0])
+    assert (a == local_bank.minhash_signature(textos[0])).all()
+    assert a.shape == (local_bank.MINHASH_BANDS * local_bank.MINHASH_ROWS,)
+
+    assert local_bank.minhash_jaccard(a, a) == 1.0
+    assert local_bank.minhash_jaccard(a, local_bank.minhash_signature(_edicao(textos[0]))) >= 0.6
+    assert local_bank.minhash_jaccard(a, local_bank.minhash_signature(textos[1])) < 0.3
+
+
+def test_texto_sem_shingles_nao_casa_com_nada(robo, textos):
+    index = local_bank.MinHashLSH()
+    for i, t in enumerate(textos):
+        index.add(str(i), t)
+    assert index.query("abc") == []
+
+
+def test_indice_em_memoria_acha_a_edicao(robo, textos):
+    index = local_bank.MinHashLSH()
+    for i, t in enumerate(textos):
+        index.add(str(i), t)
+
+    achados = index.query(_edicao(textos[7]))
+    assert achados and achados[0][0] == "7"
+    assert all(j >= local_bank.MINHASH_MIN_JACCARD for _, j in achados)
+
+
+def test_grupos_de_quase_duplicatas_no_lote(robo, fake_admin):
+    regs = fake_admin.gerar_questoes(12, seed=4)
+    qs = [robo.QuestionBlock(i + 1, "ESPECIALIDADE", r["description"], {}, "") for i, r in enumerate(regs)]
+    qs.append(robo.QuestionBlock(13, "ESPECIALIDADE", _edicao(regs[2]["description"]), {}, ""))
+    qs.append(robo.QuestionBlock(14, "ESPECIALIDADE", regs[9]["description"], {}, ""))
+
+    grupos = sorted(sorted(g) for g in local_bank.near_duplicate_groups(qs))
+    assert grupos == [[2, 12], [9, 13]]
+
+
+def test_banco_local_devolve_quase_duplicata_primeiro(robo, tmp_path, fake_admin):
+    b = robo.LocalBank(str(tmp_path / "banco.sqlite"))
+    sqs = [robo.row_to_site_question(robo.record_to_row(fake_admin._record(r))) for r in fake_admin.gerar_questoes(40, seed=8)]
+    b.upsert([(sq, "") for sq in sqs])
+    b.conn.commit()
+
+    alvo = sqs[17]
+    q = robo.QuestionBlock(1, "ESPECIALIDADE", _edicao(alvo.enunciado), dict(alvo.alternativas), "")
+    assert b.search_near_duplicates(q)[0].code == alvo.code
+    assert robo.local_bank_candidates(b, q)[0][1][0].code == alvo.code
+
+    b.conn.execute("DELETE FROM questions_lsh")
+    b.conn.commit()
+    b.close()
+    reaberto = robo.LocalBank(str(tmp_path / "banco.sqlite"))
+    assert reaberto.search_near_duplicates(q)[0].code == alvo.code
+    reaberto.close()
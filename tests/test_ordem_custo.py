@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Ordem por custo x chance: AD primeiro, depois da mais barata/provável para a mais cara."""
+
+import json
+from pathlib import Path
+
+ALTS = {
+    "A": "Sulfato de magnésio",
+    "B": "Nifedipino oral",
+    "C": "Hidralazina venosa",
+    "D": "Interrupção imediata",
+    "E": "Conduta expectante",
+}
+
+
+def _boa(robo, numero: int):
+    return robo.QuestionBlock(
+        numero, "OUTRAS",
+        "Gestante de 32 semanas com pressão 170x110 mmHg, cefaleia occipital, escotomas e proteinúria "
+        f"maciça {numero}. Qual a conduta?",
+        dict(ALTS), "",
+    )
+
+
+def _curta(robo, numero: int):
+    return robo.QuestionBlock(numero, "OUTRAS", "Qual a conduta?", dict(ALTS), "")
+
+
+def _certo_errado(robo, numero: int):
+    return robo.QuestionBlock(
+        numero, "OUTRAS",
+        f"A eclâmpsia com cefaleia occipital e escotomas exige sulfato de magnésio imediato {numero}.",
+        {"A": "CERTO", "B": "ERRADO"}, "",
+    )
+
+
+def _grava_journal(n: int, status: str, requisicoes: int):
+    d = Path("debug/journal")
+    d.mkdir(parents=True, exist_ok=True)
+    with open(d / f"{status}.jsonl", "a", encoding="utf-8") as f:
+        for i in range(n):
+            f.write(json.dumps({"key": f"k{i}", "status": status, "requisicoes": requisicoes}) + "\n")
+
+
+def test_custo_padrao_sem_historico_suficiente(robo):
+    _grava_journal(robo.COST_MIN_HISTORY - 1, "encontrada", 2)
+    assert robo.journal_cost_history() == (robo.COST_DEFAULT_HIT, robo.COST_DEFAULT_MISS)
+
+
+def test_custo_calibrado_pelos_journals(robo):
+    _grava_journal(robo.COST_MIN_HISTORY, "encontrada", 2)
+    _grava_journal(robo.COST_MIN_HISTORY, "nao_encontrada", 50)
+    Path("debug/journal/cortado.jsonl").write_text('{"status": "encon', encoding="utf-8")
+
+    assert robo.journal_cost_history() == (2.0, 50.0)
+
+
+def test_qualidade_do_parse(robo):
+    assert robo.parse_quality(_boa(robo, 1)) == 1.0
+    faltando = robo.QuestionBlock(1, "OUTRAS", _boa(robo, 1).enunciado, {"A": "x", "B": "y"}, "")
+    assert robo.parse_quality(faltando) < 1.0
+    lixo = robo.QuestionBlock(1, "OUTRAS", "Gestante ¤¤¤ ■■■ com ▲▲ cefaleia ◆◆◆", dict(ALTS), "")
+    assert robo.parse_quality(lixo) < 1.0
+
+
+def test_plano_por_tipo_de_questao(robo):
+    boa = robo.estimate_question_plan(_boa(robo, 1), 4.0, 30.0)
+    curta = robo.estimate_question_plan(_curta(robo, 2), 4.0, 30.0)
+    ce = robo.estimate_question_plan(_certo_errado(robo, 3), 4.0, 30.0)
+
+    assert boa.chance > ce.chance and boa.chance > curta.chance
+    assert boa.custo < curta.custo and boa.custo < ce.custo
+    assert "enunciado curto" in curta.motivo and "certo/errado" in ce.motivo
+
+
+def test_codigo_conhecido_e_journal_saem_quase_de_graca(robo, tmp_path):
+    q = _curta(robo, 1)
+    conhecido = robo.estimate_question_plan(q, 4.0, 30.0, known_codes={robo.question_fingerprint(q.enunciado): "123"})
+    assert (conhecido.chance, conhecido.custo) == (0.95, 1.0)
+
+    pdf = tmp_path / "prova.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+    journal = robo.RunJournal(str(pdf), str(tmp_path / "journal"))
+    journal.record(q, robo.MatchResult("123", 97, 5, "ALTA", False, ""), robo.SearchCost())
+    assert robo.estimate_question_plan(q, 4.0, 30.0, journal=journal).custo == 0.0
+
+
+def test_ordem_ad_primeiro_e_empate_na_ordem_do_pdf(robo):
+    ad = [robo.QuestionBlock(9, "AD", "Qual a conduta?", {"A": "CERTO", "B": "ERRADO"}, "")]
+    outras = [_certo_errado(robo, 1), _curta(robo, 2), _boa(robo, 3), _boa(robo, 4), _curta(robo, 5)]
+
+    ordem = [q.numero for q in robo.plan_question_order(ad, outras)]
+
+    assert ordem[0] == 9
+    assert ordem[1:3] == [3, 4]
+    assert sorted(ordem) == [1, 2, 3, 4, 5, 9]
+    assert ordem.index(2) < ordem.index(5)
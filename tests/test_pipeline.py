@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""Pipeline: ordem do estágio ordenado, stop com drenagem e erro relançado por run()."""
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+import pytest
+
+from scripts.stage_pipeline import Pipeline, Stage
+
+
+@dataclass
+class Item:
+    seq: int
+    valor: int = 0
+
+
+def _itens(n: int):
+    return (Item(seq=i) for i in range(1, n + 1))
+
+
+def test_estagio_ordenado_recebe_na_ordem_do_seq():
+    vistos = []
+
+    def lento(item):
+        time.sleep(random.uniform(0, 0.01))  # 4 workers: a saída chega embaralhada
+        item.valor = item.seq * 10
+        return item
+
+    pipe = Pipeline([
+        Stage("lento", lento, workers=4),
+        Stage("escrita", lambda it: vistos.append(it.seq), ordenado=True),
+    ], queue_size=3)
+    pipe.run(_itens(40))
+
+    assert vistos == list(range(1, 41))
+    assert pipe.metrics["lento"].processados == 40
+    assert pipe.metrics["escrita"].processados == 40
+
+
+def test_estagio_ordenado_com_varios_workers_e_rejeitado():
+    with pytest.raises(ValueError):
+        Pipeline([Stage("escrita", lambda it: it, workers=2, ordenado=True)])
+
+
+def test_thread_principal_roda_na_thread_que_chamou_run():
+    threads = set()
+
+    def site(item):
+        threads.add(threading.get_ident())
+        return item
+
+    Pipeline([
+        Stage("site", site, thread_principal=True),
+        Stage("escrita", lambda it: None, ordenado=True),
+    ]).run(_itens(10))
+
+    assert threads == {threading.get_ident()}
+
+
+def test_stop_nao_comeca_item_novo_mas_escrita_drena():
+    escritos = []
+    pipe = None
+
+    def site(item):
+        if item.seq == 3:
+            pipe.stop.set()
+        return item
+
+    pipe = Pipeline([
+        Stage("site", site, thread_principal=True),
+        Stage("escrita", lambda it: escritos.append(it.seq), ordenado=True, sempre=True),
+    ], queue_size=2)
+    pipe.run(_itens(100))
+
+    assert escritos == [1, 2, 3]  # o que já estava resolvido não se perde
+    assert pipe.metrics["site"].processados == 3
+    assert pipe.metrics["parse"].processados < 100  # o produtor também para
+
+
+def test_erro_num_estagio_para_tudo_e_e_relancado():
+    processados = []
+
+    def falha(item):
+        if item.seq == 5:
+            raise KeyError("quebrou")
+        return item
+
+    pipe = Pipeline([
+        Stage("recuperacao", falha, workers=2),
+        Stage("escrita", lambda it: processados.append(it.seq)),
+    ], queue_size=2)
+    with pytest.raises(KeyError, match="quebrou"):
+        pipe.run(_itens(1000))
+
+    assert 5 not in processados
+    assert len(processados) < 999
+
+
+def test_erro_no_produtor_e_relancado():
+    def itens():
+        yield Item(seq=1)
+        raise OSError("PDF ilegível")
+
+    with pytest.raises(OSError, match="PDF ilegível"):
+        Pipeline([Stage("escrita", lambda it: None)]).run(itens())
+
+
+def test_ocioso_roda_so_com_a_fila_vazia():
+    chamadas = []
+    liberar = threading.Event()
+
+    def ocioso():
+        chamadas.append(1)
+        liberar.set()
+        return False
+
+    def itens():
+        liberar.wait(5)  # o primeiro item só sai depois de o estágio ficar ocioso
+        yield from _itens(3)
+
+    pipe = Pipeline([Stage("site", lambda it: it, ocioso=ocioso)])
+    pipe.run(itens())
+
+    assert chamadas
+    assert pipe.metrics["site"].processados == 3
+
+
+def test_erro_no_ocioso_para_tudo_e_e_relancado():
+    chegou = threading.Event()
+    processados = []
+
+    def ocioso():
+        chegou.set()
+        raise RuntimeError("sessão caiu no upgrade")
+
+    def itens():
+        chegou.wait(5)
+        yield from _itens(20)
+
+    pipe = Pipeline([
+        Stage("site", lambda it: it, thread_principal=True, ocioso=ocioso),
+        Stage("escrita", lambda it: processados.append(it.seq), sempre=True),
+    ], queue_size=2)
+    with pytest.raises(RuntimeError, match="sessão caiu"):
+        pipe.run(itens())
+
+    assert processados == []
+    assert pipe.stop.is_set()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""DeadlineScheduler: orçamento por questão com sobra, prazo da execução e timeout das chamadas."""
+
+import pytest
+
+
+class Relogio:
+    """Substitui o módulo time no site_control: o tempo só anda quando o teste manda."""
+
+    def __init__(self):
+        self.agora = 1000.0
+
+    def time(self):
+        return self.agora
+
+    def andar(self, s: float):
+        self.agora += s
+
+
+@pytest.fixture
+def relogio(site_control, monkeypatch):
+    r = Relogio()
+    monkeypatch.setattr(site_control, "time", r)
+    return r
+
+
+def test_sobra_das_faceis_vai_para_as_dificeis(site_control, relogio):
+    prazos = site_control.DeadlineScheduler(base_s=10, max_s=25, run_deadline_s=None)
+
+    assert prazos.start_question() == 10
+    relogio.andar(2)
+    prazos.finish_question()
+    assert prazos.sobra_s == 8
+
+    assert prazos.start_question() == 18
+    relogio.andar(7)
+    prazos.finish_question()
+    assert prazos.start_question() == 21
+    relogio.andar(30)
+    assert prazos.question_expired()
+    prazos.finish_question()
+
+    assert prazos.sobra_s == 0 and prazos.estouradas == 1
+    assert prazos.start_question() == 10
+
+
+def test_orcamento_tem_teto(site_control, relogio):
+    prazos = site_control.DeadlineScheduler(base_s=10, max_s=15, run_deadline_s=None)
+    for _ in range(5):
+        prazos.start_question()
+        prazos.finish_question()  # 0 s gastos: +10 de sobra cada
+
+    assert prazos.sobra_s == 50
+    assert prazos.start_question() == 15
+
+
+def test_prazo_da_execucao_corta_o_da_questao(site_control, relogio):
+    prazos = site_control.DeadlineScheduler(base_s=10, max_s=30, run_deadline_s=25)
+    relogio.andar(20)
+
+    assert prazos.start_question() == 5
+    assert not prazos.run_expired()
+    relogio.andar(5)
+    assert prazos.run_expired() and prazos.question_expired()
+    assert prazos.start_question() == 0
+
+
+def test_janela_avulsa_nao_mexe_na_sobra(site_control, relogio):
+    prazos = site_control.DeadlineScheduler(base_s=10, max_s=30, run_deadline_s=None)
+    prazos.start_window(3)
+    assert prazos.remaining_s() == 3
+    relogio.andar(4)
+    assert prazos.question_expired()
+    prazos.finish_window()
+
+    assert prazos.remaining_s() is None and not prazos.question_expired()
+    assert prazos.sobra_s == 0 and prazos.estouradas == 0
+
+
+def test_prazo_vencido_nao_comeca_a_chamada(site_control, monkeypatch):
+    prazos = site_control.DeadlineScheduler(base_s=60, run_deadline_s=None)
+    prazos.start_window(-1)  # janela já vencida
+    monkeypatch.setattr(site_control, "DEADLINES", prazos)
+    breaker = site_control.CircuitBreaker(limite=1, pausa_s=0)
+    monkeypatch.setattr(site_control, "BREAKER", breaker)
+    chamadas = []
+
+    with pytest.raises(site_control.SiteError) as exc:
+        site_control.with_retry(lambda: chamadas.append(site_control.budget_timeout_ms(5000)) or ["nunca"], "listagem")
+
+    assert exc.value.tipo == "prazo"
+    assert chamadas == []
+    assert not breaker.aberto  # prazo não é falha do site
+
+
+def test_prazo_restante_limita_o_timeout(site_control, monkeypatch):
+    prazos = site_control.DeadlineScheduler(base_s=60, run_deadline_s=None)
+    monkeypatch.setattr(site_control, "DEADLINES", prazos)
+    assert site_control.budget_timeout_ms(5000) == 5000  # sem questão aberta: só o teto
+
+    prazos.start_window(10)
+    assert site_control.budget_timeout_ms(60000) <= 10000
+    prazos.start_window(0.5)
+    assert site_control.budget_timeout_ms(60000) == site_control.MIN_CALL_TIMEOUT_MS
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Queries do enunciado + alternativas, intercaladas pela seletividade estimada."""
+
+
+def _questao(robo, enunciado, alternativas):
+    return robo.QuestionBlock(1, "ESPECIALIDADE", enunciado, alternativas, "")
+
+
+def test_seletividade_tokens_raros_valem_mais_que_genericos(robo):
+    generica = robo.estimate_query_selectivity("diagnostico mais provavel conduta adequada")
+    rara = robo.estimate_query_selectivity("feocromocitoma metanefrinas plasmaticas")
+
+    assert rara > generica
+    assert robo.estimate_query_selectivity("") == 0.0
+    # só os 8 primeiros tokens contam
+    longa = " ".join(["hepatoesplenomegalia"] * 20)
+    assert robo.estimate_query_selectivity(longa) == robo.estimate_query_selectivity(" ".join(["hepatoesplenomegalia"] * 8))
+
+
+def test_alternativas_curtas_e_certo_errado_nao_viram_query(robo):
+    qs = robo.build_queries_from_alternativas({
+        "A": "CERTO",
+        "B": "Sim",
+        "C": "Dosagem de metanefrinas plasmáticas livres",
+        "D": "Dosagem de metanefrinas plasmáticas livres",  # repetida
+    })
+
+    assert qs == ["Dosagem de metanefrinas plasmáticas livres"]
+
+
+def test_enunciado_curto_poe_a_alternativa_seletiva_na_frente(robo):
+    q = _questao(robo, "Qual o diagnóstico mais provável?", {
+        "A": "Feocromocitoma com metanefrinas elevadas",
+        "B": "Hiperaldosteronismo primário por adenoma",
+    })
+
+    qs = robo.build_queries_for_question(q)
+
+    assert qs[0] in robo.build_queries_from_alternativas(q.alternativas)
+    assert set(robo.build_queries_from_enunciado(q.enunciado)) <= set(qs)
+    assert len(qs) == len(set(qs))
+
+
+def test_enunciado_mantem_a_propria_ordem(robo):
+    q = _questao(
+        robo,
+        "Mulher de 42 anos com cefaleia, sudorese e palpitações paroxísticas, pressão arterial de 220x120 mmHg "
+        "durante as crises e tomografia com massa adrenal direita de quatro centímetros. Qual a conduta?",
+        {"A": "Bloqueio alfa adrenérgico antes da cirurgia", "B": "Betabloqueador isolado imediatamente"},
+    )
+    enun = robo.build_queries_from_enunciado(q.enunciado)
+
+    qs = robo.build_queries_for_question(q)
+
+    assert [x for x in qs if x in enun] == enun
+
+
+def test_sem_queries_de_alternativas_quando_desligado(robo, monkeypatch):
+    monkeypatch.setattr(robo, "QUERY_ALTERNATIVAS", False)
+    q = _questao(robo, "Qual o diagnóstico mais provável?", {"A": "Feocromocitoma com metanefrinas elevadas"})
+
+    assert robo.build_queries_for_question(q) == robo.build_queries_from_enunciado(q.enunciado)
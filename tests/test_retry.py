@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""with_retry, CircuitBreaker e falha do site no meio da busca."""
+
+import pytest
+
+
+# =========================
+# RETRY + CIRCUIT BREAKER
+# =========================
+class Chamada:
+    """fn para with_retry: levanta/devolve na ordem de `roteiro`."""
+
+    def __init__(self, *roteiro):
+        self.roteiro = list(roteiro)
+        self.vezes = 0
+
+    def __call__(self):
+        self.vezes += 1
+        r = self.roteiro.pop(0)
+        if isinstance(r, BaseException):
+            raise r
+        return r
+
+
+def test_retry_repete_erro_e_devolve_o_sucesso(site_control):
+    fn = Chamada(site_control.SiteError("timeout"), site_control.SiteError("5xx"), ["linha"])
+
+    assert site_control.with_retry(fn, "listagem") == ["linha"]
+    assert fn.vezes == 3
+
+
+def test_retry_esgotado_vira_site_error_com_o_tipo(site_control):
+    fn = Chamada(*[site_control.SiteError("timeout")] * site_control.RETRY_MAX_ATTEMPTS)
+
+    with pytest.raises(site_control.SiteError) as exc:
+        site_control.with_retry(fn, "listagem")
+    assert exc.value.tipo == "timeout"
+    assert fn.vezes == site_control.RETRY_MAX_ATTEMPTS
+
+
+def test_retry_nao_pega_erro_de_programacao(site_control):
+    fn = Chamada(KeyError("bug"), ["nunca"])
+
+    with pytest.raises(KeyError):
+        site_control.with_retry(fn, "listagem")
+    assert fn.vezes == 1
+
+
+def test_retry_vazio_so_com_repetir_vazio(site_control):
+    assert site_control.with_retry(Chamada([], ["atrasada"]), "listagem") == []
+    assert site_control.with_retry(Chamada([], ["atrasada"]), "listagem", repetir_vazio=True) == ["atrasada"]
+
+    fn = Chamada(*[[]] * 5)
+    assert site_control.with_retry(fn, "listagem", repetir_vazio=True) == []
+    assert fn.vezes == site_control.RETRY_EMPTY_ATTEMPTS
+
+
+def test_breaker_abre_confere_sessao_e_fecha(site_control, monkeypatch):
+    verificacoes = []
+    breaker = site_control.CircuitBreaker(lambda: verificacoes.append(1), limite=2, pausa_s=0)
+    monkeypatch.setattr(site_control, "BREAKER", breaker)
+
+    fn = Chamada(site_control.SiteError("5xx"), site_control.SiteError("5xx"), ["ok"])
+    assert site_control.with_retry(fn, "listagem") == ["ok"]
+
+    assert verificacoes == [1]
+    assert not breaker.aberto and breaker.aberturas == 1
+    assert breaker.repeticoes == {"5xx": 2}
+
+
+def test_breaker_para_a_execucao_depois_de_pausas_seguidas(site_control, monkeypatch):
+    def sessao_caida():
+        raise site_control.SiteError("login")
+
+    breaker = site_control.CircuitBreaker(sessao_caida, limite=1, pausa_s=0, max_aberturas=2)
+    monkeypatch.setattr(site_control, "BREAKER", breaker)
+    monkeypatch.setattr(site_control, "RETRY_MAX_ATTEMPTS", 10)
+
+    fn = Chamada(*[site_control.SiteError("5xx")] * 10)
+    with pytest.raises(site_control.SiteIndisponivel, match="pausas seguidas"):
+        site_control.with_retry(fn, "listagem")
+    assert breaker.aberturas == 3
+
+
+def test_breaker_sucesso_zera_as_falhas(site_control):
+    b = site_control.CircuitBreaker(limite=3, pausa_s=0)
+    b.falha("5xx")
+    b.falha("5xx")
+    b.sucesso()
+    b.falha("5xx")
+    assert not b.aberto
+
+    b.falha("login")  # login abre na hora
+    assert b.aberto
+
+
+# =========================
+# FALHA DO SITE NO MEIO DA BUSCA / LOGIN HEADLESS
+# =========================
+@pytest.fixture
+def busca(robo, monkeypatch):
+    """_find_code_for_question sem fan-out; a 1ª página 'acha' uma MEDIA (se pedido) e a 2ª falha."""
+    monkeypatch.setattr(robo, "FANOUT_TOP_K", 1)
+    monkeypatch.setattr(robo, "PREFETCH_NEXT_PAGE", False)
+    monkeypatch.setattr(robo, "rows_limit_for_query", lambda q: 1)
+    monkeypatch.setattr(robo, "pages_limit_for_query", lambda q: 5)
+    questao = robo.QuestionBlock(
+        numero=3, tipo="OUTRAS",
+        enunciado="Homem de 60 anos com dor torácica em aperto há duas horas. Qual o diagnóstico?",
+        alternativas={"A": "IAM", "B": "Pericardite"}, texto_completo="",
+    )
+    media = robo.MatchResult("555", 85, 2, "MEDIA", False, "")
+
+    def configurar(acha_media: bool):
+        def fetch(page, q, pnum, extra_filters=None):
+            if pnum > 1:
+                raise robo.SiteError("5xx", "listagem respondeu 502")
+            return [{"code": "555", "desc": "x", "esp": ""}]
+
+        def processar(questao, rows, per_page_rows, query_count, st, so_alta=False):
+            if acha_media:
+                st.keep(media, 100)
+            return None
+
+        monkeypatch.setattr(robo, "fetch_rows_ui", fetch)
+        monkeypatch.setattr(robo, "_process_page_rows", processar)
+        return questao
+
+    return configurar, media
+
+
+def test_site_falha_no_meio_fica_a_melhor_media(robo, busca):
+    configurar, media = busca
+    questao = configurar(acha_media=True)
+
+    assert robo._find_code_for_question(None, questao, None) == media
+
+
+def test_site_falha_sem_candidato_relanca(robo, busca):
+    configurar, _ = busca
+    questao = configurar(acha_media=False)
+
+    with pytest.raises(robo.SiteError) as exc:
+        robo._find_code_for_question(None, questao, None)
+    assert exc.value.tipo == "5xx"
+
+
+class PaginaLogin:
+    url = "https://admin.example/admin/login"
+
+    def goto(self, url, **kwargs):
+        pass
+
+
+def test_login_headless_falha_na_hora(robo):
+    with pytest.raises(robo.LoginNecessario, match="headless"):
+        robo._ensure_logged_in_and_save_state(PaginaLogin(), None, "debug/state.json", headless=True)
+
+
+def test_breaker_nao_insiste_quando_o_login_e_impossivel(robo, site_control, monkeypatch):
+    chamadas = []
+
+    def verificar():
+        chamadas.append(1)
+        robo._ensure_logged_in_and_save_state(PaginaLogin(), None, "debug/state.json", headless=True)
+
+    breaker = site_control.CircuitBreaker(verificar, pausa_s=0, max_aberturas=5)
+    monkeypatch.setattr(site_control, "BREAKER", breaker)
+    fn = Chamada(site_control.SiteError("login"), ["nunca"])
+
+    with pytest.raises(site_control.LoginNecessario):
+        site_control.with_retry(fn, "listagem")
+    assert chamadas == [1] and fn.vezes == 1
+
+
+@pytest.mark.parametrize("url, login", [
+    ("https://admin.example/admin/login", True),
+    ("https://admin.example/admin/login/", True),
+    ("https://admin.example/ADMIN/LOGIN?next=/admin/resources/Question", True),
+    ("https://admin.example/admin/resources/Question?filters.description=login", False),
+    ("https://admin.example/admin/resources/Login/records/1/show", False),
+    ("https://admin.example/admin/resources/Question/actions/login", False),
+    ("https://accounts.example/login", False),
+    ("", False),
+    (None, False),
+])
+def test_url_de_login_e_so_a_tela_do_admin(site_control, url, login):
+    assert site_control.is_login_url(url) is login
+
+
+# =========================
+# ERROS NA FATIA DE UPGRADE (ANYTIME)
+# =========================
+@pytest.fixture
+def run(robo):
+    questao = robo.QuestionBlock(7, "OUTRAS", "Gestante com 32 semanas. Qual a conduta?", {"A": "x", "B": "y"}, "")
+    task = robo.UpgradeTask(
+        questao=questao, especialidade=None, st=robo._SearchState(total_pdf=2, especialidade=None),
+        resultado=robo.MatchResult("1", 80, 2, "MEDIA", False, ""), queries=["q1"],
+    )
+    r = robo.ExtractionRun(page=None, scope=robo.SearchScope(), journal=None, retomar=False, total=1)
+    r.upgrades.append((robo.PipelineItem(seq=1, questao=questao), task))
+    return r
+
+
+def _upgrade_levanta(robo, monkeypatch, erro):
+    def upgrade_search(page, task, max_paginas=None):
+        raise erro
+    monkeypatch.setattr(robo, "upgrade_search", upgrade_search)
+
+
+def test_upgrade_com_site_falhando_fica_a_media(robo, run, monkeypatch):
+    _upgrade_levanta(robo, monkeypatch, robo.SiteError("5xx"))
+    assert run.upgrade_slice() is True
+    assert run.upgrades == []
+
+
+@pytest.mark.parametrize("erro", ["LoginNecessario", "SiteIndisponivel"])
+def test_upgrade_nao_engole_o_que_para_a_execucao(robo, run, monkeypatch, erro):
+    _upgrade_levanta(robo, monkeypatch, getattr(robo, erro)("parar"))
+    with pytest.raises(getattr(robo, erro)):
+        run.upgrade_slice()
+
+
+def test_upgrade_nao_engole_erro_de_programacao(robo, run, monkeypatch):
+    _upgrade_levanta(robo, monkeypatch, KeyError("bug"))
+    with pytest.raises(KeyError):
+        run.upgrade_ocioso()
+
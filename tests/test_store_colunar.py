@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""Store colunar (mmap): ida e volta sem perder campo, ponteiro de versão e arquivo antigo."""
+
+import shutil
+
+import pytest
+
+from scripts.local_bank import ColumnarQuestionStore
+
+
+@pytest.fixture
+def questoes(robo):
+    return [
+        robo.SiteQuestion("100", "Gestante com pré-eclâmpsia", {"A": "sulfato de magnésio", "B": "nifedipino"}, True,
+                          "Obstetrícia", "USP-SP", 2021),
+        robo.SiteQuestion("101", "Criança com tosse", {"A": "Certo", "B": "Errado"}, False, "Pediatria", None, None),
+        robo.SiteQuestion("102", "Idoso com síncope", {}, False, "", "USP-SP", 2019),
+    ] + [
+        robo.SiteQuestion(str(200 + i), f"Enunciado {i} ção", {"A": "x"}, i % 3 == 0, "Pediatria", "SES-DF", 2020)
+        for i in range(13)
+    ]
+
+
+def test_ida_e_volta_preserva_todos_os_campos(robo, questoes, tmp_path):
+    path = str(tmp_path / "banco.colunar")
+    ColumnarQuestionStore.from_site_questions(questoes, meta={"watermark": "w1"}).save(path)
+
+    store = ColumnarQuestionStore.load(path)
+    assert len(store) == len(questoes) and store.meta == {"watermark": "w1"}
+    for i, q in enumerate(questoes):
+        lido = store.get(i)
+        assert (lido.code, lido.enunciado, lido.alternativas, lido.is_acesso_direto) == (
+            q.code, q.enunciado, q.alternativas, q.is_acesso_direto
+        )
+        assert (lido.especialidade, lido.instituicao, lido.ano) == (q.especialidade, q.instituicao, q.ano)
+        assert lido.enunciado_norm == robo.normalize_text(q.enunciado)
+    store.close()
+
+
+def test_busca_por_codigo(robo, questoes, tmp_path):
+    path = str(tmp_path / "banco.colunar")
+    ColumnarQuestionStore.from_site_questions(questoes).save(path)
+    store = ColumnarQuestionStore.load(path)
+
+    assert store.index_of("101") == 1 and store.index_of("999") is None
+    assert [q.code for q in store.get_many(["102", "999", "100"])] == ["102", "100"]
+    store.close()
+
+
+def test_save_grava_versao_nova_e_troca_o_ponteiro(robo, questoes, tmp_path):
+    path = str(tmp_path / "banco.colunar")
+    ColumnarQuestionStore.from_site_questions(questoes[:2]).save(path)
+    antigo = ColumnarQuestionStore.load(path)
+    versao_antiga = ColumnarQuestionStore.resolve(path)
+
+    ColumnarQuestionStore.from_site_questions(questoes).save(path)
+    versao_nova = ColumnarQuestionStore.resolve(path)
+
+    assert versao_nova != versao_antiga
+    assert sorted(p.name for p in tmp_path.glob("banco.*.colunar")) == [versao_nova.name]
+    # quem já tinha a versão antiga mapeada continua lendo
+    assert antigo.get(1).code == "101" and len(antigo) == 2
+    novo = ColumnarQuestionStore.load(path)
+    assert len(novo) == len(questoes)
+    antigo.close()
+    novo.close()
+
+
+def test_store_antigo_gravado_direto_no_caminho(robo, questoes, tmp_path):
+    path = tmp_path / "banco.colunar"
+    ColumnarQuestionStore.from_site_questions(questoes).save(str(path))
+    legado = tmp_path / "legado.colunar"
+    shutil.copy(ColumnarQuestionStore.resolve(str(path)), legado)
+
+    assert ColumnarQuestionStore.resolve(str(legado)) == legado
+    store = ColumnarQuestionStore.load(str(legado))
+    assert store.get(0).code == "100"
+    store.close()
+
+
+def test_ponteiro_invalido(robo, tmp_path):
+    path = tmp_path / "banco.colunar"
+    path.write_text("lixo", encoding="utf-8")
+    with pytest.raises(ValueError):
+        ColumnarQuestionStore.load(str(path))
+
+
+def test_banco_local_usa_o_store_e_regrava_quando_muda(robo, questoes, tmp_path):
+    bank = robo.LocalBank(str(tmp_path / "banco.sqlite"))
+    bank.upsert([(q, "") for q in questoes])
+    bank.set_meta("watermark", "w1")
+    bank.conn.commit()
+    bank.refresh_store()
+    assert bank.store is not None and bank.get_many(["101"])[0].alternativas == {"A": "Certo", "B": "Errado"}
+    bank.close()
+
+    reaberto = robo.LocalBank(str(tmp_path / "banco.sqlite"))
+    assert reaberto.store is not None and reaberto.store.meta["watermark"] == "w1"
+    reaberto.upsert([(robo.SiteQuestion("300", "Nova", {"A": "y"}, False, ""), "")])
+    assert reaberto.store is None  # desatualizado: sai de uso até o refresh
+    assert reaberto.get_many(["300"])[0].enunciado == "Nova"
+    reaberto.set_meta("watermark", "w2")
+    reaberto.conn.commit()
+    reaberto.close()
+
+    terceiro = robo.LocalBank(str(tmp_path / "banco.sqlite"))
+    assert terceiro.store is not None and len(terceiro.store) == len(questoes) + 1
+    assert terceiro.store.meta["watermark"] == "w2"
+    terceiro.close()
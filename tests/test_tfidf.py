@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Re-rank TF-IDF de n-gramas de caractere sobre os candidatos do FTS."""
+
+import pytest
+
+
+@pytest.fixture
+def bank(robo, tmp_path, fake_admin):
+    b = robo.LocalBank(str(tmp_path / "banco.sqlite"))
+    sqs = [robo.row_to_site_question(robo.record_to_row(fake_admin._record(r))) for r in fake_admin.gerar_questoes(50, seed=9)]
+    b.upsert([(sq, "") for sq in sqs])
+    b.conn.commit()
+    yield b, sqs
+    b.close()
+
+
+def test_banco_novo_sem_indice_montado(robo, bank):
+    b, sqs = bank
+    assert b.ngram_position(sqs[0].code) is None
+
+    b.ngram_index()
+    assert b.ngram_position(sqs[0].code) is not None
+    assert b.ngram_position("nao-existe") is None
+
+
+def test_indice_remontado_quando_o_banco_muda(robo, bank):
+    b, sqs = bank
+    assert len(b.ngram_index()) == 50
+    b.upsert([(robo.SiteQuestion("999999", "Gestante com pré-eclâmpsia grave", {"A": "sulfato"}, False, ""), "")])
+    b.conn.commit()
+
+    assert len(b.ngram_index()) == 51
+    assert b.ngram_position("999999") is not None
+
+
+def test_rerank_poe_o_enunciado_mais_parecido_primeiro(robo, bank, monkeypatch):
+    monkeypatch.setattr(robo, "TFIDF_KEEP", 0)
+    b, sqs = bank
+    alvo = sqs[12]
+    texto = alvo.enunciado.replace("Recém-nascido", "RN", 1)
+    q = robo.QuestionBlock(1, "ESPECIALIDADE", texto, dict(alvo.alternativas), "")
+
+    cands = robo.rerank_with_tfidf(b, q, [sqs[3], sqs[40], alvo, sqs[7]])
+    assert cands[0].code == alvo.code
+    assert len(cands) == 4
+
+
+def test_rerank_completa_com_o_que_o_fts_perdeu(robo, bank, monkeypatch):
+    monkeypatch.setattr(robo, "TFIDF_KEEP", 2)
+    b, sqs = bank
+    alvo = sqs[21]
+    q = robo.QuestionBlock(1, "ESPECIALIDADE", alvo.enunciado, dict(alvo.alternativas), "")
+
+    cands = robo.rerank_with_tfidf(b, q, [sqs[0]])
+    assert cands[0].code == alvo.code
+    assert sqs[0].code in {sq.code for sq in cands}
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Continuação anytime: fatia por página retoma de onde parou, sem pular nem repetir páginas."""
+
+import pytest
+
+
+@pytest.fixture
+def task(robo, monkeypatch):
+    monkeypatch.setattr(robo, "PREFETCH_NEXT_PAGE", False)
+    monkeypatch.setattr(robo, "pages_limit_for_query", lambda q: 3)
+    monkeypatch.setattr(robo, "rows_limit_for_query", lambda q: 2)
+    questao = robo.QuestionBlock(
+        numero=7,
+        tipo="OUTRAS",
+        enunciado="Gestante com 32 semanas e pressão 160x110 mmHg. Qual a conduta?",
+        alternativas={"A": "Sulfato de magnésio", "B": "Alta"},
+        texto_completo="",
+    )
+    st = robo._SearchState(total_pdf=2, especialidade=None)
+    return robo.UpgradeTask(
+        questao=questao, especialidade=None, st=st,
+        resultado=robo.MatchResult("1", 80, 2, "MEDIA", False, ""),
+        queries=["q1", "q2"], proxima_query=0, proxima_pagina=2,
+    )
+
+
+def _sem_match(robo, monkeypatch):
+    """fetch_rows_ui falso: páginas cheias que não casam; devolve a lista de (query, página) pedidas."""
+    pedidas = []
+
+    def fetch(page, q, pnum, extra_filters=None):
+        pedidas.append((q, pnum))
+        return [{"code": f"{q}-{pnum}-{i}", "desc": "Lactente com tosse. Qual o diagnóstico?\nA. x\nB. y",
+                 "esp": ""} for i in range(2)]
+
+    monkeypatch.setattr(robo, "fetch_rows_ui", fetch)
+    return pedidas
+
+
+def test_fatia_de_uma_pagina_retoma_na_pagina_seguinte(robo, task, monkeypatch):
+    pedidas = _sem_match(robo, monkeypatch)
+
+    for _ in range(4):
+        assert robo.upgrade_search(None, task, max_paginas=1) is None
+
+    assert pedidas == [("q1", 2), ("q1", 3), ("q2", 1), ("q2", 2)]
+    assert (task.proxima_query, task.proxima_pagina) == (1, 3)
+    assert not task.esgotada
+
+
+def test_fatia_de_uma_query_sem_limite_de_paginas(robo, task, monkeypatch):
+    pedidas = _sem_match(robo, monkeypatch)
+
+    robo.upgrade_search(None, task)
+    robo.upgrade_search(None, task)
+
+    assert pedidas == [("q1", 2), ("q1", 3), ("q2", 1), ("q2", 2), ("q2", 3)]
+    assert task.esgotada
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Validação em lote (cdist/cpdist) dá exatamente a mesma decisão do caminho escalar."""
+
+import random
+
+import pytest
+
+
+@pytest.fixture
+def candidatos(robo, fake_admin):
+    """Questão do PDF + candidatos do site: ela mesma, com ruído, com alternativas trocadas e outras questões."""
+    rnd = random.Random(7)
+    registros = fake_admin.gerar_questoes(40, seed=11)
+
+    def site_q(code, desc):
+        enunciado, alts, is_ad, inst, ano = robo.parse_listagem_texto(desc)
+        return robo.SiteQuestion(code, enunciado, alts, is_ad, "", inst, ano)
+
+    base = site_q("0", registros[0]["description"])
+    questao = robo.QuestionBlock(1, "ESPECIALIDADE", base.enunciado, dict(base.alternativas), "")
+
+    cands = [site_q(r["code"], r["description"]) for r in registros[1:]]
+    cands.append(base)
+    ruido = base.enunciado.replace("com", "apresentando", 1) + " Assinale a correta."
+    cands.append(robo.SiteQuestion("1", ruido, dict(base.alternativas), False, ""))
+    trocadas = list(base.alternativas.values())
+    rnd.shuffle(trocadas)
+    cands.append(robo.SiteQuestion("2", base.enunciado, dict(zip("ABCDE", trocadas)), False, ""))
+    cands.append(robo.SiteQuestion("3", base.enunciado, {"A": "nenhuma", "B": "das anteriores"}, False, ""))
+    rnd.shuffle(cands)
+    return questao, cands
+
+
+@pytest.mark.parametrize("alinhamento", [True, False])
+def test_lote_igual_ao_escalar(robo, candidatos, monkeypatch, alinhamento):
+    monkeypatch.setattr(robo, "ALT_ALIGNMENT", alinhamento)
+    questao, cands = candidatos
+
+    lote = robo.validate_question_matches_batch(questao, cands)
+    escalar = [robo.validate_question_match(questao, sq) for sq in cands]
+
+    assert lote == escalar
+    aceitos = {sq.code for sq, (ok, _, _) in zip(cands, lote) if ok}
+    assert {"0", "1"} <= aceitos and "3" not in aceitos
+
+
+def test_iter_scored_candidates_mesma_ordem_com_e_sem_lote(robo, candidatos, monkeypatch):
+    questao, cands = candidatos
+
+    monkeypatch.setattr(robo, "BATCH_SCORING", True)
+    com_lote = [(r.code, r.confianca, rank) for r, rank in robo.iter_scored_candidates(questao, cands, 5)]
+    monkeypatch.setattr(robo, "BATCH_SCORING", False)
+    sem_lote = [(r.code, r.confianca, rank) for r, rank in robo.iter_scored_candidates(questao, cands, 5)]
+
+    assert com_lote == sem_lote
+    assert ("0", "ALTA") in {(c, conf) for c, conf, _ in com_lote}
+
+
+def test_lote_vazio(robo):
+    q = robo.QuestionBlock(1, "ESPECIALIDADE", "x", {}, "")
+    assert robo.validate_question_matches_batch(q, []) == []
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Servidor FAKE da API do admin (AdminJS) para testar o banco local / sync sem tocar no site real.
+
+Uso:
+    python tools/fake_admin_server.py                      # 300 questões geradas, porta 8765
+    python tools/fake_admin_server.py --json questoes.json # lista de {code, description, specialty, updatedAt}
+
+Endpoints (mesmo formato do AdminJS):
+    GET /admin/api/resources/Question/actions/list?page=&perPage=&filters.<prop>=&sortBy=&direction=
+        (filters.* = "contém", sem diferenciar maiúsculas, como o filtro de texto do AdminJS)
+    GET /admin/api/resources/Question/records/<code>/show
+    POST /touch/<code>   -> atualiza updatedAt (para testar o sync incremental)
+    POST /delete/<code>  -> apaga o registro (para testar a remoção no sync)
+"""
+
+import argparse
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+API_PREFIX = "/admin/api/resources/Question"
+
+RECORDS: list[dict] = []
+
+
+def _now_iso(offset_s: int = 0) -> str:
+    return (datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=offset_s)).isoformat()
+
+
+VOCAB = (
+    "febre icterícia hepatomegalia esplenomegalia petéquias convulsão hipotonia taquipneia gemência "
+    "cianose apneia letargia vômitos diarreia distensão abdominal exantema coriorretinite calcificações "
+    "microcefalia hidrocefalia surdez catarata cardiopatia plaquetopenia anemia leucocitose proteína "
+    "hemocultura liquor ultrassonografia radiografia ecocardiograma sorologia gestante pré-natal "
+    "bolsa rota corioamnionite prematuro termo cesárea parto vaginal aleitamento alojamento"
+).split()
+DROGAS = (
+    "ampicilina gentamicina cefotaxima vancomicina meropenem oxacilina aciclovir penicilina "
+    "ganciclovir sulfadiazina pirimetamina espiramicina fluconazol anfotericina ceftriaxona"
+).split()
+
+
+def gerar_questoes(n: int, seed: int = 42) -> list[dict]:
+    rnd = random.Random(seed)
+    bancas = ["SES-DF", "UERJ-RJ", "USP-SP", "UNIFESP", "SUS-SP"]
+    esps = ["Pediatria", "Clínica Médica", "Obstetrícia"]
+    out = []
+    for i in range(n):
+        achados = " ".join(rnd.sample(VOCAB, 12))
+        desc = (
+            f"({rnd.choice(bancas)} {rnd.randint(2018, 2025)})\n"
+            + ("(ACESSO DIRETO)\n" if rnd.random() < 0.3 else "")
+            + f"Recém-nascido com {achados}. Qual a conduta?\n"
+            + "\n".join(f"{l}. {' e '.join(rnd.sample(DROGAS, 2))}" for l in "ABCDE")
+        )
+        out.append({
+            "code": str(100000 + i),
+            "description": desc,
+            "specialty": rnd.choice(esps),
+            "updatedAt": _now_iso(i),
+        })
+    return out
+
+
+def _record(r: dict) -> dict:
+    return {"id": r["code"], "params": dict(r), "populated": {}}
+
+
+class Handler(BaseHTTPRequestHandler):
+    def _send(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        u = urlparse(self.path)
+        qs = {k: v[0] for k, v in parse_qs(u.query).items()}
+
+        if u.path == f"{API_PREFIX}/actions/list":
+            page = int(qs.get("page", 1))
+            per_page = int(qs.get("perPage", 10))
+            filtros = {k[len("filters."):]: v.lower() for k, v in qs.items() if k.startswith("filters.")}
+            rows = [r for r in RECORDS if all(v in str(r.get(k, "")).lower() for k, v in filtros.items())]
+            sort_by = qs.get("sortBy")
+            if sort_by:
+                rows.sort(key=lambda r: str(r.get(sort_by, "")), reverse=qs.get("direction") == "desc")
+            chunk = rows[(page - 1) * per_page: page * per_page]
+            return self._send(200, {
+                "records": [_record(r) for r in chunk],
+                "meta": {"total": len(rows), "perPage": per_page, "page": page},
+            })
+
+        if u.path.startswith(f"{API_PREFIX}/records/") and u.path.endswith("/show"):
+            code = u.path[len(f"{API_PREFIX}/records/"):-len("/show")]
+            for r in RECORDS:
+                if r["code"] == code:
+                    return self._send(200, {"record": _record(r)})
+            return self._send(404, {"error": "not found"})
+
+        return self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        u = urlparse(self.path)
+        if u.path.startswith("/touch/"):
+            code = u.path[len("/touch/"):]
+            for r in RECORDS:
+                if r["code"] == code:
+                    r["updatedAt"] = datetime.now(timezone.utc).isoformat()
+                    return self._send(200, {"ok": True, "updatedAt": r["updatedAt"]})
+        if u.path.startswith("/delete/"):
+            code = u.path[len("/delete/"):]
+            for i, r in enumerate(RECORDS):
+                if r["code"] == code:
+                    del RECORDS[i]
+                    return self._send(200, {"ok": True})
+        return self._send(404, {"error": "not found"})
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--n", type=int, default=300)
+    ap.add_argument("--json", help="arquivo com a lista de registros")
+    args = ap.parse_args()
+
+    global RECORDS
+    if args.json:
+        with open(args.json, "r", encoding="utf-8") as f:
+            RECORDS = json.load(f)
+    else:
+        RECORDS = gerar_questoes(args.n)
+
+    print(f"✅ Fake admin com {len(RECORDS)} questões em http://127.0.0.1:{args.port}{API_PREFIX}")
+    ThreadingHTTPServer(("127.0.0.1", args.port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Sincroniza o banco local (debug/banco_questoes.sqlite) com o admin.
+
+    python tools/sync_banco_local.py                 # admin real (usa debug/storage_state.json)
+    python tools/sync_banco_local.py --full          # refaz tudo (ignora a marca d'água)
+    python tools/sync_banco_local.py --api-url http://127.0.0.1:8765/admin/api/resources/Question
+                                                     # servidor fake (tools/fake_admin_server.py)
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from playwright.sync_api import sync_playwright
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+import local_bank  # noqa: E402
+import robo_pdf_para_codigos as robo  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--api-url", default=robo.QUESTIONS_API_URL)
+    ap.add_argument("--db", default=local_bank.LOCAL_BANK_PATH)
+    ap.add_argument("--full", action="store_true")
+    args = ap.parse_args()
+
+    bank = local_bank.LocalBank(args.db)
+    try:
+        with sync_playwright() as p:
+            state = robo.STORAGE_STATE if Path(robo.STORAGE_STATE).exists() else None
+            req = p.request.new_context(storage_state=state)
+            robo.sync_local_bank(req, bank, api_url=args.api_url, full=args.full)
+            req.dispose()
+    finally:
+        bank.close()
+
+
+if __name__ == "__main__":
+    main()